@@ -1,10 +1,11 @@
 import os
 import sys
 import uuid
+import logging
+from functools import partial
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 
 # -----------------------------
@@ -14,10 +15,42 @@ APP_DIR = os.path.dirname(os.path.abspath(__file__))
 if APP_DIR not in sys.path:
     sys.path.insert(0, APP_DIR)
 
-from pipeline import process_uploaded_pdf
-
+from worker_pool import PoolExtracao, FilaCheia
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.export import FORMATOS, MIME, to_bytes
+from ecad_scripts import analitico, historico, metricas
+from ecad_scripts.limites import Limites, LimiteExcedido
+from ecad_scripts.layout import carregar_indice
+from ecad_scripts.incremental import EstadoIncremental
+from ecad_scripts.dataset import Consulta, adicionar_periodos
+from ecad_scripts.busca import IndiceObras
+from ecad_scripts.figuras import CacheFiguras
+from ecad_scripts.valores import centavos_para_reais, para_reais
+
+configurar_logging()
+logger = logging.getLogger(__name__)
 st.set_page_config(page_title="Melodia Finance", layout="wide")
 
+# um histórico só para todos os visitantes (instalação de um usuário); vazio = um catálogo por visitante
+HISTORICO_PATH = os.environ.get("MELODIA_DB", "")
+HISTORICOS_DIR = os.environ.get("MELODIA_HISTORICOS", historico.PASTA_CATALOGOS)
+# workers do pool de extração compartilhado (vazio = nº de CPUs - 1)
+MAX_WORKERS = int(os.environ.get("MELODIA_WORKERS", "0")) or None
+# limites por PDF na extração (0 = sem limite)
+TIMEOUT_S = float(os.environ.get("MELODIA_TIMEOUT_S", "300")) or None
+MAX_PAGINAS = int(os.environ.get("MELODIA_MAX_PAGINAS", "2000")) or None
+MAX_MEMORIA_MB = int(os.environ.get("MELODIA_MAX_MEMORIA_MB", "2048")) or None
+# extração das tabelas de categorias/rubricas: "texto" ou "regiao" (colunas por posição)
+MODO_TABELAS = os.environ.get("MELODIA_MODO_TABELAS", "texto")
+# métricas Prometheus: porta local de /metrics e/ou arquivo (vazio = desligado)
+METRICAS_PORTA = int(os.environ.get("MELODIA_METRICAS_PORTA", "0"))
+METRICAS_ARQUIVO = os.environ.get("MELODIA_METRICAS_ARQUIVO", "")
+WORKSPACE_DIR = os.path.abspath("workspace")
+# texto extraído por página, reaproveitado entre uploads e reprocessamentos (vazio = desligado)
+CACHE_PAGINAS = os.environ.get("MELODIA_CACHE_PAGINAS", os.path.join(WORKSPACE_DIR, "cache_paginas.sqlite"))
+# prévia: extrai primeiro os N meses mais recentes e completa o resto em segundo plano (0 = desligado)
+PREVIA_MESES = int(os.environ.get("MELODIA_PREVIA_MESES", "6"))
+
 
 # -----------------------------
 # Styling (Dark + Hurst Yellow)
@@ -123,70 +156,6 @@ st.markdown(
 # -----------------------------
 # Helpers
 # -----------------------------
-def ensure_datetime(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    if df is None or df.empty or col not in df.columns:
-        return df
-    df = df.copy()
-    df[col] = pd.to_datetime(df[col], errors="coerce")
-    return df
-
-
-def add_period_cols(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
-    """Cria colunas PERIODO_DIA / MES / TRIM / ANO baseadas em date_col."""
-    if df is None or df.empty or date_col not in df.columns:
-        return df
-
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col])
-
-    if df.empty:
-        return df
-
-    df["PERIODO_DIA"] = df[date_col].dt.date.astype(str)           # YYYY-MM-DD
-    df["PERIODO_MES"] = df[date_col].dt.to_period("M").astype(str) # YYYY-MM
-    q = df[date_col].dt.to_period("Q").astype(str)                 # 2025Q3
-    df["PERIODO_TRIM"] = q.str.replace("Q", "-Q", regex=False)     # 2025-Q3
-    df["PERIODO_ANO"] = df[date_col].dt.year.astype(str)           # YYYY
-    return df
-
-
-def filter_by_mode(df: pd.DataFrame, mode: str, date_col: str, selection):
-    """
-    mode: "Dia"|"Mês"|"Trimestre"|"Ano"
-    selection:
-      - Dia: (start_ts, end_ts)
-      - Mês/Trimestre/Ano: list[str]
-    """
-    if df is None or df.empty:
-        return df
-
-    if mode == "Dia":
-        start_ts, end_ts = selection
-        if date_col not in df.columns:
-            return df
-        df2 = df.copy()
-        df2[date_col] = pd.to_datetime(df2[date_col], errors="coerce")
-        return df2[(df2[date_col] >= start_ts) & (df2[date_col] <= end_ts)]
-
-    col_map = {"Mês": "PERIODO_MES", "Trimestre": "PERIODO_TRIM", "Ano": "PERIODO_ANO"}
-    pcol = col_map.get(mode)
-    if not pcol or pcol not in df.columns:
-        return df
-
-    sel_list = selection or []
-    if not sel_list:
-        return df.iloc[0:0]  # nada selecionado => vazio
-    return df[df[pcol].isin(sel_list)]
-
-
-def unique_sorted(df: pd.DataFrame, col: str):
-    if df is None or df.empty or col not in df.columns:
-        return []
-    vals = df[col].dropna().astype(str).unique().tolist()
-    return sorted(vals)
-
-
 def currency_fmt(v: float) -> str:
     if v is None:
         return "—"
@@ -197,6 +166,8 @@ def currency_fmt(v: float) -> str:
 
 
 def fig_bar(df, x, y, color=None):
+    import plotly.express as px
+
     # barras amarelas por padrão
     if color:
         fig = px.bar(df, x=x, y=y, color=color)
@@ -215,6 +186,8 @@ def fig_bar(df, x, y, color=None):
 
 
 def fig_line(df, x, y, color=None, markers=True):
+    import plotly.express as px
+
     # linha amarela quando é série única; multi-série usa paleta amarelo→branco
     if color:
         fig = px.line(df, x=x, y=y, color=color, markers=markers,
@@ -230,11 +203,382 @@ def fig_line(df, x, y, color=None, markers=True):
     return fig
 
 
+def fig_pie(df, names, values):
+    import plotly.express as px
+
+    fig = px.pie(df, names=names, values=values,
+                 color_discrete_sequence=[HURST_YELLOW, "#EDEDED", "#CFCFCF", "#AFAFAF"])
+    fig.update_layout(plot_bgcolor=BG, paper_bgcolor=BG, font_color=TEXT)
+    return fig
+
+
+# Limites do que é enviado ao navegador (independe do tamanho do catálogo)
+MAX_OPCOES_OBRAS = 50      # opções no seletor de obras por busca
+MAX_SELECAO_OBRAS = 20     # obras comparadas ao mesmo tempo
+LINHAS_POR_PAGINA = 100    # linhas por página nas tabelas
+
+
+def top_n_com_outros(df: pd.DataFrame, label_col: str, value_col: str, n: int, rotulo: str = "Outras") -> pd.DataFrame:
+    """
+    df já agregado e ordenado (decrescente) por value_col.
+    Mantém as n primeiras linhas e soma o restante numa linha "Outras (k)".
+    """
+    if df is None or len(df) <= n:
+        return df
+    top = df.head(n)
+    resto = df.iloc[n:]
+    outros = pd.DataFrame({label_col: [f"{rotulo} ({len(resto)})"], value_col: [resto[value_col].sum()]})
+    return pd.concat([top[[label_col, value_col]], outros], ignore_index=True)
+
+
+def buscar_obras(ranking: pd.DataFrame, termo: str, limite: int = MAX_OPCOES_OBRAS) -> list:
+    """Obras do ranking que casam com termo (nome ou Código ECAD, sem acento/caixa), na ordem do ranking."""
+    if not termo:
+        return ranking["Nome Obra"].head(limite).tolist()
+    estado = estado_derivado()
+    indice = indice_obras(caminho_historico(), estado.versao, estado.tabelas()[2])
+    return indice.buscar(termo, ordem=ranking["Nome Obra"], limite=limite)
+
+
+def tabela_paginada(df: pd.DataFrame, key: str, page_size: int = LINHAS_POR_PAGINA):
+    """Mostra df em páginas: só a página atual vai para o navegador."""
+    if df is None or df.empty:
+        st.dataframe(df, use_container_width=True)
+        return
+    n_paginas = (len(df) - 1) // page_size + 1
+    if n_paginas > 1:
+        pagina = st.number_input(
+            f"Página (de {n_paginas}, {len(df)} linhas)", min_value=1, max_value=n_paginas, value=1, key=key
+        )
+    else:
+        pagina = 1
+    inicio = (pagina - 1) * page_size
+    st.dataframe(para_reais(df.iloc[inicio:inicio + page_size]), use_container_width=True)
+
+
+def _arquivo_em_reais(df: pd.DataFrame, formato: str) -> bytes:
+    return to_bytes(para_reais(df), formato)
+
+
+def download_buttons(df: pd.DataFrame, nome: str, formato: str, key: str):
+    # o arquivo só é gerado (em blocos) quando o usuário clica no botão
+    st.download_button(
+        f"Baixar {nome} (.{formato})",
+        data=partial(_arquivo_em_reais, df, formato),
+        file_name=f"{nome.lower()}_filtrado.{formato}",
+        mime=MIME[formato],
+        on_click="ignore",
+        disabled=df is None or df.empty,
+        key=key,
+    )
+
+
+def caminho_historico() -> str:
+    """
+    SQLite do histórico desta sessão: o catálogo do link (?catalogo=...), criado
+    na primeira visita. Quem não tem o link não vê nem altera os meses gravados.
+    """
+    if HISTORICO_PATH:
+        return HISTORICO_PATH
+    chave = st.query_params.get("catalogo", "")
+    if not historico.chave_catalogo_valida(chave):
+        chave = uuid.uuid4().hex
+        st.query_params["catalogo"] = chave
+    return historico.caminho_catalogo(chave, HISTORICOS_DIR)
+
+
+def estado_derivado() -> EstadoIncremental:
+    """Estado derivado da sessão: cada rerun só aplica os arquivos que entraram/saíram."""
+    if "estado_derivado" not in st.session_state:
+        st.session_state["estado_derivado"] = EstadoIncremental(preparar=adicionar_periodos)
+    return st.session_state["estado_derivado"]
+
+
+@st.cache_resource(show_spinner=False)
+def pool_extracao() -> PoolExtracao:
+    """Pool de workers pré-aquecidos, um por servidor, compartilhado entre sessões."""
+    return PoolExtracao(max_workers=MAX_WORKERS)
+
+
+@st.cache_resource(show_spinner=False)
+def cache_figuras() -> CacheFiguras:
+    """Figuras montadas, por impressão digital do frame agregado + parâmetros (um cache por servidor)."""
+    return CacheFiguras()
+
+
+def grafico(construir, df: pd.DataFrame, **parametros):
+    """st.plotly_chart de construir(df, **parametros), reaproveitando a figura se a entrada não mudou."""
+    st.plotly_chart(cache_figuras().obter(construir, df, **parametros), use_container_width=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def indice_obras(caminho: str, versao: frozenset, _obras: pd.DataFrame) -> IndiceObras:
+    """Índice de busca de obras, um por versão do histórico, compartilhado entre sessões (montar leva ~1 s)."""
+    return IndiceObras.do_frame(_obras)
+
+
+@st.cache_resource(show_spinner=False)
+def telemetria() -> bool:
+    """Liga a exposição de métricas uma vez por servidor."""
+    metricas.coletor(lambda: metricas.definir("melodia_workspace_bytes", metricas.uso_disco(WORKSPACE_DIR)))
+    if METRICAS_PORTA:
+        try:
+            metricas.servir(METRICAS_PORTA)
+        except OSError as e:
+            logger.warning(f"⚠️ Porta de métricas {METRICAS_PORTA} indisponível: {e}")
+    if METRICAS_ARQUIVO:
+        metricas.gravar_periodicamente(METRICAS_ARQUIVO)
+    return True
+
+
+# -----------------------------
+# Painéis (fragments: uma interação reexecuta só o painel afetado)
+# -----------------------------
+@st.fragment
+def painel_rubricas(q_rub: Consulta):
+    st.subheader("Rubricas — Ranking e Drilldown")
+    if q_rub.vazia:
+        st.info("Sem dados de rubricas no filtro.")
+        return
+
+    colA, colB = st.columns([1.2, 1])
+    with colA:
+        modelos = ["(Todos)"] + q_rub.valores("Rubrica_Modelo")
+        sel_modelo = st.selectbox("Filtrar por Rubrica Modelo", modelos, key="rub_sel_modelo")
+    with colB:
+        topn = st.slider("Top N", 5, 50, 15, key="rub_topn")
+
+    q_f = q_rub if sel_modelo == "(Todos)" else q_rub.onde("Rubrica_Modelo", [sel_modelo])
+
+    by_modelo = q_f.somar("Rubrica_Modelo")
+    top_modelos = para_reais(by_modelo.head(topn))
+    grafico(fig_bar, top_modelos, x="Rubrica_Modelo", y="TOTAL GERAL")
+    st.dataframe(top_modelos, use_container_width=True)
+
+    st.markdown("#### Drilldown: Rubricas dentro do Modelo")
+    modelo_drill = st.selectbox(
+        "Escolha um modelo para detalhar",
+        options=q_f.valores("Rubrica_Modelo"),
+        key="rub_drill_modelo"
+    )
+    by_rubrica = para_reais(q_f.onde("Rubrica_Modelo", [modelo_drill]).somar("RUBRICA").head(topn))
+    grafico(fig_bar, by_rubrica, x="RUBRICA", y="TOTAL GERAL")
+    st.dataframe(by_rubrica, use_container_width=True)
+
+
+@st.fragment
+def painel_categorias(q_cat: Consulta):
+    st.subheader("Categorias — Distribuição e Evolução")
+    if q_cat.vazia:
+        st.info("Sem dados de categorias no filtro.")
+        return
+
+    colA, colB = st.columns([1, 1])
+    with colA:
+        topn = st.slider("Top N categorias", 5, 30, 12, key="cat_topn")
+    with colB:
+        modo = st.radio("Visual", ["Barras", "Pizza (share)"], horizontal=True, key="cat_mode")
+
+    by_cat = q_cat.somar("CATEGORIA")
+
+    if modo == "Barras":
+        grafico(fig_bar, para_reais(by_cat.head(topn)), x="CATEGORIA", y="TOTAL GERAL")
+    else:
+        pie = para_reais(top_n_com_outros(by_cat, "CATEGORIA", "TOTAL GERAL", min(topn, 12)))
+        grafico(fig_pie, pie, names="CATEGORIA", values="TOTAL GERAL")
+
+    if len(q_cat.valores("PERIODO_MES")) >= 2:
+        evol = para_reais(q_cat.somar(["PERIODO_MES", "CATEGORIA"], ordenar_por="PERIODO_MES"))
+        grafico(fig_line, evol, x="PERIODO_MES", y="TOTAL GERAL", color="CATEGORIA")
+    else:
+        st.caption("Evolução mensal aparece quando houver 2+ meses no filtro.")
+
+
+@st.fragment
+def painel_obras(q_obr: Consulta):
+    st.subheader("Obras — Evolução mês a mês (comparação)")
+    colunas = q_obr.coletar().columns
+    if q_obr.vazia or "Nome Obra" not in colunas or "Rateio" not in colunas:
+        st.info("Sem dados suficientes de obras no filtro.")
+        return
+
+    if "PERIODO_MES" not in colunas:
+        st.info("Sem informação de mês nas obras.")
+        return
+
+    by_obra_all = q_obr.somar("Nome Obra")
+
+    # sugestão automática (top 5 do filtro), refeita quando o filtro muda;
+    # obras que saíram do filtro deixam a seleção (viravam linhas vazias no gráfico)
+    nomes = by_obra_all["Nome Obra"]
+    if st.session_state.get("obr_filtro") != q_obr.chave:
+        st.session_state["obr_filtro"] = q_obr.chave
+        st.session_state["obr_sel"] = nomes.head(5).tolist()
+    else:
+        presentes = set(nomes[nomes.isin(st.session_state.get("obr_sel", []))])
+        st.session_state["obr_sel"] = [n for n in st.session_state.get("obr_sel", []) if n in presentes]
+
+    # busca no servidor: o seletor só recebe as obras encontradas + as já selecionadas
+    termo = st.text_input("Buscar obra", key="obr_busca", placeholder="Digite parte do nome ou o Código ECAD")
+    encontradas = buscar_obras(by_obra_all, termo)
+    opcoes = list(dict.fromkeys(st.session_state["obr_sel"] + encontradas))
+
+    obras_sel = st.multiselect(
+        "Selecione obras para comparar",
+        options=opcoes,
+        max_selections=MAX_SELECAO_OBRAS,
+        key="obr_sel"
+    )
+
+    st.markdown("#### Ranking geral (no filtro)")
+    topn = st.slider("Top N (ranking)", 5, 50, 15, key="obr_topn")
+    by_obra = para_reais(top_n_com_outros(by_obra_all, "Nome Obra", "Rateio", topn))
+    grafico(fig_bar, by_obra, x="Nome Obra", y="Rateio")
+    st.dataframe(by_obra, use_container_width=True)
+
+    st.markdown("#### Evolução mensal (obras selecionadas)")
+    if not obras_sel:
+        st.info("Selecione pelo menos 1 obra.")
+    else:
+        serie = q_obr.onde("Nome Obra", obras_sel)
+        obra_month = para_reais(serie.somar(["PERIODO_MES", "Nome Obra"], ordenar_por="PERIODO_MES"))
+        grafico(fig_line, obra_month, x="PERIODO_MES", y="Rateio", color="Nome Obra")
+        st.dataframe(obra_month, use_container_width=True)
+
+
+# agrupamento do painel de crescimento -> (tabela do histórico, coluna)
+BASES_CRESCIMENTO = {
+    "Rubrica Modelo": ("rubricas", "Rubrica_Modelo"),
+    "Rubrica": ("rubricas", "RUBRICA"),
+    "Categoria": ("categorias", "CATEGORIA"),
+    "Obra": ("obras", "Código ECAD"),  # títulos iguais podem ser obras diferentes
+}
+
+
+def exibir_janelas(df: pd.DataFrame) -> pd.DataFrame:
+    """Saída de analitico.janelas para exibição: valores em reais, variações em % e p.p."""
+    out = para_reais(df, analitico.COLUNAS_VALOR)
+    for c in analitico.COLUNAS_VALOR:
+        out[c] = out[c].astype("float64")
+    for c in analitico.COLUNAS_RAZAO:
+        out[c] = (out[c] * 100).round(1)
+    return out.rename(columns={c: f"{c} ({'p.p.' if c == 'Var Part 12M' else '%'})" for c in analitico.COLUNAS_RAZAO})
+
+
+def rotular(df: pd.DataFrame, chave: str):
+    """(df, coluna de rótulo dos gráficos): obras aparecem como "Nome Obra (Código ECAD)"."""
+    if chave != "Código ECAD":
+        return df, chave
+    return df.assign(Obra=df["Nome Obra"].fillna("(Sem nome)") + " (" + df[chave].astype(str) + ")"), "Obra"
+
+
+@st.fragment
+def painel_crescimento(meses_filtro: list):
+    st.subheader("Crescimento — Ano contra ano e acumulados móveis")
+    if not meses_filtro:
+        st.info("Sem meses no filtro.")
+        return
+
+    colA, colB, colC = st.columns([1, 1, 1])
+    with colA:
+        base = st.selectbox("Agrupar por", list(BASES_CRESCIMENTO), key="cres_base")
+    with colB:
+        mes_ref = st.selectbox("Mês de referência", meses_filtro, index=len(meses_filtro) - 1, key="cres_mes")
+    with colC:
+        topn = st.slider("Top N", 5, 50, 15, key="cres_topn")
+
+    # janelas sobre o histórico inteiro (o ano anterior pode estar fora do filtro)
+    tabela, chave = BASES_CRESCIMENTO[base]
+    jan = estado_derivado().janelas(tabela, chave)
+    no_mes = jan[jan["PERIODO_MES"] == mes_ref]
+    if no_mes.empty:
+        st.info(f"Sem dados de {base.lower()} em {mes_ref}.")
+        return
+    if no_mes["Acum 12M"].isna().all():
+        st.caption("Acumulado 12M e variações anuais aparecem com 12+ meses de histórico antes do mês.")
+
+    st.markdown("#### Ranking no mês (acumulado 12M)")
+    ranking = no_mes.sort_values(["Acum 12M", "Valor"], ascending=False, na_position="last").head(topn)
+    st.dataframe(exibir_janelas(ranking), use_container_width=True)
+
+    st.markdown("#### Maiores mudanças de participação (12M contra o ano anterior)")
+    mudancas = no_mes.dropna(subset=["Var Part 12M"])
+    mudancas = mudancas.loc[mudancas["Var Part 12M"].abs().sort_values(ascending=False).index[:topn]]
+    if mudancas.empty:
+        st.caption("Mudança de participação aparece com 24+ meses de histórico antes do mês.")
+    else:
+        mudancas, rotulo = rotular(mudancas, chave)
+        grafico(fig_bar, exibir_janelas(mudancas), x=rotulo, y="Var Part 12M (p.p.)")
+
+    st.markdown("#### Acumulado móvel 12M (top 5 do ranking)")
+    serie = jan[jan[chave].isin(ranking[chave].head(5)) & jan["PERIODO_MES"].isin(meses_filtro)]
+    serie = serie.dropna(subset=["Acum 12M"])
+    if serie.empty:
+        st.caption("Sem meses com 12 meses de histórico no filtro.")
+    else:
+        serie, rotulo = rotular(serie, chave)
+        grafico(fig_line, exibir_janelas(serie), x="PERIODO_MES", y="Acum 12M", color=rotulo)
+
+
+@st.fragment
+def secao_analises(q_cat: Consulta, q_rub: Consulta, q_obr: Consulta):
+    # on_change="rerun" liga o estado das abas: trocar de aba reexecuta só esta seção
+    tab1, tab2, tab3, tab4 = st.tabs(["Rubricas", "Categorias", "Obras", "Crescimento"], on_change="rerun",
+                                     key="abas_analise")
+    with tab1:
+        if tab1.open:
+            painel_rubricas(q_rub)
+    with tab2:
+        if tab2.open:
+            painel_categorias(q_cat)
+    with tab3:
+        if tab3.open:
+            painel_obras(q_obr)
+    with tab4:
+        if tab4.open:
+            meses_filtro = sorted(set().union(*(q.valores("PERIODO_MES") for q in (q_cat, q_rub, q_obr))))
+            painel_crescimento(meses_filtro)
+
+
+@st.fragment
+def painel_debug(df_cat_f: pd.DataFrame, df_rub_f: pd.DataFrame, df_obr_f: pd.DataFrame):
+    exp = st.expander("Ver tabelas (debug)", expanded=False, on_change="rerun", key="exp_debug")
+    if not exp.open:
+        return
+    with exp:
+        st.subheader("Categorias (filtrado)")
+        tabela_paginada(df_cat_f, key="pag_cat")
+
+        st.subheader("Rubricas (filtrado)")
+        tabela_paginada(df_rub_f, key="pag_rub")
+
+        st.subheader("Obras (filtrado e reconciliado)")
+        tabela_paginada(df_obr_f, key="pag_obr")
+
+
+@st.fragment
+def painel_exportacao(df_cat_f: pd.DataFrame, df_rub_f: pd.DataFrame, df_obr_f: pd.DataFrame):
+    with st.expander("Exportar tabelas filtradas", expanded=False):
+        formato = st.radio("Formato", list(FORMATOS), horizontal=True, key="export_formato")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            download_buttons(df_cat_f, "Categorias", formato, key="dl_cat")
+        with c2:
+            download_buttons(df_rub_f, "Rubricas", formato, key="dl_rub")
+        with c3:
+            download_buttons(df_obr_f, "Obras", formato, key="dl_obr")
+
+
 # -----------------------------
 # Sidebar (Upload + Filtros)
 # -----------------------------
 with st.sidebar:
     st.markdown("### Upload")
+    titular = st.text_input("Titular", value="Meu catálogo", key="titular").strip() or "Meu catálogo"
+    substituir = st.checkbox(
+        "Substituir meses já importados de outro arquivo", key="substituir",
+        help="Sem isso, um PDF com meses que já vieram de outro demonstrativo não é gravado.",
+    )
     uploaded_files = st.file_uploader(
         "Envie um ou mais PDFs do ECAD",
         type=["pdf"],
@@ -249,77 +593,167 @@ with st.sidebar:
 
 
 # -----------------------------
-# Main
+# Prévia: meses anteriores em segundo plano
 # -----------------------------
-if not uploaded_files:
-    st.info("Envie um ou mais PDFs para começar.")
-    st.stop()
-
-run_id = str(uuid.uuid4())[:8]
-base_run_dir = os.path.join("workspace", run_id)
-os.makedirs(base_run_dir, exist_ok=True)
-
-base_rubricas_path = os.path.join("bases", "Base_Rubrica_Original.xlsx")
-
-dfs_cat, dfs_rub, dfs_obr = [], [], []
-
-with st.status("Processando PDFs...", expanded=True) as status:
-    for i, uploaded in enumerate(uploaded_files, start=1):
-        status.update(label=f"Processando {uploaded.name} ({i}/{len(uploaded_files)})")
+@st.fragment(run_every=2)
+def acompanhar_restantes():
+    """Grava no histórico os meses anteriores dos PDFs em prévia assim que o pool termina."""
+    pendentes = st.session_state.get("restantes", [])
+    prontos = [p for p in pendentes if p["futuro"].done()]
+    if len(prontos) < len(pendentes):
+        st.caption(f"⏳ Carregando meses anteriores de {len(pendentes) - len(prontos)} arquivo(s)...")
+    if not prontos:
+        return
+
+    conn_restantes = historico.conectar(caminho_historico())
+    for p in prontos:
+        try:
+            df_cat, df_rub, df_obr = p["futuro"].result()
+            historico.salvar(conn_restantes, p["titular"], p["hash"], p["nome"], df_cat, df_rub, df_obr,
+                             substituir=p["substituir"])
+            st.toast(f"{p['nome']}: histórico completo.")
+        except historico.MesesDeOutroArquivo as e:
+            st.toast(f"{p['nome']}: meses anteriores não gravados; {e}.")
+        except LimiteExcedido as e:
+            # a prévia fica gravada como incompleta: reenviar o arquivo extrai tudo de novo
+            st.toast(f"{p['nome']}: meses anteriores interrompidos ({e.motivo}).")
+        except Exception as e:
+            logger.exception(f"❌ Meses anteriores de {p['nome']} falharam")
+            st.toast(f"{p['nome']}: erro nos meses anteriores ({e}).")
+    conn_restantes.close()
 
-        pdf_dir = os.path.join(base_run_dir, f"{i:03d}_{uploaded.name.replace('.pdf','')}")
-        os.makedirs(pdf_dir, exist_ok=True)
+    # só sai o que foi gravado acima: um job que terminou depois de prontos fica para a próxima volta
+    st.session_state["restantes"] = [p for p in pendentes if p not in prontos]
+    st.rerun()  # o app inteiro: filtros e painéis passam a ver os meses novos
 
-        pdf_path = os.path.join(pdf_dir, uploaded.name)
-        with open(pdf_path, "wb") as f:
-            f.write(uploaded.getbuffer())
 
-        try:
-            df_cat, df_rub, df_obr = process_uploaded_pdf(
+# -----------------------------
+# Main
+# -----------------------------
+conn = historico.conectar(caminho_historico())
+telemetria()
+
+# Só extrai o que ainda não está no histórico do titular (nem em andamento nesta sessão)
+em_andamento = {p["hash"] for p in st.session_state.get("restantes", [])}
+novos = []
+for uploaded in uploaded_files or []:
+    arquivo_hash = historico.hash_arquivo(uploaded.getvalue())
+    importado = historico.arquivo_importado(conn, titular, arquivo_hash)
+    metricas.cache("historico", acerto=importado)
+    if not importado and arquivo_hash not in em_andamento:
+        novos.append((uploaded, arquivo_hash))
+
+if novos:
+    run_id = str(uuid.uuid4())[:8]
+    base_run_dir = os.path.join(WORKSPACE_DIR, run_id)
+    os.makedirs(base_run_dir, exist_ok=True)
+
+    base_rubricas_path = os.path.abspath(os.path.join("bases", "Base_Rubrica_Original.xlsx"))
+    sessao_id = st.session_state.setdefault("sessao_id", str(uuid.uuid4()))
+    pool = pool_extracao()
+
+    with st.status("Processando PDFs...", expanded=True) as status:
+        jobs = []
+        for i, (uploaded, arquivo_hash) in enumerate(novos, start=1):
+            pdf_dir = os.path.join(base_run_dir, f"{i:03d}_{uploaded.name.replace('.pdf','')}")
+            os.makedirs(pdf_dir, exist_ok=True)
+
+            pdf_path = os.path.join(pdf_dir, uploaded.name)
+            with open(pdf_path, "wb") as f:
+                f.write(uploaded.getbuffer())
+
+            parametros = dict(
                 pdf_path=pdf_path,
                 base_dir=pdf_dir,
-                base_rubricas_path=base_rubricas_path
+                base_rubricas_path=base_rubricas_path,
+                obras_agregadas=True,  # o dashboard só usa totais por (mês, obra)
+                modo_tabelas=MODO_TABELAS,
+                cache_paginas=CACHE_PAGINAS or None,
+                limites=Limites(
+                    timeout_s=TIMEOUT_S,
+                    max_paginas=MAX_PAGINAS,
+                    max_memoria_mb=MAX_MEMORIA_MB,
+                    arquivo_cancelamento=os.path.join(pdf_dir, "CANCELAR"),
+                ),
             )
+            # com prévia, o job espera só os meses mais recentes; o resto vai depois
+            meses = slice(-PREVIA_MESES, None) if PREVIA_MESES else None
+            try:
+                futuro = pool.submit(sessao_id, meses=meses, **parametros)
+            except FilaCheia as e:
+                # backpressure: o arquivo continua no upload e entra numa próxima execução
+                st.warning(f"{uploaded.name} aguardando: {e}")
+                continue
+            jobs.append((uploaded, arquivo_hash, futuro, parametros))
+
+        for i, (uploaded, arquivo_hash, futuro, parametros) in enumerate(jobs, start=1):
+            status.update(label=f"Processando {uploaded.name} ({i}/{len(jobs)})")
+            try:
+                df_cat, df_rub, df_obr = futuro.result()
+                pasta_meses = os.path.join(parametros["base_dir"], "s_pdf_organizados")
+                completo = not PREVIA_MESES or len(carregar_indice(pasta_meses)) <= PREVIA_MESES
+                historico.salvar(conn, titular, arquivo_hash, uploaded.name, df_cat, df_rub, df_obr,
+                                 completo=completo, substituir=substituir)
+                if not completo:
+                    restante = pool.submit(sessao_id, meses=slice(None, -PREVIA_MESES), **parametros)
+                    st.session_state.setdefault("restantes", []).append(
+                        {"titular": titular, "hash": arquivo_hash, "nome": uploaded.name,
+                         "substituir": substituir, "futuro": restante}
+                    )
+                    st.write(f"{uploaded.name}: últimos {PREVIA_MESES} meses prontos; "
+                             "os anteriores seguem em segundo plano.")
+
+            except historico.MesesDeOutroArquivo as e:
+                st.warning(f"{uploaded.name} não gravado: {e}. Marque \"Substituir meses já importados\" "
+                           "para trocar pelos deste arquivo.")
+            except LimiteExcedido as e:
+                # só este arquivo para; os demais do lote seguem normalmente
+                st.error(f"{uploaded.name} interrompido ({e.motivo}): {e.detalhe}")
+            except FilaCheia as e:
+                # a prévia já está no histórico (incompleta): reenviar completa
+                st.warning(f"{uploaded.name}: meses anteriores não enfileirados: {e}")
+            except Exception as e:
+                st.error(f"Erro ao processar {uploaded.name}")
+                st.exception(e)
+
+        status.update(label="Processamento concluído!", state="complete")
+
+if st.session_state.get("restantes"):
+    acompanhar_restantes()
+
+titulares_disponiveis = historico.titulares(conn)
+if not titulares_disponiveis:
+    conn.close()
+    st.info("Envie um ou mais PDFs para começar.")
+    st.stop()
 
-            if isinstance(df_cat, pd.DataFrame) and not df_cat.empty:
-                dfs_cat.append(df_cat)
-            if isinstance(df_rub, pd.DataFrame) and not df_rub.empty:
-                dfs_rub.append(df_rub)
-            if isinstance(df_obr, pd.DataFrame) and not df_obr.empty:
-                dfs_obr.append(df_obr)
-
-        except Exception as e:
-            st.error(f"Erro ao processar {uploaded.name}")
-            st.exception(e)
-
-    status.update(label="Processamento concluído!", state="complete")
-
-# Consolidar
-df_cat = pd.concat(dfs_cat, ignore_index=True) if dfs_cat else pd.DataFrame()
-df_rub = pd.concat(dfs_rub, ignore_index=True) if dfs_rub else pd.DataFrame()
-df_obr = pd.concat(dfs_obr, ignore_index=True) if dfs_obr else pd.DataFrame()
+with st.sidebar:
+    st.markdown("---")
+    st.markdown("### Histórico")
+    titulares_sel = st.multiselect(
+        "Titulares",
+        titulares_disponiveis,
+        default=[titular] if titular in titulares_disponiveis else titulares_disponiveis[:1],
+        key="titulares_sel"
+    )
+    if not HISTORICO_PATH:
+        st.caption("O histórico fica neste link: guarde-o para voltar aos mesmos meses.")
 
-# Normalizar datas e criar colunas de período
-df_cat = ensure_datetime(df_cat, "DATA REFERENTE")
-df_rub = ensure_datetime(df_rub, "DATA REFERENTE")
-df_obr = ensure_datetime(df_obr, "Data")
+# Consolidar: só os arquivos que entraram/saíram do histórico desde o último rerun
+# (colunas de período, listas de mês/trim/ano, datas e totais mantidos por delta)
+estado = estado_derivado()
+estado.atualizar(conn, titulares_sel)
+conn.close()
 
-df_cat = add_period_cols(df_cat, "DATA REFERENTE")
-df_rub = add_period_cols(df_rub, "DATA REFERENTE")
-df_obr = add_period_cols(df_obr, "Data")
 
 # Range global (modo Dia) e listas (mês/trim/ano)
-all_dates = []
-for df, col in [(df_cat, "DATA REFERENTE"), (df_rub, "DATA REFERENTE"), (df_obr, "Data")]:
-    if df is not None and not df.empty and col in df.columns:
-        all_dates.extend([df[col].min(), df[col].max()])
-all_dates = [d for d in all_dates if pd.notna(d)]
-min_dt = min(all_dates) if all_dates else pd.to_datetime("2000-01-01")
-max_dt = max(all_dates) if all_dates else pd.to_datetime("2000-01-01")
-
-months = sorted(set(unique_sorted(df_cat, "PERIODO_MES") + unique_sorted(df_rub, "PERIODO_MES") + unique_sorted(df_obr, "PERIODO_MES")))
-quarters = sorted(set(unique_sorted(df_cat, "PERIODO_TRIM") + unique_sorted(df_rub, "PERIODO_TRIM") + unique_sorted(df_obr, "PERIODO_TRIM")))
-years = sorted(set(unique_sorted(df_cat, "PERIODO_ANO") + unique_sorted(df_rub, "PERIODO_ANO") + unique_sorted(df_obr, "PERIODO_ANO")))
+min_dt, max_dt = estado.intervalo_datas()
+min_dt = min_dt if min_dt is not None else pd.to_datetime("2000-01-01")
+max_dt = max_dt if max_dt is not None else pd.to_datetime("2000-01-01")
+
+months = estado.periodos("PERIODO_MES")
+quarters = estado.periodos("PERIODO_TRIM")
+years = estado.periodos("PERIODO_ANO")
 
 # UI do filtro (na sidebar)
 with st.sidebar:
@@ -343,46 +777,37 @@ with st.sidebar:
         default = years[-3:] if len(years) >= 3 else years
         sel = st.multiselect("Selecione ano(s)", years, default=default)
 
-# Aplicar filtro
-df_cat_f = filter_by_mode(df_cat, filter_mode, "DATA REFERENTE", sel)
-df_rub_f = filter_by_mode(df_rub, filter_mode, "DATA REFERENTE", sel)
-df_obr_f = filter_by_mode(df_obr, filter_mode, "Data", sel)
-
-# Totais + Reconciliação
-total_cat = 0.0
-total_rub = 0.0
-total_obr = 0.0
-
-if not df_cat_f.empty and "TOTAL GERAL" in df_cat_f.columns:
-    total_cat = pd.to_numeric(df_cat_f["TOTAL GERAL"], errors="coerce").fillna(0).sum()
-
-if not df_rub_f.empty and "TOTAL GERAL" in df_rub_f.columns:
-    total_rub = pd.to_numeric(df_rub_f["TOTAL GERAL"], errors="coerce").fillna(0).sum()
-
-if not df_obr_f.empty and "Rateio" in df_obr_f.columns:
-    df_obr_f = df_obr_f.copy()
-    df_obr_f["Rateio"] = pd.to_numeric(df_obr_f["Rateio"], errors="coerce").fillna(0.0)
-    total_obr = df_obr_f["Rateio"].sum()
-
-# Reconciliação MVP: Obras bate com Rubricas
-if total_rub > 0 and total_obr > 0:
-    fator = total_rub / total_obr
-    if abs(1 - fator) > 0.01:
-        df_obr_f["Rateio"] = df_obr_f["Rateio"] * fator
-        total_obr = df_obr_f["Rateio"].sum()
-        st.caption(f"⚙️ Obras normalizado para bater com Rubricas (fator: {fator:.4f}).")
+# Aplicar filtro (consultas preguiçosas e memorizadas sobre o dataset da sessão;
+# obras já vem reconciliado mês a mês contra rubricas)
+ds = estado.dataset()
+q_cat = ds.tabela("categorias").periodo(filter_mode, sel)
+q_rub = ds.tabela("rubricas").periodo(filter_mode, sel)
+q_obr = ds.tabela("obras").periodo(filter_mode, sel)
+df_cat_f, df_rub_f, df_obr_f = q_cat.coletar(), q_rub.coletar(), q_obr.coletar()
+
+# Totais (centavos; convertidos para reais só na exibição)
+total_cat = q_cat.total()
+total_rub = q_rub.total()
+total_obr = q_obr.total()
+
+if total_obr:
+    fatores = ds.fatores
+    ajustados = fatores[fatores["divergente"] & fatores["PERIODO_MES"].isin(q_obr.valores("PERIODO_MES"))]
+    if not ajustados.empty:
+        detalhe = ", ".join(f"{m} ({f:.4f})" for m, f in zip(ajustados["PERIODO_MES"], ajustados["fator"]))
+        st.caption(f"⚙️ Obras normalizado para bater com Rubricas em {len(ajustados)} mês(es): {detalhe}.")
 
 # KPIs (Cards)
 k1, k2, k3 = st.columns(3)
 with k1:
     st.markdown('<div class="card"><h3>Total (Categorias)</h3></div>', unsafe_allow_html=True)
-    st.metric("", currency_fmt(total_cat))
+    st.metric("", currency_fmt(centavos_para_reais(total_cat)))
 with k2:
     st.markdown('<div class="card"><h3>Total (Rubricas)</h3></div>', unsafe_allow_html=True)
-    st.metric("", currency_fmt(total_rub))
+    st.metric("", currency_fmt(centavos_para_reais(total_rub)))
 with k3:
     st.markdown('<div class="card"><h3>Total (Obras)</h3></div>', unsafe_allow_html=True)
-    st.metric("", currency_fmt(total_obr))
+    st.metric("", currency_fmt(centavos_para_reais(total_obr)))
 
 st.markdown('<div class="divider-soft"></div>', unsafe_allow_html=True)
 
@@ -391,164 +816,17 @@ st.markdown('<div class="card"><h3>Evolução (Rubricas)</h3></div>', unsafe_all
 if df_rub_f.empty or "TOTAL GERAL" not in df_rub_f.columns or "PERIODO_MES" not in df_rub_f.columns:
     st.info("Sem dados suficientes.")
 else:
-    tmp = df_rub_f.copy()
-    tmp["TOTAL GERAL"] = pd.to_numeric(tmp["TOTAL GERAL"], errors="coerce").fillna(0)
-    rub_month = (
-        tmp.groupby("PERIODO_MES", as_index=False)["TOTAL GERAL"]
-           .sum()
-           .sort_values("PERIODO_MES")
-    )
-    st.plotly_chart(fig_bar(rub_month, x="PERIODO_MES", y="TOTAL GERAL"), use_container_width=True)
+    rub_month = para_reais(q_rub.somar("PERIODO_MES", ordenar_por="PERIODO_MES"))
+    grafico(fig_bar, rub_month, x="PERIODO_MES", y="TOTAL GERAL")
 
 st.markdown('<div class="divider-soft"></div>', unsafe_allow_html=True)
 
-# Abas detalhadas
+# Abas detalhadas (cada aba só é calculada quando está aberta)
 st.markdown('<div class="card"><h3>Análises detalhadas</h3></div>', unsafe_allow_html=True)
-tab1, tab2, tab3 = st.tabs(["Rubricas", "Categorias", "Obras"])
-
-with tab1:
-    st.subheader("Rubricas — Ranking e Drilldown")
-    if df_rub_f.empty:
-        st.info("Sem dados de rubricas no filtro.")
-    else:
-        tmp = df_rub_f.copy()
-        tmp["TOTAL GERAL"] = pd.to_numeric(tmp.get("TOTAL GERAL", 0), errors="coerce").fillna(0)
-        tmp["Rubrica_Modelo"] = tmp.get("Rubrica_Modelo", pd.Series(["Sem mapeamento"] * len(tmp))).fillna("Sem mapeamento")
-        tmp["RUBRICA"] = tmp.get("RUBRICA", pd.Series(["(Sem nome)"] * len(tmp))).fillna("(Sem nome)")
-
-        colA, colB = st.columns([1.2, 1])
-        with colA:
-            modelos = ["(Todos)"] + sorted(tmp["Rubrica_Modelo"].unique().tolist())
-            sel_modelo = st.selectbox("Filtrar por Rubrica Modelo", modelos, key="rub_sel_modelo")
-        with colB:
-            topn = st.slider("Top N", 5, 50, 15, key="rub_topn")
-
-        tmp_f = tmp if sel_modelo == "(Todos)" else tmp[tmp["Rubrica_Modelo"] == sel_modelo]
-
-        by_modelo = (
-            tmp_f.groupby("Rubrica_Modelo", as_index=False)["TOTAL GERAL"]
-                 .sum()
-                 .sort_values("TOTAL GERAL", ascending=False)
-        )
-        st.plotly_chart(fig_bar(by_modelo.head(topn), x="Rubrica_Modelo", y="TOTAL GERAL"), use_container_width=True)
-        st.dataframe(by_modelo.head(topn), use_container_width=True)
-
-        st.markdown("#### Drilldown: Rubricas dentro do Modelo")
-        modelo_drill = st.selectbox(
-            "Escolha um modelo para detalhar",
-            options=sorted(tmp_f["Rubrica_Modelo"].unique().tolist()),
-            key="rub_drill_modelo"
-        )
-        drill = tmp_f[tmp_f["Rubrica_Modelo"] == modelo_drill]
-        by_rubrica = (
-            drill.groupby("RUBRICA", as_index=False)["TOTAL GERAL"]
-                 .sum()
-                 .sort_values("TOTAL GERAL", ascending=False)
-                 .head(topn)
-        )
-        st.plotly_chart(fig_bar(by_rubrica, x="RUBRICA", y="TOTAL GERAL"), use_container_width=True)
-        st.dataframe(by_rubrica, use_container_width=True)
-
-with tab2:
-    st.subheader("Categorias — Distribuição e Evolução")
-    if df_cat_f.empty:
-        st.info("Sem dados de categorias no filtro.")
-    else:
-        tmp = df_cat_f.copy()
-        tmp["TOTAL GERAL"] = pd.to_numeric(tmp.get("TOTAL GERAL", 0), errors="coerce").fillna(0)
-        tmp["CATEGORIA"] = tmp.get("CATEGORIA", pd.Series(["(Sem nome)"] * len(tmp))).fillna("(Sem nome)")
-
-        colA, colB = st.columns([1, 1])
-        with colA:
-            topn = st.slider("Top N categorias", 5, 30, 12, key="cat_topn")
-        with colB:
-            modo = st.radio("Visual", ["Barras", "Pizza (share)"], horizontal=True, key="cat_mode")
-
-        by_cat = (
-            tmp.groupby("CATEGORIA", as_index=False)["TOTAL GERAL"]
-               .sum()
-               .sort_values("TOTAL GERAL", ascending=False)
-        )
-
-        if modo == "Barras":
-            st.plotly_chart(fig_bar(by_cat.head(topn), x="CATEGORIA", y="TOTAL GERAL"), use_container_width=True)
-        else:
-            pie = by_cat.head(min(topn, 12)).copy()
-            fig = px.pie(pie, names="CATEGORIA", values="TOTAL GERAL",
-                         color_discrete_sequence=[HURST_YELLOW, "#EDEDED", "#CFCFCF", "#AFAFAF"])
-            fig.update_layout(plot_bgcolor=BG, paper_bgcolor=BG, font_color=TEXT)
-            st.plotly_chart(fig, use_container_width=True)
-
-        if "PERIODO_MES" in tmp.columns and tmp["PERIODO_MES"].nunique() >= 2:
-            evol = (
-                tmp.groupby(["PERIODO_MES", "CATEGORIA"], as_index=False)["TOTAL GERAL"]
-                   .sum()
-                   .sort_values("PERIODO_MES")
-            )
-            st.plotly_chart(fig_line(evol, x="PERIODO_MES", y="TOTAL GERAL", color="CATEGORIA"), use_container_width=True)
-        else:
-            st.caption("Evolução mensal aparece quando houver 2+ meses no filtro.")
-
-with tab3:
-    st.subheader("Obras — Evolução mês a mês (comparação)")
-    if df_obr_f.empty or "Nome Obra" not in df_obr_f.columns or "Rateio" not in df_obr_f.columns:
-        st.info("Sem dados suficientes de obras no filtro.")
-    else:
-        tmp = df_obr_f.copy()
-        tmp["Rateio"] = pd.to_numeric(tmp["Rateio"], errors="coerce").fillna(0.0)
-        tmp["Nome Obra"] = tmp["Nome Obra"].fillna("(Sem nome)")
-
-        if "PERIODO_MES" not in tmp.columns:
-            st.info("Sem informação de mês nas obras.")
-        else:
-            obras = sorted(tmp["Nome Obra"].unique().tolist())
-
-            # sugestão automática (top 5 do filtro)
-            sugestao = (
-                tmp.groupby("Nome Obra", as_index=False)["Rateio"]
-                   .sum()
-                   .sort_values("Rateio", ascending=False)
-                   .head(5)["Nome Obra"]
-                   .tolist()
-            )
-
-            obras_sel = st.multiselect(
-                "Selecione obras para comparar",
-                options=obras,
-                default=sugestao
-            )
-
-            st.markdown("#### Ranking geral (no filtro)")
-            topn = st.slider("Top N (ranking)", 5, 50, 15, key="obr_topn")
-            by_obra = (
-                tmp.groupby("Nome Obra", as_index=False)["Rateio"]
-                   .sum()
-                   .sort_values("Rateio", ascending=False)
-                   .head(topn)
-            )
-            st.plotly_chart(fig_bar(by_obra, x="Nome Obra", y="Rateio"), use_container_width=True)
-            st.dataframe(by_obra, use_container_width=True)
-
-            st.markdown("#### Evolução mensal (obras selecionadas)")
-            if not obras_sel:
-                st.info("Selecione pelo menos 1 obra.")
-            else:
-                serie = tmp[tmp["Nome Obra"].isin(obras_sel)].copy()
-                obra_month = (
-                    serie.groupby(["PERIODO_MES", "Nome Obra"], as_index=False)["Rateio"]
-                         .sum()
-                         .sort_values("PERIODO_MES")
-                )
-                st.plotly_chart(fig_line(obra_month, x="PERIODO_MES", y="Rateio", color="Nome Obra"), use_container_width=True)
-                st.dataframe(obra_month, use_container_width=True)
+secao_analises(q_cat, q_rub, q_obr)
 
 # Tabelas (debug)
-with st.expander("Ver tabelas (debug)", expanded=False):
-    st.subheader("Categorias (filtrado)")
-    st.dataframe(df_cat_f, use_container_width=True)
-
-    st.subheader("Rubricas (filtrado)")
-    st.dataframe(df_rub_f, use_container_width=True)
+painel_debug(df_cat_f, df_rub_f, df_obr_f)
 
-    st.subheader("Obras (filtrado e reconciliado)")
-    st.dataframe(df_obr_f, use_container_width=True)
+# Exportação (tabelas do filtro atual)
+painel_exportacao(df_cat_f, df_rub_f, df_obr_f)
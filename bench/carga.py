@@ -0,0 +1,318 @@
+"""
+Teste de carga do dashboard: N sessões simultâneas do app.py no AppTest do
+Streamlit (sem navegador nem rede). Por padrão as sessões são threads de um
+processo só, como no servidor do Streamlit: dividem o que ele compartilha
+entre sessões (st.cache_resource: pool de extração, índice de busca de
+obras, cache de figuras) e a disputa por eles entra na latência. Com
+--processos cada sessão roda num processo próprio: CPU e memória saem por
+sessão, mas cada uma tem os próprios caches e nada é disputado.
+
+Cada sessão abre o app, envia os PDFs sintéticos (bench/sintetico.py) e faz
+um roteiro aleatório (semente = nº da sessão): troca o "Filtrar por", abre
+abas, move o slider de Top N da aba aberta e, no fim, abre as tabelas.
+O histórico (MELODIA_DB) é pré-populado com os mesmos PDFs, como num servidor
+em uso: o upload cai na deduplicação e o custo medido é o dos reruns. Com
+--extrair cada sessão usa um titular próprio e extrai os PDFs de novo.
+
+Relatório: percentis de latência por rerun (sem a primeira carga, que é
+medida por bench/startup.py), CPU e pico de memória (RSS) do servidor, ou
+por sessão com --processos.
+Sai com código 1 se o p95 passar do orçamento ou se alguma sessão falhar.
+
+Uso:
+  python bench/carga.py --sessoes 20 --rodadas 5 --budget-p95 2.0
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from bench.sintetico import gerar_pdf
+
+APP = os.path.join(RAIZ, "app.py")
+TITULAR = "Meu catálogo"  # valor padrão do campo Titular no app
+MODOS = ["Dia", "Mês", "Trimestre", "Ano"]
+SLIDER_POR_ABA = {"Rubricas": "rub_topn", "Categorias": "cat_topn", "Obras": "obr_topn"}
+PERCENTIS = (50, 90, 95, 99)
+
+
+# ----------------------------------------------------------------------
+# Preparação (processo principal)
+# ----------------------------------------------------------------------
+def preparar(pasta: str, n_pdfs: int, meses: int, obras: int, popular: bool = True):
+    """Gera os PDFs e, se popular, importa todos no histórico do TITULAR."""
+    # o app procura bases/ relativo ao diretório atual, que nas sessões é a pasta temporária
+    os.symlink(os.path.join(RAIZ, "bases"), os.path.join(pasta, "bases"))
+    pdfs = []
+    for i in range(n_pdfs):
+        caminho = os.path.join(pasta, f"sintetico_{i + 1:02d}.pdf")
+        # anos diferentes por arquivo: cada PDF traz meses novos
+        gerar_pdf(caminho, meses=meses, obras_por_mes=obras, semente=i + 1, ano_inicial=2015 + 2 * i)
+        pdfs.append(caminho)
+
+    db = os.path.join(pasta, "historico.sqlite")
+    if popular:
+        from pipeline import process_uploaded_pdf
+        from ecad_scripts import historico
+
+        conn = historico.conectar(db)
+        base_rubricas = os.path.join(RAIZ, "bases", "Base_Rubrica_Original.xlsx")
+        for i, pdf in enumerate(pdfs):
+            base_dir = os.path.join(pasta, "workspace", f"{i:03d}")
+            dfs = process_uploaded_pdf(pdf, base_dir, base_rubricas, obras_agregadas=True)
+            with open(pdf, "rb") as f:
+                arquivo_hash = historico.hash_arquivo(f.read())
+            historico.salvar(conn, TITULAR, arquivo_hash, os.path.basename(pdf), *dfs)
+        conn.close()
+    return db, pdfs
+
+
+# ----------------------------------------------------------------------
+# Sessões (threads de um runtime só ou, com --processos, um processo cada)
+# ----------------------------------------------------------------------
+def _pico_rss_mb() -> float:
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024  # bytes no macOS, KB no Linux
+
+
+def _arquivos_enviados(pdfs):
+    """UploadedFile de verdade, como o st.file_uploader devolveria."""
+    from streamlit.proto.Common_pb2 import FileURLs
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+    enviados = []
+    for caminho in pdfs:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+        registro = UploadedFileRec(caminho, os.path.basename(caminho), "application/pdf", dados)
+        enviados.append(UploadedFile(registro, FileURLs()))
+    return enviados
+
+
+# uploads de cada sessão (nº da sessão -> UploadedFile), lidos pelo file_uploader falso
+_ENVIADOS = {}
+
+
+def _preparar_processo(cfg: dict):
+    """Ambiente do app neste processo: histórico, pasta de trabalho e o file_uploader falso."""
+    os.environ["MELODIA_DB"] = cfg["db"]
+    os.environ["MELODIA_WORKERS"] = "1"
+    os.chdir(cfg["pasta"])  # workspace/ de cada job fica na pasta temporária
+    logging.disable(logging.WARNING)
+
+    import streamlit as st
+
+    # o AppTest não simula uploads: o app recebe a lista da sessão (o script
+    # roda na thread do AppTest, então a sessão vem do session_state)
+    st.file_uploader = lambda *args, **kwargs: list(_ENVIADOS.get(st.session_state.get("_carga_sessao"), []))
+
+
+def roteiro(indice: int, cfg: dict) -> dict:
+    """Uma sessão do app: latência de cada rerun e exceções."""
+    from streamlit.testing.v1 import AppTest
+
+    rnd = random.Random(indice)
+    at = AppTest.from_file(APP, default_timeout=cfg["timeout"])
+    at.session_state["_carga_sessao"] = indice
+    latencias, erros = [], []
+
+    def rodar(passo):
+        inicio = time.perf_counter()
+        at.run()
+        latencias.append((passo, time.perf_counter() - inicio))
+        erros.extend(str(e.value) for e in at.exception)
+
+    rodar("inicial")
+
+    if cfg["extrair"]:
+        at.text_input(key="titular").set_value(f"Sessão {indice}")
+    _ENVIADOS[indice] = _arquivos_enviados(cfg["pdfs"])
+    rodar("upload")
+
+    for _ in range(cfg["rodadas"]):
+        at.sidebar.radio[0].set_value(rnd.choice(MODOS))
+        rodar("filtro")
+
+        aba = rnd.choice(list(SLIDER_POR_ABA))
+        at.session_state["abas_analise"] = aba
+        rodar("aba")
+
+        sliders = [s for s in at.slider if s.key == SLIDER_POR_ABA[aba]]
+        if sliders:  # sem dados no filtro o painel não desenha o slider
+            slider = sliders[0]
+            slider.set_value(rnd.randint(slider.min, slider.max))
+            rodar("slider")
+
+    at.session_state["exp_debug"] = True
+    rodar("tabelas")
+    return {"sessao": indice, "latencias": latencias, "erros": erros}
+
+
+def sessao(indice: int, cfg: dict) -> dict:
+    """--processos: a sessão num processo próprio, com CPU e pico de memória só dela."""
+    import worker_pool
+
+    _preparar_processo(cfg)
+    cpu_inicio = time.process_time()
+    resultado = roteiro(indice, cfg)
+    resultado["cpu_s"] = time.process_time() - cpu_inicio
+    resultado["pico_mb"] = _pico_rss_mb()
+    # processos do multiprocessing saem sem rodar o atexit: sem isso o pool de
+    # extração do app fica vivo e a saída da sessão espera por ele para sempre
+    worker_pool.fechar_todos(esperar=True)
+    return resultado
+
+
+def servidor(n: int, paralelo: int, cfg: dict):
+    """
+    Padrão: as sessões como threads de um runtime só, como o servidor do
+    Streamlit: disputam o pool de extração, o índice de busca e os caches de
+    figuras e do histórico. CPU e memória são do processo inteiro.
+    """
+    import worker_pool
+
+    pasta_original = os.getcwd()
+    _preparar_processo(cfg)
+    cpu_inicio = time.process_time()
+    try:
+        with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix="sessao") as executor:
+            resultados = list(executor.map(roteiro, range(n), [cfg] * n))
+    finally:
+        worker_pool.fechar_todos(esperar=True)
+        os.chdir(pasta_original)
+    return resultados, {"cpu_s": time.process_time() - cpu_inicio, "pico_mb": _pico_rss_mb()}
+
+
+# ----------------------------------------------------------------------
+# Relatório
+# ----------------------------------------------------------------------
+def percentil(valores, p: float) -> float:
+    """Percentil por posição mais próxima (0 se vazio)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))]
+
+
+def resumir(resultados, duracao_s: float, processo: dict = None) -> dict:
+    """processo: CPU e pico do runtime compartilhado (sessões em threads); sem ele, por sessão."""
+    reruns = [s for r in resultados for passo, s in r["latencias"] if passo != "inicial"]
+    por_passo = {}
+    for r in resultados:
+        for passo, s in r["latencias"]:
+            por_passo.setdefault(passo, []).append(s)
+    resumo = {
+        "sessoes": len(resultados),
+        "modo": "threads" if processo else "processos",
+        "reruns": len(reruns),
+        "duracao_s": duracao_s,
+        "latencia_s": {f"p{p}": percentil(reruns, p) for p in PERCENTIS} | {"max": max(reruns, default=0.0)},
+        "por_passo": {
+            passo: {"n": len(v), "p50": percentil(v, 50), "p95": percentil(v, 95)}
+            for passo, v in por_passo.items()
+        },
+        "erros": sorted({e for r in resultados for e in r["erros"]}),
+        "por_sessao": [
+            {"sessao": r["sessao"], "cpu_s": r.get("cpu_s"), "pico_mb": r.get("pico_mb"),
+             "p95_s": percentil([s for passo, s in r["latencias"] if passo != "inicial"], 95)}
+            for r in resultados
+        ],
+    }
+    if processo:
+        resumo["cpu_s"] = {"total": processo["cpu_s"]}
+        resumo["pico_mb"] = {"max": processo["pico_mb"]}
+    else:
+        resumo["cpu_s"] = {"media": statistics.fmean(r["cpu_s"] for r in resultados),
+                           "max": max(r["cpu_s"] for r in resultados)}
+        resumo["pico_mb"] = {"media": statistics.fmean(r["pico_mb"] for r in resultados),
+                             "max": max(r["pico_mb"] for r in resultados)}
+    return resumo
+
+
+def imprimir(resumo: dict):
+    lat = resumo["latencia_s"]
+    print(f"sessões: {resumo['sessoes']} ({resumo['modo']}), reruns: {resumo['reruns']}, "
+          f"duração: {resumo['duracao_s']:.1f} s")
+    print("latência por rerun: " + ", ".join(f"{k} {v:.3f} s" for k, v in lat.items()))
+    for passo, v in resumo["por_passo"].items():
+        print(f"  {passo:<8} n={v['n']:<4} p50 {v['p50']:.3f} s  p95 {v['p95']:.3f} s")
+    if resumo["modo"] == "threads":
+        print(f"CPU do servidor: {resumo['cpu_s']['total']:.2f} s; "
+              f"pico de memória do servidor: {resumo['pico_mb']['max']:.0f} MB")
+        return
+    print(f"CPU por sessão: média {resumo['cpu_s']['media']:.2f} s, máx {resumo['cpu_s']['max']:.2f} s")
+    print(f"pico de memória por sessão: média {resumo['pico_mb']['media']:.0f} MB, "
+          f"máx {resumo['pico_mb']['max']:.0f} MB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", type=int, default=20)
+    parser.add_argument("--paralelo", type=int, default=0, help="sessões ao mesmo tempo (0 = todas)")
+    parser.add_argument("--rodadas", type=int, default=5, help="ciclos filtro/aba/slider por sessão")
+    parser.add_argument("--pdfs", type=int, default=2, help="PDFs sintéticos enviados por sessão")
+    parser.add_argument("--meses", type=int, default=12, help="meses por PDF")
+    parser.add_argument("--obras", type=int, default=100, help="obras por mês")
+    parser.add_argument("--extrair", action="store_true", help="titular por sessão: extrai os PDFs em cada uma")
+    parser.add_argument("--timeout", type=float, default=300, help="segundos por rerun")
+    parser.add_argument("--budget-p95", type=float, default=2.0, help="segundos (p95 dos reruns)")
+    parser.add_argument("--processos", action="store_true",
+                        help="uma sessão por processo (CPU/memória por sessão, sem caches compartilhados)")
+    parser.add_argument("--budget-memoria", type=float, default=0,
+                        help="MB de pico (do servidor; por sessão com --processos; 0 = sem limite)")
+    parser.add_argument("--json", help="grava o resumo completo neste arquivo")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="melodia_carga_") as pasta:
+        print(f"Preparando {args.pdfs} PDF(s) de {args.meses} meses e o histórico...")
+        db, pdfs = preparar(pasta, args.pdfs, args.meses, args.obras, popular=not args.extrair)
+        cfg = {"db": db, "pdfs": pdfs, "pasta": pasta, "rodadas": args.rodadas,
+               "extrair": args.extrair, "timeout": args.timeout}
+
+        paralelo = args.paralelo or args.sessoes
+        modo = "processos" if args.processos else "threads de um runtime"
+        print(f"Rodando {args.sessoes} sessões ({paralelo} em paralelo, {modo})...")
+        inicio = time.perf_counter()
+        processo = None
+        if args.processos:
+            with ProcessPoolExecutor(max_workers=paralelo, mp_context=multiprocessing.get_context("spawn"),
+                                     max_tasks_per_child=1) as executor:
+                resultados = list(executor.map(sessao, range(args.sessoes), [cfg] * args.sessoes))
+        else:
+            resultados, processo = servidor(args.sessoes, paralelo, cfg)
+        resumo = resumir(resultados, time.perf_counter() - inicio, processo)
+
+    imprimir(resumo)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+    falhas = []
+    if resumo["erros"]:
+        falhas.append(f"exceções no app: {resumo['erros']}")
+    if resumo["latencia_s"]["p95"] > args.budget_p95:
+        falhas.append(f"p95 {resumo['latencia_s']['p95']:.3f} s acima do orçamento de {args.budget_p95:.3f} s")
+    if args.budget_memoria and resumo["pico_mb"]["max"] > args.budget_memoria:
+        falhas.append(f"pico de {resumo['pico_mb']['max']:.0f} MB acima do orçamento de {args.budget_memoria:.0f} MB")
+
+    for f in falhas:
+        print(f"❌ {f}")
+    if not falhas:
+        print("✅ Carga dentro do orçamento.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Pico de memória por estágio do pipeline e do dashboard, para vários tamanhos
+de demonstrativo (sintéticos, bench/sintetico.py).
+
+Estágios, na ordem do app:
+  split        separação por mês (pypdf)
+  categorias   parser POR CATEGORIA (pdfplumber) + compilação da tabela
+  rubricas     parser POR RUBRICA (pdfplumber) + compilação e base de rubricas
+  obras        obras agregadas por (mês, Código ECAD) (pypdf)
+  compilacao   junção das obras e gravação das três tabelas no histórico
+  dashboard    app.py no AppTest sobre o histórico: carga, filtros e abas
+
+Para cada estágio:
+  - tracemalloc: pico de memória Python/numpy acima do que já estava alocado
+    no início do estágio (determinístico; é o que os orçamentos verificam);
+  - RSS: pico do processo amostrado durante o estágio (inclui Arrow e o que
+    o alocador não devolveu; é o que o OOM killer enxerga).
+
+Sai com código 1 se algum estágio passar do orçamento (--budget estagio=MB,
+sobre o maior tamanho em que ele rodou) ou o RSS do processo passar de
+--budget-rss.
+
+Uso:
+  python bench/memoria.py --tamanhos 3x50,12x100,24x200 --budget obras=150 --budget-rss 1500
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import gc
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from bench.sintetico import gerar_pdf
+from ecad_scripts.limites import rss_mb
+
+APP = os.path.join(RAIZ, "app.py")
+BASE_RUBRICAS = os.path.join(RAIZ, "bases", "Base_Rubrica_Original.xlsx")
+TITULAR = "Meu catálogo"
+ESTAGIOS = ("split", "categorias", "rubricas", "obras", "compilacao", "dashboard")
+
+
+class _AmostradorRSS:
+    """Amostra o RSS numa thread enquanto o estágio roda; guarda o máximo."""
+
+    def __init__(self, intervalo_s: float = 0.005):
+        self.intervalo_s = intervalo_s
+        self.pico = rss_mb()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name="amostrador-rss", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_mb())
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            self.pico = max(self.pico, rss_mb())
+
+
+@contextmanager
+def medir(estagio: str, medicoes: list, tamanho: str):
+    gc.collect()
+    base_py = tracemalloc.get_traced_memory()[0]
+    base_rss = rss_mb()
+    tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    with _AmostradorRSS() as amostrador:
+        yield
+    atual_py, pico_py = tracemalloc.get_traced_memory()
+    medicoes.append({
+        "tamanho": tamanho,
+        "estagio": estagio,
+        "segundos": time.perf_counter() - inicio,
+        "pico_py_mb": (pico_py - base_py) / 2**20,
+        "retido_py_mb": (atual_py - base_py) / 2**20,
+        "pico_rss_mb": amostrador.pico,
+        "delta_rss_mb": amostrador.pico - base_rss,
+    })
+
+
+def _aquecer():
+    """Importa bibliotecas e roda o app uma vez vazio: imports não contam como pico de estágio."""
+    import pandas  # noqa: F401
+    import pdfplumber  # noqa: F401
+    import pypdf  # noqa: F401
+    import plotly.express  # noqa: F401
+    import pipeline  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as pasta:
+        _rodar_dashboard(os.path.join(pasta, "vazio.sqlite"), interagir=False)
+
+
+def _rodar_dashboard(db: str, interagir: bool = True):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["MELODIA_DB"] = db
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    if interagir:
+        for modo in ("Mês", "Ano"):
+            at.sidebar.radio[0].set_value(modo)
+            at.run()
+        for aba in ("Categorias", "Obras"):
+            at.session_state["abas_analise"] = aba
+            at.run()
+        at.session_state["exp_debug"] = True
+        at.run()
+    erros = [str(e.value) for e in at.exception]
+    if erros:
+        raise RuntimeError(f"dashboard falhou: {erros}")
+
+
+def medir_tamanho(pasta: str, meses: int, obras: int, medicoes: list):
+    from ecad_scripts import historico
+    from ecad_scripts.A_process_PDF import run as run_split
+    from ecad_scripts.categorias import run as run_categorias
+    from ecad_scripts.rubricas import run as run_rubricas
+    from ecad_scripts.obras import run_agregado as run_obras_agregado, juntar_obras
+
+    tamanho = f"{meses}x{obras}"
+    base_dir = os.path.join(pasta, tamanho)
+    os.makedirs(os.path.join(base_dir, "i_pdf"))
+    pdf = os.path.join(base_dir, "i_pdf", "compilado.pdf")
+    dados = gerar_pdf(pdf, meses=meses, obras_por_mes=obras)
+
+    with medir("split", medicoes, tamanho):
+        run_split(base_dir)
+    with medir("categorias", medicoes, tamanho):
+        df_cat, _ = run_categorias(base_dir)
+    with medir("rubricas", medicoes, tamanho):
+        df_rub, _ = run_rubricas(base_dir, base_rubricas_path=BASE_RUBRICAS)
+    with medir("obras", medicoes, tamanho):
+        fatos, dimensao, _, _ = run_obras_agregado(base_dir)
+
+    db = os.path.join(base_dir, "historico.sqlite")
+    with medir("compilacao", medicoes, tamanho):
+        df_obr = juntar_obras(fatos, dimensao) if not fatos.empty else fatos
+        conn = historico.conectar(db)
+        historico.salvar(conn, TITULAR, historico.hash_arquivo(dados), "sintetico.pdf", df_cat, df_rub, df_obr)
+        conn.close()
+    del df_cat, df_rub, df_obr, fatos, dimensao
+
+    with medir("dashboard", medicoes, tamanho):
+        _rodar_dashboard(db)
+
+
+def _tamanhos(texto: str):
+    pares = []
+    for item in texto.split(","):
+        meses, obras = item.lower().split("x")
+        pares.append((int(meses), int(obras)))
+    return pares
+
+
+def _orcamentos(itens) -> dict:
+    orcamentos = {}
+    for item in itens or []:
+        estagio, _, mb = item.partition("=")
+        if estagio not in ESTAGIOS:
+            raise SystemExit(f"Estágio desconhecido em --budget: {estagio} (use {', '.join(ESTAGIOS)})")
+        orcamentos[estagio] = float(mb)
+    return orcamentos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default="3x50,12x100,24x200", help="meses x obras por mês, separados por vírgula")
+    parser.add_argument("--budget", action="append", metavar="ESTAGIO=MB",
+                        help="pico tracemalloc máximo do estágio (pode repetir)")
+    parser.add_argument("--budget-rss", type=float, default=0, help="RSS máximo do processo em MB (0 = sem limite)")
+    parser.add_argument("--json", help="grava todas as medições neste arquivo")
+    args = parser.parse_args(argv)
+    orcamentos = _orcamentos(args.budget)
+
+    logging.disable(logging.WARNING)
+    os.chdir(RAIZ)  # o app procura bases/ no diretório atual
+    _aquecer()
+
+    medicoes = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory(prefix="melodia_memoria_") as pasta:
+        for meses, obras in _tamanhos(args.tamanhos):
+            print(f"Medindo {meses} meses x {obras} obras...")
+            medir_tamanho(pasta, meses, obras, medicoes)
+    tracemalloc.stop()
+
+    print(f"{'tamanho':<9} {'estágio':<11} {'tempo':>8} {'pico py':>10} {'retido py':>10} {'pico RSS':>10} {'Δ RSS':>9}")
+    for m in medicoes:
+        print(f"{m['tamanho']:<9} {m['estagio']:<11} {m['segundos']:>7.2f}s {m['pico_py_mb']:>8.1f}MB "
+              f"{m['retido_py_mb']:>8.1f}MB {m['pico_rss_mb']:>8.0f}MB {m['delta_rss_mb']:>7.0f}MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(medicoes, f, ensure_ascii=False, indent=2)
+
+    falhas = []
+    for estagio, limite in orcamentos.items():
+        picos = [m for m in medicoes if m["estagio"] == estagio]
+        pior = max(picos, key=lambda m: m["pico_py_mb"], default=None)
+        if pior and pior["pico_py_mb"] > limite:
+            falhas.append(f"{estagio} ({pior['tamanho']}): pico de {pior['pico_py_mb']:.1f} MB "
+                          f"acima do orçamento de {limite:.1f} MB")
+    pico_rss = max((m["pico_rss_mb"] for m in medicoes), default=0)
+    if args.budget_rss and pico_rss > args.budget_rss:
+        falhas.append(f"RSS do processo chegou a {pico_rss:.0f} MB (orçamento {args.budget_rss:.0f} MB)")
+
+    for f in falhas:
+        print(f"❌ {f}")
+    if not falhas:
+        print("✅ Memória dentro do orçamento.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Gera demonstrativos sintéticos do ECAD (PDF de texto, sem dependências) com o
+mesmo layout que os parsers esperam: POR CATEGORIA, POR RUBRICA, TOTAL DO
+TITULAR e a lista de obras, um mês após o outro.
+
+Os valores são aleatórios mas determinísticos (semente), e a soma das obras
+de cada mês bate com o total do titular a menos de centavos de arredondamento.
+As linhas das tabelas de categorias e rubricas saem em colunas, com os
+valores alinhados à direita, como no demonstrativo real.
+
+Uso:
+  python bench/sintetico.py saida.pdf --meses 12 --obras 200
+"""
+import sys
+import random
+import argparse
+
+MESES = [
+    "JANEIRO", "FEVEREIRO", "MARÇO", "ABRIL", "MAIO", "JUNHO",
+    "JULHO", "AGOSTO", "SETEMBRO", "OUTUBRO", "NOVEMBRO", "DEZEMBRO",
+]
+CABECALHO_VALORES = (
+    "DISTRIBUIÇÃO LIBERAÇÃO CRÉD. RETIDO LIBERAÇÃO DE PENDENTE "
+    "LIBERAÇÃO DE PARÂMETRO AJUSTES TOTAL GERAL"
+)
+LINHAS_POR_PAGINA = 45
+TAMANHO_FONTE = 9
+ENTRELINHA = 11
+MARGEM = 30
+# borda direita de cada coluna de valor das tabelas (pontos)
+COLUNAS_X = (250, 310, 370, 430, 490, 565)
+# larguras Helvetica (1/1000 em) dos caracteres que aparecem nos valores
+_LARGURAS = {**{d: 556 for d in "0123456789"}, ",": 278, ".": 278, "-": 333}
+
+
+def _dinheiro(centavos: int) -> str:
+    reais, cent = divmod(centavos, 100)
+    return f"{reais:,}".replace(",", ".") + f",{cent:02d}"
+
+
+def _escapar(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _linha_tabela(nome: str, valores) -> list:
+    """Linha em células [(x, texto)]: nome na margem, valores alinhados à direita."""
+    celulas = [(MARGEM, nome)]
+    for borda, valor in zip(COLUNAS_X, valores):
+        largura = sum(_LARGURAS.get(c, 556) for c in valor) * TAMANHO_FONTE / 1000
+        celulas.append((borda - largura, valor))
+    return celulas
+
+
+def paginas_do_mes(ano: int, mes: int, n_obras: int, rnd: random.Random, titular: str) -> list:
+    """Linhas de texto de cada página do demonstrativo de um mês (mes de 0 a 11)."""
+    referencia = f"{MESES[mes]}/{ano}"
+    categorias = {
+        "SHOW": rnd.randint(1_000, 900_000),
+        "RADIO": rnd.randint(1_000, 900_000),
+        "TV ABERTA": rnd.randint(1_000, 90_000),
+    }
+    rubricas = {
+        "INTERNET SHOW": categorias["SHOW"],
+        "GRUPO MÚSICA": categorias["RADIO"],
+        "ALTERNATIVO ALTO": categorias["TV ABERTA"],
+    }
+    total = sum(rubricas.values())
+
+    resumo = [
+        "DEMONSTRATIVO DE DISTRIBUICAO",
+        f"TITULAR: {titular}  {referencia}",
+        "POR CATEGORIA",
+        f"CATEGORIA {CABECALHO_VALORES}",
+    ]
+    resumo += [_linha_tabela(nome, [_dinheiro(v), *["---"] * 4, _dinheiro(v)]) for nome, v in categorias.items()]
+    resumo.append(f"TOTAL {_dinheiro(total)}")
+    resumo.append("DEMONSTRATIVO POR RUBRICA")
+    resumo += [
+        _linha_tabela(f"{nome} {mes + 1:02d}/{ano}", [_dinheiro(v), *["---"] * 4, _dinheiro(v)])
+        for nome, v in rubricas.items()
+    ]
+    resumo.append(f"TOTAL DO TITULAR {_dinheiro(total)}")
+
+    paginas = [resumo]
+    linhas = ["OBRA RUBRICA PERÍODO RENDIMENTO % RATEIO CORREÇÃO EXEC (OC)"]
+    pesos = [rnd.random() for _ in range(n_obras)]
+    soma = sum(pesos)
+    for i, peso in enumerate(pesos):
+        valor = int(total * peso / soma)
+        linhas.append(
+            f"{10000 + i} MUSICA NUMERO {i} SHOW {mes + 1:02d}/{ano} "
+            f"{_dinheiro(valor)} 100,00 {_dinheiro(valor)} 3"
+        )
+        if len(linhas) >= LINHAS_POR_PAGINA:
+            paginas.append(linhas)
+            linhas = []
+    linhas.append("VALORES EXPRESSOS EM REAIS")
+    paginas.append(linhas)
+    return paginas
+
+
+def _montar_pdf(paginas) -> bytes:
+    """
+    PDF 1.4 mínimo: uma fonte Type1 padrão e um content stream por página.
+    Cada linha é um texto (na margem) ou uma lista de células [(x, texto)].
+    """
+    objetos = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    filhos = []
+    for linhas in paginas:
+        comandos = [f"BT /F1 {TAMANHO_FONTE} Tf"]
+        for i, linha in enumerate(linhas):
+            y = 800 - ENTRELINHA * i
+            celulas = [(MARGEM, linha)] if isinstance(linha, str) else linha
+            comandos += [f"1 0 0 1 {x:.2f} {y} Tm ({_escapar(texto)}) Tj" for x, texto in celulas]
+        conteudo = "\n".join(comandos) + "\nET"
+        dados = conteudo.encode("cp1252")
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(dados) + dados + b"\nendstream")
+        conteudo_id = len(objetos)
+        objetos.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {conteudo_id} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        filhos.append(len(objetos))
+    objetos[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objetos[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in filhos)}] /Count {len(filhos)} >>".encode()
+    )
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for i, obj in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += f"{i} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(saida)
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    for pos in posicoes:
+        saida += f"{pos:010d} 00000 n \n".encode()
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(saida)
+
+
+def gerar_pdf(caminho: str = None, meses: int = 3, obras_por_mes: int = 20, semente: int = 1,
+              ano_inicial: int = 2023, titular: str = "FULANO DE TAL") -> bytes:
+    """Gera o demonstrativo; grava em caminho (se dado) e retorna os bytes."""
+    rnd = random.Random(semente)
+    paginas = []
+    for k in range(meses):
+        paginas += paginas_do_mes(ano_inicial + k // 12, k % 12, obras_por_mes, rnd, titular)
+    dados = _montar_pdf(paginas)
+    if caminho:
+        with open(caminho, "wb") as f:
+            f.write(dados)
+    return dados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("saida")
+    parser.add_argument("--meses", type=int, default=3)
+    parser.add_argument("--obras", type=int, default=20, help="obras por mês")
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--ano-inicial", type=int, default=2023)
+    args = parser.parse_args(argv)
+    dados = gerar_pdf(args.saida, args.meses, args.obras, args.semente, args.ano_inicial)
+    print(f"{args.saida}: {len(dados) / 1024:.0f} KB, {args.meses} meses, {args.obras} obras/mês")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
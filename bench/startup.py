@@ -0,0 +1,110 @@
+"""
+Mede o tempo de partida (cold start) do app e do pipeline em processos novos
+e compara com um orçamento. Sai com código 1 se o orçamento for excedido ou se
+alguma biblioteca pesada (PDF, plotly.express) for importada já na partida.
+
+Uso:
+  python bench/startup.py --budget-import 1.5 --budget-app 4 --repeticoes 3
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Só devem ser carregadas quando um estágio do pipeline roda
+MODULOS_PESADOS = ("pdfplumber", "pdfminer", "pypdf", "PyPDF2", "plotly.express")
+
+CODIGO_IMPORT = """
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+import pipeline
+t = time.perf_counter() - t0
+print(json.dumps({{"segundos": t, "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+CODIGO_APP = """
+import sys, time, json
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+t = time.perf_counter() - t0
+print(json.dumps({{"segundos": t, "pesados": [m for m in {pesados!r} if m in sys.modules],
+                   "erros": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def _medir(codigo: str, env=None) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def medir_import(repeticoes: int) -> dict:
+    codigo = CODIGO_IMPORT.format(raiz=RAIZ, pesados=MODULOS_PESADOS)
+    amostras = [_medir(codigo) for _ in range(repeticoes)]
+    return {
+        "mediana_s": statistics.median(a["segundos"] for a in amostras),
+        "pesados": sorted({m for a in amostras for m in a["pesados"]}),
+    }
+
+
+def medir_app(repeticoes: int) -> dict:
+    """Primeira carga da página sem uploads, com histórico vazio."""
+    codigo = CODIGO_APP.format(app=os.path.join(RAIZ, "app.py"), pesados=MODULOS_PESADOS)
+    amostras = []
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, MELODIA_DB=os.path.join(tmp, "historico.sqlite"))
+            amostras.append(_medir(codigo, env=env))
+    return {
+        "mediana_s": statistics.median(a["segundos"] for a in amostras),
+        "pesados": sorted({m for a in amostras for m in a["pesados"]}),
+        "erros": sorted({e for a in amostras for e in a["erros"]}),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-import", type=float, default=1.5, help="segundos para importar pipeline")
+    parser.add_argument("--budget-app", type=float, default=5.0, help="segundos para a primeira carga do app")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sem-app", action="store_true", help="mede só o import do pipeline")
+    args = parser.parse_args(argv)
+
+    falhas = []
+
+    imp = medir_import(args.repeticoes)
+    print(f"import pipeline: {imp['mediana_s']:.3f} s (orçamento {args.budget_import:.3f} s)")
+    if imp["mediana_s"] > args.budget_import:
+        falhas.append("import do pipeline acima do orçamento")
+    if imp["pesados"]:
+        falhas.append(f"bibliotecas pesadas importadas na partida: {', '.join(imp['pesados'])}")
+
+    if not args.sem_app:
+        app = medir_app(args.repeticoes)
+        print(f"primeira carga do app: {app['mediana_s']:.3f} s (orçamento {args.budget_app:.3f} s)")
+        if app["mediana_s"] > args.budget_app:
+            falhas.append("primeira carga do app acima do orçamento")
+        if app["pesados"]:
+            falhas.append(f"app importou na partida: {', '.join(app['pesados'])}")
+        if app["erros"]:
+            falhas.append(f"app falhou: {app['erros']}")
+
+    for f in falhas:
+        print(f"❌ {f}")
+    if not falhas:
+        print("✅ Partida dentro do orçamento.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
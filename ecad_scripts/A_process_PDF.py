@@ -1,23 +1,28 @@
+import io
 import os
+import sys
 import re
 import time
 import logging
 from pathlib import Path
 
-from PyPDF2 import PdfMerger
-from pypdf import PdfReader, PdfWriter
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts.layout import sondar, salvar_indice, carregar_indice
+from ecad_scripts.limites import verificar
+from ecad_scripts.cache_paginas import texto_pypdf
+from ecad_scripts.logs import configurar_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] %(levelname)s - %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 date_pattern = re.compile(r'\b[A-ZÇ]{3,9}/\d{4}\b')
 
 
 def merge_pdfs(pdf_list, output_path):
+    from PyPDF2 import PdfMerger
+
     logger.info(f"Iniciando merge de {len(pdf_list)} PDF(s).")
     merger = PdfMerger()
     for pdf in pdf_list:
@@ -47,21 +52,38 @@ def convert_date_to_filename(date_str):
         return None
 
 
-def split_pdf_by_text(input_pdf_path, output_folder, split_text="VALORES EXPRESSOS"):
+def split_pdf_by_text(input_pdf_path, output_folder, split_text="VALORES EXPRESSOS", escritor=None, cache=None):
+    """
+    Separa o PDF em um arquivo por mês e, aproveitando o texto já extraído,
+    sonda as seções/layout de cada mês. Retorna {arquivo.pdf: info}.
+    Com um EscritorAssincrono, os PDFs mensais são gravados em segundo plano
+    enquanto as páginas seguintes são lidas. Com um CachePaginas, o texto de
+    páginas já vistas vem do cache.
+    """
+    from pypdf import PdfReader, PdfWriter
+
     logger.info(f"🔍 Processando: {os.path.basename(input_pdf_path)}")
     try:
         reader = PdfReader(input_pdf_path)
     except Exception as e:
         logger.error(f"❌ Erro ao ler PDF: {e}")
-        return
+        return {}
 
     os.makedirs(output_folder, exist_ok=True)
 
+    # limite de páginas checado antes de ler qualquer texto
+    verificar(paginas=len(reader.pages))
+
     writer = PdfWriter()
     data_referente = None
+    indice = {}
+    textos = []
+    memo = {}
 
     for page_num, page in enumerate(reader.pages):
-        page_text = page.extract_text() or ""
+        verificar()
+        page_text = texto_pypdf(page, "split", cache, memo)
+        textos.append(page_text)
 
         current_date = extract_data_referente(page_text)
         if current_date:
@@ -74,20 +96,38 @@ def split_pdf_by_text(input_pdf_path, output_folder, split_text="VALORES EXPRESS
             file_name = f"{filename_date}.pdf"
             output_pdf_path = os.path.join(output_folder, file_name)
 
-            with open(output_pdf_path, 'wb') as output_pdf:
-                writer.write(output_pdf)
-
-            logger.info(f"📄 Exportado: {output_pdf_path}")
+            if escritor is None:
+                with open(output_pdf_path, 'wb') as output_pdf:
+                    writer.write(output_pdf)
+            else:
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                escritor.gravar_bytes(output_pdf_path, buffer.getvalue())
+
+            info = sondar(textos)
+            indice[file_name] = {"data_referente": data_referente, "paginas": len(textos), **info}
+            logger.info(
+                f"📄 Exportado: {output_pdf_path} "
+                f"(layout {info['layout']}; seções: {', '.join(info['secoes']) or 'nenhuma'})"
+            )
             writer = PdfWriter()
+            textos = []
+
+    if cache is not None:
+        cache.gravar()
+    return indice
 
 
-def run(base_dir: str) -> str:
+def run(base_dir: str, escritor=None, cache=None) -> str:
     """
     Espera PDFs em:
       {base_dir}/en_PDF  (opcional, vários PDFs para merge)
       {base_dir}/i_pdf   (entrada para split; aqui fica o compilado ou o PDF único)
     Saída:
       {base_dir}/s_pdf_organizados  (PDFs separados por mês)
+      {base_dir}/s_pdf_organizados/indice.json  (seções e layout de cada mês)
+    Com escritor, os PDFs mensais só estão no disco após escritor.flush().
+    cache: CachePaginas opcional para o texto das páginas.
     """
     start_time = time.time()
 
@@ -123,9 +163,11 @@ def run(base_dir: str) -> str:
     if not pdf_files:
         logger.warning("📭 Nenhum arquivo PDF encontrado para separar em i_pdf.")
     else:
+        indice = carregar_indice(str(split_output_dir))
         for pdf_file in pdf_files:
             input_pdf_path = str(split_input_dir / pdf_file)
-            split_pdf_by_text(input_pdf_path, str(split_output_dir))
+            indice.update(split_pdf_by_text(input_pdf_path, str(split_output_dir), escritor=escritor, cache=cache))
+        salvar_indice(str(split_output_dir), indice)
 
     elapsed = time.time() - start_time
     logger.info(f"✅ Split finalizado em {elapsed:.2f} segundos.")
@@ -133,4 +175,5 @@ def run(base_dir: str) -> str:
 
 
 if __name__ == "__main__":
+    configurar_logging()
     run(os.getcwd())
@@ -0,0 +1,100 @@
+"""
+Métricas de crescimento sobre os agregados mensais: variação ano contra
+ano, acumulados móveis de 3 e 12 meses e mudança de participação.
+
+Tudo sai de uma matriz meses x itens (centavos) com os meses contínuos
+(mês sem demonstrativo = 0): os acumulados são diferenças da soma
+cumulativa e o "ano anterior" é a mesma matriz 12 linhas acima. Uma
+passada vetorizada para todos os itens, sem groupby por item.
+"""
+import numpy as np
+import pandas as pd
+
+# colunas monetárias (centavos) e de razão da saída de janelas()
+COLUNAS_VALOR = ["Valor", "Valor AA", "Acum 3M", "Acum 12M"]
+COLUNAS_RAZAO = ["Var AA", "Var 12M", "Part 12M", "Var Part 12M"]
+
+
+def matriz_mensal(df: pd.DataFrame, chave: str, valor: str, mes_col: str = "PERIODO_MES") -> pd.DataFrame:
+    """Soma de valor por mês ("AAAA-MM", contínuos do primeiro ao último) x chave, em int64."""
+    if df is None or df.empty or not {chave, valor, mes_col} <= set(df.columns):
+        return pd.DataFrame()
+    valores = pd.to_numeric(df[valor], errors="coerce").fillna(0).astype("int64")
+    itens = df[chave].fillna("(Sem nome)")
+    matriz = valores.groupby([df[mes_col], itens]).sum().unstack(fill_value=0)
+    meses = pd.period_range(matriz.index.min(), matriz.index.max(), freq="M").astype(str)
+    return matriz.reindex(meses, fill_value=0)
+
+
+def reconciliar(matriz: pd.DataFrame, fatores: pd.DataFrame, mes_col: str = "PERIODO_MES") -> pd.DataFrame:
+    """Reescala cada mês pelo fator_aplicado de reconciliacao.fatores_por_mes (obras x rubricas)."""
+    if matriz.empty or fatores.empty:
+        return matriz
+    fator = fatores.set_index(mes_col)["fator_aplicado"].reindex(matriz.index).fillna(1.0)
+    return matriz.mul(fator, axis=0).round().astype("int64")
+
+
+def _defasar(a: np.ndarray, n: int) -> np.ndarray:
+    """a deslocado n linhas para baixo (as primeiras n viram NaN)."""
+    out = np.full(a.shape, np.nan)
+    if n < len(a):
+        out[n:] = a[:-n]
+    return out
+
+
+def _dividir(a, b) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(b > 0, a / b, np.nan)
+
+
+def _inteiro(a: np.ndarray):
+    """float com NaN -> Int64 (centavos) com nulos."""
+    out = pd.array(np.nan_to_num(a).astype("int64"), dtype="Int64")
+    out[np.isnan(a)] = pd.NA
+    return out
+
+
+def janelas(matriz: pd.DataFrame, chave: str, mes_col: str = "PERIODO_MES") -> pd.DataFrame:
+    """
+    Formato longo, uma linha por (mês, item) com movimento em 12 meses:
+      - Valor / Valor AA: o mês e o mesmo mês do ano anterior
+      - Acum 3M / Acum 12M: soma móvel (nulo enquanto a janela não tem histórico completo)
+      - Var AA / Var 12M: Valor e Acum 12M contra o ano anterior (0.1 = +10%)
+      - Part 12M / Var Part 12M: participação do item no Acum 12M de todos e a
+        mudança dela contra o ano anterior (em fração: 0.02 = +2 p.p.)
+    """
+    colunas = [mes_col, chave, *COLUNAS_VALOR, *COLUNAS_RAZAO]
+    if matriz.empty:
+        return pd.DataFrame(columns=colunas)
+
+    v = matriz.to_numpy(dtype="int64")
+    n_meses = len(v)
+    acumulado = np.vstack([np.zeros((1, v.shape[1]), dtype="int64"), v.cumsum(axis=0)])
+    fim = np.arange(1, n_meses + 1)
+
+    def movel(n):
+        soma = (acumulado[fim] - acumulado[np.maximum(fim - n, 0)]).astype("float64")
+        soma[:n - 1] = np.nan  # janela sem histórico completo
+        return soma
+
+    m3, m12 = movel(3), movel(12)
+    valor_aa = _defasar(v, 12)
+    m12_aa = _defasar(m12, 12)
+    participacao = _dividir(m12, np.nansum(m12, axis=1, keepdims=True))
+
+    # item entra no mês se teve movimento nos últimos 12 meses (ou no mesmo mês do ano anterior)
+    movimento = (acumulado[fim] - acumulado[np.maximum(fim - 12, 0)] != 0) | (np.nan_to_num(valor_aa) != 0)
+    i, j = np.nonzero(movimento)
+
+    return pd.DataFrame({
+        mes_col: matriz.index.to_numpy()[i],
+        chave: matriz.columns.to_numpy()[j],
+        "Valor": v[i, j],
+        "Valor AA": _inteiro(valor_aa[i, j]),
+        "Acum 3M": _inteiro(m3[i, j]),
+        "Acum 12M": _inteiro(m12[i, j]),
+        "Var AA": _dividir(v, valor_aa)[i, j] - 1,
+        "Var 12M": _dividir(m12, m12_aa)[i, j] - 1,
+        "Part 12M": participacao[i, j],
+        "Var Part 12M": (participacao - _defasar(participacao, 12))[i, j],
+    }, columns=colunas)
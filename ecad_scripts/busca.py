@@ -0,0 +1,115 @@
+"""
+Busca de obras por nome ou Código ECAD enquanto o usuário digita.
+
+IndiceObras é montado uma vez por versão do histórico (o dashboard o
+guarda em st.cache_resource): cada obra vira um documento normalizado
+(sem acento, minúsculo, espaços simples) com o nome e os códigos dela. Termos de 3+ caracteres usam o índice de trigramas -> obras
+(arrays ordenados): cruzam as listas dos trigramas do termo, da menor para
+a maior, e só os candidatos que sobram são conferidos por substring.
+Termos de 1-2 caracteres não têm trigrama: são procurados como substring
+em todos os documentos, numa varredura vetorizada (casam quase tudo, e a
+lista sai cortada pelo limite de buscar()).
+"""
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+N = 3
+
+
+def normalizar(texto: str) -> str:
+    """Sem acento, minúsculo e com espaços simples ("Canção  Nº1" -> "cancao no1")."""
+    sem_acento = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acento.casefold().split())
+
+
+def _normalizar_serie(textos: pd.Series) -> pd.Series:
+    return (
+        textos.astype(str)
+              .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+              .str.casefold()
+              .str.split().str.join(" ")
+    )
+
+
+def _ngramas(texto: str) -> set:
+    return {texto[i:i + N] for i in range(len(texto) - N + 1)}
+
+
+class IndiceObras:
+    """Índice de trigramas sobre nomes de obra e Código ECAD."""
+
+    def __init__(self, nomes, codigos=None):
+        """nomes: nome de cada obra (únicos); codigos: textos com os códigos de cada uma (mesma ordem)."""
+        self.nomes = np.asarray(list(nomes), dtype=object)
+        docs = _normalizar_serie(pd.Series(self.nomes))
+        if codigos is not None:
+            docs = docs + " " + pd.Series(list(codigos), dtype=str)
+        self._serie = docs.reset_index(drop=True)
+        self._docs = docs.tolist()
+
+        postagens = defaultdict(list)
+        for i, doc in enumerate(self._docs):
+            for ngrama in _ngramas(doc):
+                postagens[ngrama].append(i)
+        # obras entram em ordem crescente: cada lista já sai ordenada
+        self._trigramas = {g: np.asarray(ids, dtype=np.int32) for g, ids in postagens.items()}
+
+    @classmethod
+    def do_frame(cls, df: pd.DataFrame, nome_col: str = "Nome Obra", codigo_col: str = "Código ECAD"):
+        """Uma entrada por nome, com todos os códigos em que ele aparece."""
+        if df is None or df.empty or nome_col not in df.columns:
+            return cls([])
+        if codigo_col not in df.columns:
+            return cls(df[nome_col].dropna().unique())
+        codigos = (
+            df[[nome_col, codigo_col]].dropna(subset=[nome_col]).drop_duplicates()
+              .assign(**{codigo_col: lambda d: pd.to_numeric(d[codigo_col], errors="coerce")
+                                                 .astype("Int64").astype(str).replace("<NA>", "")})
+              .groupby(nome_col, sort=False)[codigo_col].agg(" ".join)
+        )
+        return cls(codigos.index, codigos.to_numpy())
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def _candidatos(self, termo: str) -> np.ndarray:
+        """Posições das obras cujo documento contém termo (já normalizado)."""
+        if len(termo) < N:
+            return np.flatnonzero(self._serie.str.contains(termo, regex=False).to_numpy()).astype(np.int32)
+
+        listas = []
+        for ngrama in _ngramas(termo):
+            ids = self._trigramas.get(ngrama)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            listas.append(ids)
+        listas.sort(key=len)
+        ids = listas[0]
+        for outra in listas[1:]:
+            ids = np.intersect1d(ids, outra, assume_unique=True)
+            if not len(ids):
+                return ids
+        # trigramas presentes não garantem a sequência: confere o substring
+        return np.fromiter((i for i in ids if termo in self._docs[i]), dtype=np.int32)
+
+    def buscar(self, termo: str, ordem=None, limite: int = 50) -> list:
+        """
+        Nomes de obra que contêm termo (sem diferenciar acento e caixa; números
+        também casam com o Código ECAD). Com ordem (ex.: nomes do ranking no
+        filtro), só os nomes dela, na ordem dela; sem ordem, alfabética.
+        Termo vazio devolve o começo de ordem.
+        """
+        termo = normalizar(termo or "")
+        ordem = pd.Index(ordem) if ordem is not None else None
+        if not termo:
+            return ordem[:limite].tolist() if ordem is not None else sorted(self.nomes.tolist())[:limite]
+
+        encontrados = self.nomes[self._candidatos(termo)]
+        if ordem is None:
+            return sorted(encontrados.tolist())[:limite]
+        posicoes = ordem.get_indexer(encontrados)
+        posicoes = np.sort(posicoes[posicoes >= 0])[:limite]
+        return [ordem[p] for p in posicoes]
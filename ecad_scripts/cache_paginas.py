@@ -0,0 +1,236 @@
+"""
+Cache em disco do que os extratores de PDF devolvem para cada página: texto
+(pypdf ou pdfplumber) e palavras posicionadas (pdfplumber, modo "regiao").
+
+A chave é o hash do que determina a extração: content stream decodificado,
+/Resources resolvidos (fontes, ToUnicode, larguras, XObjects), caixas e
+rotação da página, mais o extrator e as versões das bibliotecas. Uma mesma
+página tem a mesma chave no PDF compilado e no PDF mensal do split, em
+qualquer upload. Trocar de versão de pypdf/pdfplumber/pdfminer ou de
+VERSAO invalida tudo naturalmente (chaves novas).
+
+Com o cache cheio, reprocessar um arquivo depois de uma correção nos parsers
+não abre o pdfplumber: o texto sai do SQLite (zlib) e só o pypdf é usado,
+para calcular as chaves.
+"""
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from ecad_scripts import metricas
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = os.path.join("workspace", "cache_paginas.sqlite")
+# suba quando mudar como os extratores são chamados (ex.: parâmetros do extract_words)
+VERSAO = 1
+# páginas novas acumuladas antes de gravar no SQLite
+LOTE = 64
+
+
+def _texto(pagina):
+    return pagina.extract_text() or ""
+
+
+def _palavras(pagina):
+    from ecad_scripts.regioes import palavras_da_pagina
+    return palavras_da_pagina(pagina)
+
+
+# extrator -> (backend, função(página do backend))
+EXTRATORES = {
+    "pypdf-texto": ("pypdf", _texto),
+    "pdfplumber-texto": ("pdfplumber", _texto),
+    "pdfplumber-palavras": ("pdfplumber", _palavras),
+}
+
+
+def _versao(backend: str) -> str:
+    import pypdf
+    if backend == "pypdf":
+        return f"pypdf-{pypdf.__version__}"
+    import pdfminer
+    import pdfplumber
+    # as chaves vêm do pypdf: a versão dele também entra
+    return f"pdfplumber-{pdfplumber.__version__}-pdfminer-{pdfminer.__version__}-pypdf-{pypdf.__version__}"
+
+
+# ----------------------------------------------------------------------
+# Chave da página
+# ----------------------------------------------------------------------
+def _assinatura(obj, memo: dict, profundidade: int = 0) -> bytes:
+    """Bytes estáveis de um objeto pypdf (referências resolvidas, streams decodificados)."""
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref not in memo:
+            memo[ref] = b"<ciclo>"
+            memo[ref] = hashlib.blake2b(_assinatura(obj.get_object(), memo, profundidade + 1),
+                                        digest_size=16).digest()
+        return memo[ref]
+    if profundidade > 12:
+        return b"<fundo>"
+    if isinstance(obj, StreamObject):
+        try:
+            dados = obj.get_data()
+        except Exception:
+            dados = obj._data or b""
+        itens = {k: v for k, v in obj.items() if k not in ("/Length", "/Filter", "/DecodeParms")}
+        return b"S" + hashlib.blake2b(dados, digest_size=16).digest() + _assinatura(
+            DictionaryObject(itens), memo, profundidade + 1)
+    if isinstance(obj, DictionaryObject):
+        return b"{" + b"".join(
+            str(k).encode() + b":" + _assinatura(obj.raw_get(k), memo, profundidade + 1) + b","
+            for k in sorted(obj)
+        ) + b"}"
+    if isinstance(obj, ArrayObject):
+        return b"[" + b",".join(_assinatura(v, memo, profundidade + 1) for v in obj) + b"]"
+    if isinstance(obj, bytes):
+        return b"b" + bytes(obj)
+    return str(obj).encode("utf-8", "surrogatepass")
+
+
+def chave_pagina(pagina, extrator: str, memo: dict = None) -> str:
+    """
+    Chave de uma página pypdf para o extrator. memo: dicionário compartilhado
+    entre as páginas do mesmo documento (fontes repetidas são resolvidas uma vez).
+    """
+    memo = {} if memo is None else memo
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{extrator}|{_versao(EXTRATORES[extrator][0])}|{VERSAO}".encode())
+    conteudo = pagina.get_contents()
+    h.update(conteudo.get_data() if conteudo is not None else b"")
+    for atributo in ("/Resources", "/MediaBox", "/CropBox", "/Rotate"):
+        valor = pagina.raw_get(atributo) if atributo in pagina else None
+        h.update(atributo.encode() + (_assinatura(valor, memo) if valor is not None else b"-"))
+    return h.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Armazenamento
+# ----------------------------------------------------------------------
+class CachePaginas:
+    """
+    Páginas extraídas em SQLite (uma linha por chave, valor JSON comprimido).
+    Pode ser usado por vários processos ao mesmo tempo (WAL; gravações em lote
+    com INSERT OR IGNORE). Use como context manager ou chame fechar().
+    """
+
+    def __init__(self, caminho: str = CAMINHO_PADRAO):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conn = sqlite3.connect(caminho, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS paginas (chave TEXT PRIMARY KEY, dados BLOB NOT NULL)")
+        self._conn.commit()
+        self._novas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.fechar()
+
+    def obter(self, chave: str):
+        """Valor guardado para a chave, ou None."""
+        linha = self._conn.execute("SELECT dados FROM paginas WHERE chave = ?", (chave,)).fetchone()
+        metricas.cache("paginas", acerto=linha is not None)
+        return json.loads(zlib.decompress(linha[0])) if linha else None
+
+    def guardar(self, chave: str, valor):
+        self._novas.append((chave, zlib.compress(json.dumps(valor, ensure_ascii=False).encode("utf-8"), 6)))
+        if len(self._novas) >= LOTE:
+            self.gravar()
+
+    def gravar(self):
+        if not self._novas:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany("INSERT OR IGNORE INTO paginas (chave, dados) VALUES (?, ?)", self._novas)
+        except sqlite3.Error as e:
+            # cache é só otimização: falha de disco/lock não derruba a extração
+            logger.warning(f"⚠️ Cache de páginas não gravado ({len(self._novas)} página(s)): {e}")
+        self._novas = []
+
+    def fechar(self):
+        self.gravar()
+        self._conn.close()
+
+
+# ----------------------------------------------------------------------
+# Extração
+# ----------------------------------------------------------------------
+def texto_pypdf(pagina, estagio: str, cache: CachePaginas = None, memo: dict = None) -> str:
+    """Texto pypdf de uma página já aberta (ex.: no split, que também copia a página)."""
+    if cache is not None:
+        chave = chave_pagina(pagina, "pypdf-texto", memo)
+        texto = cache.obter(chave)
+        if texto is not None:
+            metricas.pagina("cache", estagio)
+            return texto
+    texto = _texto(pagina)
+    metricas.pagina("pypdf", estagio)
+    if cache is not None:
+        cache.guardar(chave, texto)
+    return texto
+
+
+def extrair(pdf_path: str, extrator: str, estagio: str, cache: CachePaginas = None):
+    """
+    Gera o resultado de `extrator` para cada página de pdf_path, em ordem
+    (pode parar no meio). Com cache, páginas já vistas saem do disco e o
+    pdfplumber só abre o PDF na primeira página que faltar. Cada página conta
+    em melodia_paginas_total com o backend que de fato a leu ("cache" se
+    veio do disco).
+    """
+    backend, funcao = EXTRATORES[extrator]
+    if cache is None:
+        with _paginas(pdf_path, backend) as paginas:
+            for pagina in paginas:
+                valor = funcao(pagina)
+                metricas.pagina(backend, estagio)
+                yield valor
+        return
+
+    from pypdf import PdfReader
+
+    memo = {}
+    documento = None
+    try:
+        for i, pagina_pypdf in enumerate(PdfReader(pdf_path).pages):
+            if backend == "pypdf":
+                yield texto_pypdf(pagina_pypdf, estagio, cache, memo)
+                continue
+            chave = chave_pagina(pagina_pypdf, extrator, memo)
+            valor = cache.obter(chave)
+            if valor is not None:
+                metricas.pagina("cache", estagio)
+            else:
+                if documento is None:
+                    import pdfplumber
+                    documento = pdfplumber.open(pdf_path)
+                valor = funcao(documento.pages[i])
+                metricas.pagina(backend, estagio)
+                cache.guardar(chave, valor)
+            yield valor
+    finally:
+        if documento is not None:
+            documento.close()
+        cache.gravar()
+
+
+@contextmanager
+def _paginas(pdf_path: str, backend: str):
+    if backend == "pypdf":
+        from pypdf import PdfReader
+        yield PdfReader(pdf_path).pages
+        return
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as documento:
+        yield documento.pages
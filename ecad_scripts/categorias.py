@@ -1,22 +1,26 @@
 import os
+import sys
 import time
 import re
-import warnings
 import logging
+from contextlib import closing
 
-import pdfplumber
 import pandas as pd
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-warnings.filterwarnings("ignore", category=UserWarning, module="pdfminer")
-logging.getLogger("pdfminer").setLevel(logging.ERROR)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts.export import exportar_tabela
+from ecad_scripts.layout import carregar_indice, aplica
+from ecad_scripts.limites import verificar
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.tokenizador import linhas_tabela
+from ecad_scripts import regioes
+from ecad_scripts.cache_paginas import extrair
+from ecad_scripts.valores import br_para_centavos
 
 date_pattern = re.compile(r'\b[A-ZÇ]{3,9}/\d{4}\b')
-numeric_pattern = re.compile(r'^\d{1,3}(?:\.\d{3})*,\d{2}$')
 
 
 def extract_data_referente(text):
@@ -24,17 +28,33 @@ def extract_data_referente(text):
     return match.group(0) if match else None
 
 
-def process_pdf(pdf_path: str, pasta_excel: str):
+def process_pdf(pdf_path: str, pasta_excel: str, formatos=(), escritor=None, modo: str = "texto", cache=None):
+    """
+    Extrai a tabela POR CATEGORIA de um PDF mensal e retorna o DataFrame bruto.
+    Só grava a tabela em pasta_excel quando formatos for informado
+    (em segundo plano, se houver escritor).
+    modo "regiao": lê as palavras posicionadas entre POR CATEGORIA e POR RUBRICA
+    e atribui cada valor à sua coluna (ver ecad_scripts.regioes); se as
+    colunas não forem reconhecidas, cai no modo "texto".
+    """
     filename = os.path.basename(pdf_path)
     logging.info(f"🔍 Processando categorias: {filename}")
 
     start_page = end_page = None
     data_referente = None
     page_texts = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
+    page_lines = []
+
+    extrator = "pdfplumber-palavras" if modo == "regiao" else "pdfplumber-texto"
+    with closing(extrair(pdf_path, extrator, "categorias", cache)) as paginas:
+        for i, pagina in enumerate(paginas, start=1):
+            verificar()
+            if modo == "regiao":
+                linhas = regioes.agrupar_linhas(pagina)
+                page_lines.append(linhas)
+                text = regioes.texto_da_pagina(linhas)
+            else:
+                text = pagina
             page_texts.append(text)
 
             if (d := extract_data_referente(text)):
@@ -48,8 +68,33 @@ def process_pdf(pdf_path: str, pasta_excel: str):
 
     if start_page is None or end_page is None:
         logging.error(f"❌ Tabela POR CATEGORIA não encontrada em: {filename}")
-        return
+        return None
+
+    df = None
+    if modo == "regiao":
+        df = regioes.tabela(page_lines[start_page - 1:end_page], "POR CATEGORIA", "POR RUBRICA",
+                            ("POR CATEGORIA", "TOTAL"))
+        if df is None:
+            logging.warning(f"⚠️ Colunas de POR CATEGORIA não reconhecidas em {filename}; usando o texto.")
 
+    header = [
+        "CATEGORIA", "DISTRIBUIÇÃO", "LIBERAÇÃO CRÉD. RETIDO",
+        "LIBERAÇÃO DE PENDENTE", "LIBERAÇÃO DE PARÂMETRO",
+        "AJUSTES", "TOTAL GERAL", "DATA REFERENTE"
+    ]
+    if df is None:
+        df = linhas_tabela(_trecho(page_texts, start_page, end_page), ("POR CATEGORIA", "TOTAL"))
+    df.columns = header[:-1]
+    df["DATA REFERENTE"] = data_referente
+
+    if formatos:
+        caminho_base = os.path.join(pasta_excel, f"tabela_extraida_{os.path.splitext(filename)[0]}")
+        (escritor.exportar if escritor else exportar_tabela)(df, caminho_base, formatos)
+    return df
+
+
+def _trecho(page_texts, start_page: int, end_page: int) -> list:
+    """Linhas de texto de POR CATEGORIA até POR RUBRICA."""
     segments = []
     for i in range(start_page, end_page + 1):
         txt = page_texts[i - 1]
@@ -60,48 +105,7 @@ def process_pdf(pdf_path: str, pasta_excel: str):
             idx = txt.find("POR RUBRICA")
             txt = txt[: idx + len("POR RUBRICA")] if idx != -1 else txt
         segments.append(txt)
-
-    combined = "\n".join(segments).splitlines()
-
-    header = [
-        "CATEGORIA", "DISTRIBUIÇÃO", "LIBERAÇÃO CRÉD. RETIDO",
-        "LIBERAÇÃO DE PENDENTE", "LIBERAÇÃO DE PARÂMETRO",
-        "AJUSTES", "TOTAL GERAL", "DATA REFERENTE"
-    ]
-    data = []
-    exclude = False
-
-    for line in combined:
-        if line.startswith("EXEC. - NÚM. DE EXECUÇÕES"):
-            exclude = True
-        if line.startswith("OBRA RUBRICA PERÍODO RENDIMENTO % RATEIO CORREÇÃO EXEC (OC)"):
-            exclude = False
-            continue
-        if exclude or not line.strip() or line.startswith(("POR CATEGORIA", "TOTAL")):
-            continue
-
-        parts = line.split()
-        nome_parts, valores = [], []
-
-        for p in parts:
-            if numeric_pattern.match(p) or p == "---":
-                valores.append(p)
-            else:
-                nome_parts.append(p)
-
-        nome = " ".join(nome_parts)
-        while len(valores) < len(header) - 2:
-            valores.insert(0, "---")
-        valores.append(data_referente)
-
-        data.append([nome] + valores)
-
-    df = pd.DataFrame(data, columns=header)
-
-    nome_excel = f"tabela_extraida_{os.path.splitext(filename)[0]}.xlsx"
-    caminho_excel = os.path.join(pasta_excel, nome_excel)
-    df.to_excel(caminho_excel, index=False)
-    logging.info(f"✅ Exportado para: {caminho_excel}")
+    return "\n".join(segments).splitlines()
 
 
 def compilar_excels(pasta_excel: str) -> pd.DataFrame:
@@ -116,6 +120,11 @@ def compilar_excels(pasta_excel: str) -> pd.DataFrame:
         except Exception as e:
             logging.error(f"Erro ao ler {arquivo}: {e}")
 
+    return compilar_dataframes(dfs)
+
+
+def compilar_dataframes(dfs) -> pd.DataFrame:
+    dfs = [d for d in dfs if d is not None and not d.empty]
     if not dfs:
         return pd.DataFrame()
 
@@ -137,24 +146,10 @@ def formatar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         "TOTAL GERAL"
     ]
 
-    def limpar_valor(val):
-        if pd.isna(val) or str(val).strip() == "---":
-            return 0.0
-        val = str(val).strip()
-        if "." in val and "," not in val:
-            try:
-                return float(val)
-            except ValueError:
-                return 0.0
-        val = val.replace(".", "").replace(",", ".")
-        try:
-            return float(val)
-        except ValueError:
-            return 0.0
-
+    # valores em centavos (int64), sem passar por float
     for col in colunas_numericas:
         if col in df.columns:
-            df[col] = df[col].apply(limpar_valor)
+            df[col] = br_para_centavos(df[col])
 
     if "DATA REFERENTE" in df.columns:
         def converter_data(texto):
@@ -177,33 +172,54 @@ def formatar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def run(base_dir: str):
+def run(base_dir: str, formatos=(), escritor=None, modo: str = "texto", cache=None,
+        arquivos=None):
+    """
+    Extrai categorias de {base_dir}/s_pdf_organizados e compila em memória.
+    formatos: formatos de exportação (ex.: ("parquet", "csv", "xlsx")); vazio = não grava nada.
+    escritor: EscritorAssincrono opcional; os arquivos só estão no disco após escritor.flush().
+    modo: "texto" (texto corrido da página) ou "regiao" (palavras posicionadas).
+    cache: CachePaginas opcional; páginas já extraídas não passam pelo pdfplumber.
+    arquivos: nomes dos PDFs mensais a ler (ex.: só os meses recentes); None = todos.
+    Retorna (df, gerados)
+    """
+    if modo not in regioes.MODOS:
+        raise ValueError(f"Modo de extração desconhecido: {modo}")
     inicio = time.time()
 
     pasta_pdfs = os.path.join(base_dir, "s_pdf_organizados")
     pasta_excel = os.path.join(base_dir, "s_tabelas", "categorias")
-    arquivo_compilado = os.path.join(base_dir, "s_tabelas", "compiladas", "tabela_compilada_categorias.xlsx")
+    base_compilado = os.path.join(base_dir, "s_tabelas", "compiladas", "tabela_compilada_categorias")
 
-    os.makedirs(pasta_excel, exist_ok=True)
-    os.makedirs(os.path.dirname(arquivo_compilado), exist_ok=True)
+    if formatos:
+        os.makedirs(pasta_excel, exist_ok=True)
+        os.makedirs(os.path.dirname(base_compilado), exist_ok=True)
 
-    for arquivo in os.listdir(pasta_pdfs):
+    indice = carregar_indice(pasta_pdfs)
+    dfs = []
+    for arquivo in sorted(os.listdir(pasta_pdfs)):
         if arquivo.lower().endswith(".pdf"):
-            process_pdf(os.path.join(pasta_pdfs, arquivo), pasta_excel)
-
-    df_compilado = compilar_excels(pasta_excel)
+            if arquivos is not None and arquivo not in arquivos:
+                continue
+            if not aplica(indice, arquivo, "categorias"):
+                logging.info(f"⏭️ {arquivo} sem POR CATEGORIA; pulando.")
+                continue
+            dfs.append(process_pdf(os.path.join(pasta_pdfs, arquivo), pasta_excel, formatos, escritor, modo, cache))
+
+    df_compilado = compilar_dataframes(dfs)
     df_compilado = formatar_dataframe(df_compilado)
 
-    if not df_compilado.empty:
-        df_compilado.to_excel(arquivo_compilado, index=False)
-        logging.info(f"📁 Compilado categorias salvo em: {arquivo_compilado}")
-    else:
+    gerados = []
+    if df_compilado.empty:
         logging.warning("⚠️ Compilado categorias vazio.")
+    elif formatos:
+        gerados = (escritor.exportar if escritor else exportar_tabela)(df_compilado, base_compilado, formatos)
 
     duracao = time.time() - inicio
     logging.info(f"⏱️ Categorias finalizado em: {duracao:.2f} s")
-    return df_compilado, arquivo_compilado
+    return df_compilado, gerados
 
 
 if __name__ == "__main__":
-    run(os.getcwd())
+    configurar_logging()
+    run(os.getcwd(), formatos=("xlsx",))
@@ -0,0 +1,310 @@
+"""
+MelodiaDataset: as tabelas consolidadas (categorias, rubricas, obras) com
+uma API de consulta preguiçosa, a mesma para o dashboard e para quem usa
+sem interface (CLI abaixo, scripts, serviços).
+
+    ds = MelodiaDataset.do_historico(conn, ["Meu catálogo"])
+    q = ds.tabela("rubricas").periodo("Mês", ["2024-01", "2024-02"])
+    q.somar("Rubrica_Modelo")
+    q.onde("Rubrica_Modelo", ["EXECUÇÃO PÚBLICA"]).somar("RUBRICA")
+
+periodo()/onde() só compõem um plano (imutável); nada é calculado até um
+terminal (coletar, somar, total, valores). O plano é normalizado (filtros
+na mesma coluna viram interseção, a ordem não importa) e aplicado numa
+máscara só. Frames filtrados e agregações ficam memorizados pelo plano, e
+um plano mais restrito parte do menor frame já filtrado que o contém (o
+drilldown filtra o período já recortado, não a tabela inteira).
+"""
+import os
+import sys
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts import historico, metricas
+from ecad_scripts.export import FORMATOS, WRITERS
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.reconciliacao import FONTES, totais_por_mes, fatores_por_mes, aplicar_fatores
+from ecad_scripts.valores import para_reais
+
+logger = logging.getLogger(__name__)
+
+# rótulo usado onde o texto veio vazio, por tabela
+ROTULOS_VAZIOS = {
+    "categorias": {"CATEGORIA": "(Sem nome)"},
+    "rubricas": {"Rubrica_Modelo": "Sem mapeamento", "RUBRICA": "(Sem nome)"},
+    "obras": {"Nome Obra": "(Sem nome)"},
+}
+# modo do filtro de período -> coluna (o modo "Dia" filtra a coluna de data)
+COLUNAS_PERIODO = {"Mês": "PERIODO_MES", "Trimestre": "PERIODO_TRIM", "Ano": "PERIODO_ANO"}
+# memo por dataset: frames filtrados (pesados) e agregações/listas (leves)
+MAX_FRAMES = 16
+MAX_AGREGADOS = 256
+
+_INTERVALO = "__intervalo__"
+
+
+def adicionar_periodos(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """Cria colunas PERIODO_DIA / MES / TRIM / ANO a partir de date_col (linhas sem data saem)."""
+    if df is None or df.empty or date_col not in df.columns:
+        return df
+
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    df = df.dropna(subset=[date_col])
+
+    if df.empty:
+        return df
+
+    df["PERIODO_DIA"] = df[date_col].dt.date.astype(str)           # YYYY-MM-DD
+    df["PERIODO_MES"] = df[date_col].dt.to_period("M").astype(str) # YYYY-MM
+    q = df[date_col].dt.to_period("Q").astype(str)                 # 2025Q3
+    df["PERIODO_TRIM"] = q.str.replace("Q", "-Q", regex=False)     # 2025-Q3
+    df["PERIODO_ANO"] = df[date_col].dt.year.astype(str)           # YYYY
+    return df
+
+
+def _normalizar(tabela: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Valor em int64 e rótulos vazios preenchidos, uma vez por tabela (não a cada consulta)."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    df = df.copy()
+    valor = FONTES[tabela]
+    if valor in df.columns:
+        df[valor] = pd.to_numeric(df[valor], errors="coerce").fillna(0).astype("int64")
+    for coluna, rotulo in ROTULOS_VAZIOS[tabela].items():
+        if coluna in df.columns:
+            df[coluna] = df[coluna].fillna(rotulo)
+    return df.reset_index(drop=True)
+
+
+class MelodiaDataset:
+    """
+    Tabelas consolidadas (com colunas PERIODO_*) e o memo das consultas.
+    Com fatores (reconciliacao.fatores_por_mes), obras é reconciliado com
+    rubricas mês a mês na construção: toda consulta já vê os valores ajustados.
+    """
+
+    def __init__(self, categorias: pd.DataFrame, rubricas: pd.DataFrame, obras: pd.DataFrame,
+                 fatores: pd.DataFrame = None):
+        if fatores is not None and obras is not None and not obras.empty:
+            obras = aplicar_fatores(obras, fatores)
+        self._tabelas = {
+            "categorias": _normalizar("categorias", categorias),
+            "rubricas": _normalizar("rubricas", rubricas),
+            "obras": _normalizar("obras", obras),
+        }
+        self.fatores = fatores
+        self._frames = OrderedDict()
+        self._agregados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def do_historico(cls, conn, titulares_sel, reconciliar: bool = True) -> "MelodiaDataset":
+        """Lê as três tabelas do histórico (SQLite) para os titulares."""
+        frames = {
+            tabela: adicionar_periodos(historico.carregar(conn, tabela, titulares_sel), spec["data_col"])
+            for tabela, spec in historico.TABELAS.items()
+        }
+        fatores = None
+        if reconciliar:
+            fatores = fatores_por_mes(totais_por_mes(frames["categorias"], frames["rubricas"], frames["obras"]))
+        return cls(frames["categorias"], frames["rubricas"], frames["obras"], fatores)
+
+    def tabela(self, nome: str) -> "Consulta":
+        if nome not in self._tabelas:
+            raise ValueError(f"Tabela desconhecida: {nome}")
+        return Consulta(self, nome)
+
+    # ------------------------------------------------------------------
+    # Memo (LRU)
+    # ------------------------------------------------------------------
+    def _lembrar(self, memo: OrderedDict, limite: int, chave, calcular):
+        with self._lock:
+            valor = memo.get(chave)
+            if valor is not None:
+                memo.move_to_end(chave)
+        metricas.cache("dataset", acerto=valor is not None)
+        if valor is not None:
+            return valor
+
+        valor = calcular()
+        with self._lock:
+            memo[chave] = valor
+            while len(memo) > limite:
+                memo.popitem(last=False)
+        return valor
+
+    def _filtrado(self, tabela: str, filtros: frozenset) -> pd.DataFrame:
+        """Tabela com filtros aplicados, partindo do menor frame memorizado que os contém."""
+        def calcular():
+            base, aplicados = self._tabelas[tabela], frozenset()
+            with self._lock:
+                for (t, f), df in self._frames.items():
+                    if t == tabela and f <= filtros and len(df) < len(base):
+                        base, aplicados = df, f
+            return _aplicar(base, filtros - aplicados)
+
+        if not filtros:
+            return self._tabelas[tabela]
+        return self._lembrar(self._frames, MAX_FRAMES, (tabela, filtros), calcular)
+
+    def _agregado(self, chave, calcular):
+        return self._lembrar(self._agregados, MAX_AGREGADOS, chave, calcular)
+
+
+def _aplicar(df: pd.DataFrame, filtros) -> pd.DataFrame:
+    """Todos os filtros numa máscara só (uma cópia no fim)."""
+    if df.empty or not filtros:
+        return df
+    mascara = np.ones(len(df), dtype=bool)
+    for chave, valores in filtros:
+        intervalo = isinstance(chave, tuple)  # (_INTERVALO, coluna de data)
+        coluna = chave[1] if intervalo else chave
+        if coluna not in df.columns:
+            continue  # tabela sem a coluna: o filtro não se aplica
+        if intervalo:
+            inicio, fim = valores
+            datas = pd.to_datetime(df[coluna], errors="coerce")
+            mascara &= ((datas >= inicio) & (datas <= fim)).to_numpy()
+        else:
+            mascara &= df[coluna].isin(valores).to_numpy()
+    return df[mascara]
+
+
+class Consulta:
+    """Plano imutável sobre uma tabela do MelodiaDataset; terminais calculam (com memo)."""
+
+    def __init__(self, dataset: MelodiaDataset, tabela: str, filtros: dict = None):
+        self._dataset = dataset
+        self.tabela = tabela
+        self._filtros = dict(filtros or {})
+
+    def __repr__(self):
+        return f"Consulta({self.tabela}, {sorted(self._filtros, key=str)})"
+
+    @property
+    def chave(self) -> frozenset:
+        """Identifica o plano: consultas com os mesmos filtros têm a mesma chave."""
+        return frozenset(self._filtros.items())
+
+    # ------------------------------------------------------------------
+    # Composição
+    # ------------------------------------------------------------------
+    def onde(self, coluna: str, valores) -> "Consulta":
+        """Linhas com coluna em valores (mais de um onde() na mesma coluna = interseção)."""
+        valores = frozenset(valores)
+        if coluna in self._filtros:
+            valores &= self._filtros[coluna]
+        return Consulta(self._dataset, self.tabela, {**self._filtros, coluna: valores})
+
+    def entre(self, coluna: str, inicio, fim) -> "Consulta":
+        """Linhas com a data de coluna em [inicio, fim]."""
+        chave = (_INTERVALO, coluna)
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        if chave in self._filtros:
+            anterior = self._filtros[chave]
+            inicio, fim = max(inicio, anterior[0]), min(fim, anterior[1])
+        return Consulta(self._dataset, self.tabela, {**self._filtros, chave: (inicio, fim)})
+
+    def periodo(self, modo: str, selecao) -> "Consulta":
+        """
+        Filtro de período do dashboard. modo: "Dia"|"Mês"|"Trimestre"|"Ano";
+        selecao: (inicio, fim) no modo Dia, lista de períodos nos demais
+        (lista vazia = nada selecionado = consulta vazia).
+        """
+        if modo == "Dia":
+            return self.entre(historico.TABELAS[self.tabela]["data_col"], *selecao)
+        if modo not in COLUNAS_PERIODO:
+            raise ValueError(f"Modo de período desconhecido: {modo}")
+        return self.onde(COLUNAS_PERIODO[modo], selecao or [])
+
+    # ------------------------------------------------------------------
+    # Terminais
+    # ------------------------------------------------------------------
+    def coletar(self) -> pd.DataFrame:
+        """Linhas filtradas (não altere o frame devolvido: ele fica no memo)."""
+        return self._dataset._filtrado(self.tabela, self.chave)
+
+    def somar(self, por, coluna: str = None, ordenar_por=None) -> pd.DataFrame:
+        """
+        groupby(por)[coluna].sum() (coluna padrão: o valor da tabela), ordenado
+        por coluna (decrescente) ou por ordenar_por (crescente).
+        """
+        coluna = coluna or FONTES[self.tabela]
+        por_chave = tuple(por) if isinstance(por, list) else por
+        ordem_chave = tuple(ordenar_por) if isinstance(ordenar_por, list) else ordenar_por
+
+        def calcular():
+            df = self.coletar()
+            if df.empty or coluna not in df.columns:
+                return pd.DataFrame(columns=[*([por] if isinstance(por, str) else por), coluna])
+            out = df.groupby(por, as_index=False)[coluna].sum()
+            if ordenar_por:
+                return out.sort_values(ordenar_por)
+            return out.sort_values(coluna, ascending=False)
+
+        return self._dataset._agregado(("somar", self.tabela, self.chave, por_chave, coluna, ordem_chave), calcular)
+
+    def total(self, coluna: str = None) -> int:
+        coluna = coluna or FONTES[self.tabela]
+        df = self.coletar()
+        return int(df[coluna].sum()) if coluna in df.columns else 0
+
+    def valores(self, coluna: str) -> list:
+        """Valores distintos de coluna no filtro, ordenados."""
+        def calcular():
+            df = self.coletar()
+            return sorted(df[coluna].dropna().unique().tolist()) if coluna in df.columns else []
+
+        return self._dataset._agregado(("valores", self.tabela, self.chave, coluna), calcular)
+
+    @property
+    def vazia(self) -> bool:
+        return self.coletar().empty
+
+
+# ----------------------------------------------------------------------
+# CLI: agregações direto do histórico, sem o dashboard
+# ----------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta agregada ao histórico do Melodia.")
+    parser.add_argument("tabela", choices=list(ROTULOS_VAZIOS))
+    parser.add_argument("--por", nargs="+", required=True, help="colunas de agrupamento (ex.: PERIODO_MES RUBRICA)")
+    parser.add_argument("--titular", nargs="+", required=True)
+    parser.add_argument("--db", default=os.environ.get("MELODIA_DB"), required=not os.environ.get("MELODIA_DB"),
+                        help="SQLite do histórico (padrão: MELODIA_DB); o dashboard grava um por catálogo "
+                             f"em {historico.PASTA_CATALOGOS}/<chave do link>.sqlite")
+    parser.add_argument("--modo", choices=["Dia", *COLUNAS_PERIODO], default="Mês")
+    parser.add_argument("--periodos", nargs="*", help="períodos (ex.: 2024-01 2024-02); no modo Dia: início e fim")
+    parser.add_argument("--sem-reconciliar", action="store_true", help="obras sem o ajuste contra rubricas")
+    parser.add_argument("--formato", choices=[f for f in FORMATOS if f != "xlsx"], default="csv")
+    args = parser.parse_args(argv)
+    if not os.path.isfile(args.db):
+        # conectar() criaria um histórico vazio e a consulta sairia sem dados
+        parser.error(f"histórico não encontrado: {args.db}")
+    configurar_logging()
+
+    conn = historico.conectar(args.db)
+    try:
+        ds = MelodiaDataset.do_historico(conn, args.titular, reconciliar=not args.sem_reconciliar)
+    finally:
+        conn.close()
+
+    consulta = ds.tabela(args.tabela)
+    if args.periodos:
+        consulta = consulta.periodo(args.modo, args.periodos)
+    por = args.por if len(args.por) > 1 else args.por[0]
+    WRITERS[args.formato](para_reais(consulta.somar(por)), sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import queue
+import logging
+import threading
+
+from ecad_scripts.export import WRITERS, exportar_tabela
+
+logger = logging.getLogger(__name__)
+
+_FIM = object()
+
+
+class ErroEscrita(Exception):
+    """Uma ou mais gravações em segundo plano falharam (lista em .falhas)."""
+
+    def __init__(self, falhas):
+        self.falhas = falhas
+        detalhes = "; ".join(f"{desc}: {erro}" for desc, erro in falhas)
+        super().__init__(f"{len(falhas)} gravação(ões) falharam: {detalhes}")
+
+
+class EscritorAssincrono:
+    """
+    Grava artefatos (PDFs mensais, tabelas exportadas) numa thread própria,
+    enquanto a extração continua na thread principal.
+
+    - a fila é limitada (max_fila): se o disco ficar para trás, quem enfileira
+      espera, em vez de acumular memória;
+    - flush() bloqueia até tudo que foi enfileirado estar gravado e levanta
+      ErroEscrita com as falhas acumuladas desde o último flush;
+    - DataFrames enfileirados não devem ser alterados até o flush.
+    """
+
+    def __init__(self, max_fila: int = 16):
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._falhas = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._trabalhar, name="escritor", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.fechar()
+
+    # ------------------------------------------------------------------
+    def gravar(self, descricao: str, funcao, *args, **kwargs):
+        """Enfileira funcao(*args, **kwargs); descricao identifica a gravação nos erros."""
+        if not self._thread.is_alive():
+            raise RuntimeError("Escritor encerrado.")
+        self._fila.put((descricao, funcao, args, kwargs))
+
+    def gravar_bytes(self, caminho: str, dados: bytes):
+        self.gravar(caminho, _escrever_bytes, caminho, dados)
+
+    def exportar(self, df, caminho_base: str, formatos) -> list:
+        """Versão assíncrona de exportar_tabela; retorna os caminhos que serão gravados."""
+        for formato in formatos:
+            if formato not in WRITERS:
+                raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        self.gravar(caminho_base, exportar_tabela, df, caminho_base, formatos)
+        return [f"{caminho_base}.{formato}" for formato in formatos]
+
+    def flush(self):
+        """Espera a fila esvaziar; levanta ErroEscrita se algo falhou."""
+        self._fila.join()
+        with self._lock:
+            falhas, self._falhas = self._falhas, []
+        if falhas:
+            raise ErroEscrita(falhas)
+
+    def fechar(self):
+        """Grava o que falta e encerra a thread (sem levantar erros pendentes)."""
+        if self._thread.is_alive():
+            self._fila.put(_FIM)
+            self._thread.join()
+
+    # ------------------------------------------------------------------
+    def _trabalhar(self):
+        while True:
+            item = self._fila.get()
+            try:
+                if item is _FIM:
+                    return
+                descricao, funcao, args, kwargs = item
+                try:
+                    funcao(*args, **kwargs)
+                except Exception as e:
+                    logger.error(f"❌ Falha ao gravar {descricao}: {e}")
+                    with self._lock:
+                        self._falhas.append((descricao, e))
+            finally:
+                self._fila.task_done()
+
+
+def _escrever_bytes(caminho: str, dados: bytes):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(dados)
@@ -0,0 +1,123 @@
+import io
+import os
+import logging
+
+import pandas as pd
+
+from ecad_scripts.valores import COLUNAS_VALOR, para_reais
+
+logger = logging.getLogger(__name__)
+
+# Formatos aceitos e extensões/MIME correspondentes
+FORMATOS = ("parquet", "csv", "xlsx")
+MIME = {
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+CHUNK_PADRAO = 10_000
+
+
+def iter_chunks(df: pd.DataFrame, chunk_size: int = CHUNK_PADRAO):
+    """Percorre o DataFrame em fatias de até chunk_size linhas (sem copiar)."""
+    for inicio in range(0, len(df), chunk_size):
+        yield df.iloc[inicio:inicio + chunk_size]
+
+
+def write_csv(df: pd.DataFrame, destino, chunk_size: int = CHUNK_PADRAO):
+    """Escreve CSV em blocos. destino: caminho ou buffer binário."""
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "w", encoding="utf-8", newline="") as f:
+            _write_csv_text(df, f, chunk_size)
+        return
+
+    texto = io.TextIOWrapper(destino, encoding="utf-8", newline="")
+    try:
+        _write_csv_text(df, texto, chunk_size)
+        texto.flush()
+    finally:
+        texto.detach()  # não fecha o buffer do chamador
+
+
+def _write_csv_text(df, f, chunk_size):
+    if df.empty:
+        df.to_csv(f, index=False)
+        return
+    for i, chunk in enumerate(iter_chunks(df, chunk_size)):
+        chunk.to_csv(f, index=False, header=(i == 0))
+
+
+def write_parquet(df: pd.DataFrame, destino, chunk_size: int = CHUNK_PADRAO):
+    """Escreve Parquet um row group por bloco. destino: caminho ou buffer binário."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(destino, schema) as writer:
+        for chunk in iter_chunks(df, chunk_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_xlsx(df: pd.DataFrame, destino, chunk_size: int = CHUNK_PADRAO, sheet_name: str = "Sheet1"):
+    """
+    Escreve Excel com openpyxl em modo write-only: as linhas vão direto para
+    o arquivo temporário da planilha, sem montar o workbook inteiro em memória.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    ws.append([str(c) for c in df.columns])
+
+    for chunk in iter_chunks(df, chunk_size):
+        # NaN/NaT não são aceitos pelo openpyxl -> célula vazia
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+
+    wb.save(destino)
+
+
+def iter_ndjson(df: pd.DataFrame, chunk_size: int = CHUNK_PADRAO):
+    """Um objeto JSON (str) por linha do DataFrame, em blocos: datas em ISO, NaN/NaT = null."""
+    for chunk in iter_chunks(df, chunk_size):
+        texto = chunk.to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+        yield from texto.splitlines()
+
+
+WRITERS = {
+    "parquet": write_parquet,
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+}
+
+
+def exportar_tabela(df: pd.DataFrame, caminho_base: str, formatos=FORMATOS, chunk_size: int = CHUNK_PADRAO):
+    """
+    Exporta df para {caminho_base}.{formato} em cada formato pedido, com as
+    colunas monetárias em centavos (inteiras) convertidas para reais, como os
+    cabeçalhos do demonstrativo. Colunas ainda em texto (tabelas brutas do
+    mês, ex. "1.234,56") saem como estão.
+    Retorna a lista de caminhos gravados.
+    """
+    centavos = [c for c in COLUNAS_VALOR if c in df.columns and pd.api.types.is_integer_dtype(df[c])]
+    if centavos:
+        df = para_reais(df, centavos)
+    caminhos = []
+    for formato in formatos:
+        if formato not in WRITERS:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        caminho = f"{caminho_base}.{formato}"
+        WRITERS[formato](df, caminho, chunk_size=chunk_size)
+        logger.info(f"📁 Exportado ({formato}): {caminho}")
+        caminhos.append(caminho)
+    return caminhos
+
+
+def to_bytes(df: pd.DataFrame, formato: str, chunk_size: int = CHUNK_PADRAO) -> bytes:
+    """Gera o arquivo em memória (para download), escrevendo em blocos."""
+    if formato not in WRITERS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    buffer = io.BytesIO()
+    WRITERS[formato](df, buffer, chunk_size=chunk_size)
+    return buffer.getvalue()
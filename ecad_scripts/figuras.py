@@ -0,0 +1,59 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from ecad_scripts import metricas
+
+
+def impressao_digital(df: pd.DataFrame, *parametros) -> str:
+    """
+    Hash do conteúdo de df (valores, colunas e dtypes, sem o índice) e dos
+    parâmetros do gráfico. Dois frames iguais dão a mesma chave mesmo sendo
+    objetos diferentes (cada rerun agrega de novo).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(parametros).encode())
+    if df is None:
+        return h.hexdigest()
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class CacheFiguras:
+    """
+    Figuras Plotly já montadas, por impressão digital do frame agregado +
+    parâmetros (LRU, compartilhado entre sessões e threads).
+
+    A figura guardada é o próprio objeto: quem usa não deve alterá-la
+    (st.plotly_chart só lê). Um gráfico que não mudou entre reruns pula o
+    plotly express e o update_layout.
+    """
+
+    def __init__(self, max_itens: int = 256):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, construir, df: pd.DataFrame, **parametros):
+        """construir(df, **parametros), ou a figura já montada para a mesma entrada."""
+        chave = impressao_digital(df, getattr(construir, "__name__", repr(construir)), sorted(parametros.items()))
+        with self._lock:
+            figura = self._itens.get(chave)
+            if figura is not None:
+                self._itens.move_to_end(chave)
+        metricas.cache("figuras", acerto=figura is not None)
+        if figura is not None:
+            return figura
+
+        figura = construir(df, **parametros)
+        with self._lock:
+            self._itens[chave] = figura
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return figura
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,276 @@
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = os.path.join("workspace", "historico.sqlite")
+# um arquivo por catálogo (o dashboard dá um a cada visitante; a chave fica no link)
+PASTA_CATALOGOS = os.path.join("workspace", "historicos")
+# 2: valores em centavos (INTEGER); a versão 1 guardava reais (REAL)
+# 3: arquivos.completo (0 = só a prévia dos meses recentes foi gravada)
+SCHEMA_VERSAO = 3
+
+# Colunas de cada tabela do histórico (além de titular / mes / arquivo).
+# Os nomes são os mesmos dos DataFrames do pipeline, para o dashboard ler direto.
+# Valores monetários em centavos.
+VALORES = [
+    ("DISTRIBUIÇÃO", "INTEGER"),
+    ("LIBERAÇÃO CRÉD. RETIDO", "INTEGER"),
+    ("LIBERAÇÃO DE PENDENTE", "INTEGER"),
+    ("LIBERAÇÃO DE PARÂMETRO", "INTEGER"),
+    ("AJUSTES", "INTEGER"),
+    ("TOTAL GERAL", "INTEGER"),
+]
+TABELAS = {
+    "categorias": {
+        "data_col": "DATA REFERENTE",
+        "colunas": [("CATEGORIA", "TEXT"), *VALORES, ("DATA REFERENTE", "TEXT")],
+        "indices": {"idx_categorias_titular_mes": ["titular", "mes", "CATEGORIA"]},
+    },
+    "rubricas": {
+        "data_col": "DATA REFERENTE",
+        "colunas": [("RUBRICA", "TEXT"), *VALORES, ("DATA REFERENTE", "TEXT"),
+                    ("Período", "TEXT"), ("Rubrica_Modelo", "TEXT")],
+        "indices": {
+            "idx_rubricas_titular_mes": ["titular", "mes", "RUBRICA"],
+            "idx_rubricas_titular_modelo": ["titular", "Rubrica_Modelo"],
+        },
+    },
+    "obras": {
+        "data_col": "Data",
+        "colunas": [("Nome Arquivo", "TEXT"), ("Código ECAD", "INTEGER"), ("Nome Obra", "TEXT"),
+                    ("Rateio", "INTEGER"), ("Data", "TEXT")],
+        "indices": {
+            "idx_obras_titular_mes": ["titular", "mes", "Código ECAD"],
+            "idx_obras_titular_codigo": ["titular", "Código ECAD"],
+        },
+    },
+}
+
+
+class MesesDeOutroArquivo(Exception):
+    """Meses do PDF já gravados a partir de outro arquivo (salvar sem substituir)."""
+
+    def __init__(self, meses, nomes):
+        self.meses = sorted(meses)
+        self.nomes = sorted(nomes)
+        super().__init__(f"mês(es) {', '.join(self.meses)} já importado(s) de {', '.join(self.nomes)}")
+
+
+def chave_catalogo_valida(chave: str) -> bool:
+    return bool(re.fullmatch(r"[0-9a-f]{16,64}", chave or ""))
+
+
+def caminho_catalogo(chave: str, pasta: str = PASTA_CATALOGOS) -> str:
+    """SQLite do catálogo chave (hex, como uuid4().hex) dentro de pasta."""
+    if not chave_catalogo_valida(chave):
+        raise ValueError(f"Chave de catálogo inválida: {chave!r}")
+    return os.path.join(pasta, f"{chave}.sqlite")
+
+
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def conectar(caminho: str = CAMINHO_PADRAO) -> sqlite3.Connection:
+    """Abre (e cria, se preciso) o histórico local em SQLite."""
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, exist_ok=True)
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    _criar_schema(conn)
+    return conn
+
+
+def _criar_schema(conn: sqlite3.Connection):
+    versao_atual = conn.execute("PRAGMA user_version").fetchone()[0]
+    existia = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'arquivos'").fetchone() is not None
+    antigas = _renomear_v1(conn) if existia and versao_atual < 2 else []
+
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS arquivos ("
+        " hash TEXT NOT NULL, titular TEXT NOT NULL, nome TEXT, importado_em TEXT,"
+        " completo INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (hash, titular))"
+    )
+    if existia and versao_atual < 3:
+        colunas = {r[1] for r in conn.execute("PRAGMA table_info(arquivos)")}
+        if "completo" not in colunas:
+            conn.execute("ALTER TABLE arquivos ADD COLUMN completo INTEGER NOT NULL DEFAULT 1")
+    for tabela, spec in TABELAS.items():
+        colunas = ", ".join(f"{_q(c)} {t}" for c, t in spec["colunas"])
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {tabela} (titular TEXT NOT NULL, mes TEXT, arquivo TEXT, {colunas})"
+        )
+        for nome_idx, cols in spec["indices"].items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {nome_idx} ON {tabela} ({', '.join(_q(c) for c in cols)})")
+    if antigas:
+        _copiar_v1_em_centavos(conn, antigas)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSAO}")
+    conn.commit()
+
+
+def _renomear_v1(conn: sqlite3.Connection) -> list:
+    """Versão 1 guardava reais em colunas REAL: tira as tabelas do caminho para recriá-las."""
+    antigas = []
+    for tabela, spec in TABELAS.items():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone():
+            for nome_idx in spec["indices"]:
+                conn.execute(f"DROP INDEX IF EXISTS {nome_idx}")
+            conn.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_v1")
+            antigas.append(tabela)
+    return antigas
+
+
+def _copiar_v1_em_centavos(conn: sqlite3.Connection, tabelas):
+    for tabela in tabelas:
+        spec = TABELAS[tabela]
+        destino = ", ".join(["titular", "mes", "arquivo", *(_q(c) for c, _ in spec["colunas"])])
+        origem = ", ".join(["titular", "mes", "arquivo", *(
+            f"CAST(ROUND({_q(c)} * 100) AS INTEGER)" if c in dict(VALORES) or c == "Rateio" else _q(c)
+            for c, _ in spec["colunas"]
+        )])
+        conn.execute(f"INSERT INTO {tabela} ({destino}) SELECT {origem} FROM {tabela}_v1")
+        conn.execute(f"DROP TABLE {tabela}_v1")
+    logger.info("🔁 Histórico migrado para valores em centavos.")
+
+
+def hash_arquivo(dados: bytes) -> str:
+    return hashlib.sha256(dados).hexdigest()
+
+
+def arquivo_importado(conn: sqlite3.Connection, titular: str, arquivo_hash: str) -> bool:
+    """Já gravado por inteiro? (uma prévia incompleta não conta: o arquivo é extraído de novo)"""
+    cur = conn.execute("SELECT 1 FROM arquivos WHERE hash = ? AND titular = ? AND completo = 1",
+                       (arquivo_hash, titular))
+    return cur.fetchone() is not None
+
+
+def _preparar(df: pd.DataFrame, tabela: str, titular: str, arquivo_hash: str) -> pd.DataFrame:
+    spec = TABELAS[tabela]
+    nomes = [c for c, _ in spec["colunas"]]
+    out = df.reindex(columns=nomes).copy()
+    datas = pd.to_datetime(out[spec["data_col"]], errors="coerce")
+    out[spec["data_col"]] = datas.dt.strftime("%Y-%m-%d")
+    out.insert(0, "arquivo", arquivo_hash)
+    out.insert(0, "mes", datas.dt.strftime("%Y-%m"))
+    out.insert(0, "titular", titular)
+    return out
+
+
+def salvar(conn: sqlite3.Connection, titular: str, arquivo_hash: str, nome_arquivo: str,
+           df_cat: pd.DataFrame, df_rub: pd.DataFrame, df_obr: pd.DataFrame, completo: bool = True,
+           substituir: bool = False):
+    """
+    Grava os resultados de um PDF no histórico do titular.
+    Os meses presentes no arquivo substituem os mesmos meses já gravados por
+    ele (reenviar um demonstrativo não duplica valores). Meses que vieram de
+    outro arquivo só são trocados com substituir=True; sem isso, nada é
+    gravado e sobe MesesDeOutroArquivo.
+    completo=False: só parte dos meses (prévia); o restante pode ser gravado
+    depois com outra chamada para o mesmo arquivo.
+    """
+    with conn:
+        for tabela, df in (("categorias", df_cat), ("rubricas", df_rub), ("obras", df_obr)):
+            if df is None or df.empty:
+                continue
+            linhas = _preparar(df, tabela, titular, arquivo_hash)
+            meses = linhas["mes"].dropna().unique().tolist()
+            if not substituir:
+                _conferir_outros_arquivos(conn, tabela, titular, arquivo_hash, meses)
+            conn.executemany(
+                f"DELETE FROM {tabela} WHERE titular = ? AND mes = ?",
+                [(titular, m) for m in meses],
+            )
+            linhas.to_sql(tabela, conn, if_exists="append", index=False)
+        conn.execute(
+            "INSERT OR REPLACE INTO arquivos (hash, titular, nome, importado_em, completo) VALUES (?, ?, ?, ?, ?)",
+            (arquivo_hash, titular, nome_arquivo, datetime.now().isoformat(timespec="seconds"), int(completo)),
+        )
+    logger.info(f"💾 Histórico atualizado: {nome_arquivo} ({titular})")
+
+
+def _conferir_outros_arquivos(conn: sqlite3.Connection, tabela: str, titular: str, arquivo_hash: str, meses):
+    if not meses:
+        return
+    marcas = ", ".join("?" * len(meses))
+    conflitos = conn.execute(
+        f"SELECT DISTINCT t.mes, COALESCE(a.nome, t.arquivo) FROM {tabela} t"
+        " LEFT JOIN arquivos a ON a.hash = t.arquivo AND a.titular = t.titular"
+        f" WHERE t.titular = ? AND t.mes IN ({marcas}) AND t.arquivo <> ?",
+        (titular, *meses, arquivo_hash),
+    ).fetchall()
+    if conflitos:
+        raise MesesDeOutroArquivo({m for m, _ in conflitos}, {n for _, n in conflitos})
+
+
+def titulares(conn: sqlite3.Connection) -> list:
+    cur = conn.execute("SELECT DISTINCT titular FROM arquivos ORDER BY titular")
+    return [r[0] for r in cur.fetchall()]
+
+
+def versao(conn: sqlite3.Connection) -> str:
+    """Muda sempre que algo é importado (use como parte da chave de cache)."""
+    n, ultimo = conn.execute("SELECT COUNT(*), MAX(importado_em) FROM arquivos").fetchone()
+    return f"{n}:{ultimo}"
+
+
+def assinaturas(conn: sqlite3.Connection, titulares_sel) -> dict:
+    """
+    {(tabela, titular, arquivo): (linhas, maior rowid)} dos titulares pedidos.
+    Muda quando um arquivo entra, sai ou perde meses substituídos por outro
+    demonstrativo: é o que o dashboard usa para aplicar só as diferenças.
+    """
+    titulares_sel = list(titulares_sel or [])
+    if not titulares_sel:
+        return {}
+    marcadores = ", ".join("?" * len(titulares_sel))
+    out = {}
+    for tabela in TABELAS:
+        cur = conn.execute(
+            f"SELECT titular, arquivo, COUNT(*), MAX(rowid) FROM {tabela}"
+            f" WHERE titular IN ({marcadores}) GROUP BY titular, arquivo",
+            titulares_sel,
+        )
+        for titular, arquivo, n, ultimo in cur.fetchall():
+            out[(tabela, titular, arquivo)] = (n, ultimo)
+    return out
+
+
+def carregar(conn: sqlite3.Connection, tabela: str, titulares_sel, mes_inicio: str = None,
+             mes_fim: str = None, arquivos=None) -> pd.DataFrame:
+    """
+    Lê uma tabela do histórico para os titulares pedidos (consulta indexada),
+    opcionalmente restrita ao intervalo de meses "YYYY-MM" [mes_inicio, mes_fim].
+    Com arquivos (hashes), lê só as linhas desses arquivos e inclui a coluna "arquivo".
+    """
+    spec = TABELAS[tabela]
+    titulares_sel = list(titulares_sel or [])
+    if not titulares_sel:
+        return pd.DataFrame()
+
+    where = [f"titular IN ({', '.join('?' * len(titulares_sel))})"]
+    params = list(titulares_sel)
+    if mes_inicio:
+        where.append("mes >= ?")
+        params.append(mes_inicio)
+    if mes_fim:
+        where.append("mes <= ?")
+        params.append(mes_fim)
+    extras = ["titular"]
+    if arquivos is not None:
+        arquivos = list(arquivos)
+        where.append(f"arquivo IN ({', '.join('?' * len(arquivos))})")
+        params.extend(arquivos)
+        extras.append("arquivo")
+
+    colunas = ", ".join([*extras, *(_q(c) for c, _ in spec["colunas"])])
+    sql = f"SELECT {colunas} FROM {tabela} WHERE {' AND '.join(where)}"
+    df = pd.read_sql_query(sql, conn, params=params)
+    df[spec["data_col"]] = pd.to_datetime(df[spec["data_col"]], errors="coerce")
+    return df
@@ -0,0 +1,159 @@
+import logging
+from collections import Counter
+
+import pandas as pd
+
+from ecad_scripts import analitico, historico, metricas
+from ecad_scripts.dataset import MelodiaDataset
+from ecad_scripts.obras import nome_mais_recente
+from ecad_scripts.reconciliacao import FONTES, fatores_por_mes
+
+logger = logging.getLogger(__name__)
+
+# tabela do histórico -> coluna de data usada nos períodos
+DATA_COL = {tabela: spec["data_col"] for tabela, spec in historico.TABELAS.items()}
+PERIODOS = ("PERIODO_DIA", "PERIODO_MES", "PERIODO_TRIM", "PERIODO_ANO")
+_TOTAL = {"categorias": "total_cat", "rubricas": "total_rub", "obras": "total_obr"}
+
+
+class EstadoIncremental:
+    """
+    Estado derivado do dashboard (tabelas com colunas de período, listas de
+    mês/trimestre/ano, intervalo de datas e totais mensais da reconciliação)
+    mantido por arquivo importado.
+
+    atualizar() compara as assinaturas do histórico com as já aplicadas e só
+    mexe no que mudou: arquivos novos entram como delta (lidos, preparados e
+    somados aos contadores), arquivos que saíram ou perderam meses são
+    subtraídos. Sem mudanças, nada é relido nem recalculado.
+
+    O MelodiaDataset (dataset()) e as métricas de crescimento (janelas())
+    são montados sob demanda sobre o histórico inteiro e guardados até a
+    próxima mudança.
+
+    preparar(df, data_col) deve devolver df com as colunas PERIODO_*.
+    """
+
+    def __init__(self, preparar):
+        self._preparar = preparar
+        self._assinaturas = {}
+        self._frames = {tabela: pd.DataFrame() for tabela in historico.TABELAS}
+        self._contagens = {p: Counter() for p in PERIODOS}
+        self._totais = {tabela: pd.Series(dtype="int64") for tabela in historico.TABELAS}
+        self._janelas = {}  # (tabela, chave) -> saída de analitico.janelas
+        self._dataset = None
+
+    # ------------------------------------------------------------------
+    def atualizar(self, conn, titulares_sel) -> bool:
+        """Aplica as diferenças do histórico para titulares_sel; retorna se algo mudou."""
+        atuais = historico.assinaturas(conn, titulares_sel)
+        saem = {k for k, v in self._assinaturas.items() if atuais.get(k) != v}
+        entram = {k for k, v in atuais.items() if self._assinaturas.get(k) != v}
+        metricas.cache("estado_derivado", acerto=not saem and not entram)
+        if not saem and not entram:
+            return False
+
+        for tabela in historico.TABELAS:
+            sai = {(tit, arq) for (t, tit, arq) in saem if t == tabela}
+            entra = {(tit, arq) for (t, tit, arq) in entram if t == tabela}
+            if sai:
+                self._subtrair(tabela, sai)
+            if entra:
+                self._somar(tabela, self._ler(conn, tabela, entra))
+
+        self._assinaturas = atuais
+        self._janelas.clear()
+        self._dataset = None
+        logger.info(f"🔄 Estado do dashboard atualizado: {len(entram)} entrada(s), {len(saem)} saída(s).")
+        return True
+
+    @property
+    def versao(self) -> frozenset:
+        """Assinaturas aplicadas: a mesma em sessões que veem os mesmos arquivos (chave de cache)."""
+        return frozenset(self._assinaturas.items())
+
+    def tabelas(self):
+        """(categorias, rubricas, obras) já com colunas de período."""
+        return tuple(self._frames[t] for t in ("categorias", "rubricas", "obras"))
+
+    def periodos(self, coluna: str) -> list:
+        return sorted(k for k, n in self._contagens[coluna].items() if n > 0)
+
+    def intervalo_datas(self):
+        dias = self.periodos("PERIODO_DIA")
+        if not dias:
+            return None, None
+        return pd.to_datetime(dias[0]), pd.to_datetime(dias[-1])
+
+    def totais_por_mes(self) -> pd.DataFrame:
+        """Mesmo formato de reconciliacao.totais_por_mes, sem reler as tabelas."""
+        meses = self.periodos("PERIODO_MES")
+        out = pd.DataFrame({"PERIODO_MES": meses})
+        for tabela, coluna in _TOTAL.items():
+            out[coluna] = self._totais[tabela].reindex(meses, fill_value=0).to_numpy(dtype="int64")
+        return out
+
+    def dataset(self) -> MelodiaDataset:
+        """Consultas sobre as tabelas atuais, com obras reconciliado mês a mês contra rubricas."""
+        if self._dataset is None:
+            self._dataset = MelodiaDataset(*self.tabelas(), fatores=fatores_por_mes(self.totais_por_mes()))
+        return self._dataset
+
+    def janelas(self, tabela: str, chave: str) -> pd.DataFrame:
+        """
+        analitico.janelas da tabela agregada por chave (ex.: rubricas por
+        Rubrica_Modelo), com obras reconciliado mês a mês contra rubricas.
+        Obras por Código ECAD ganham a coluna Nome Obra (o nome mais recente
+        do código), já que títulos iguais podem ser obras diferentes.
+        """
+        memo = (tabela, chave)
+        metricas.cache("janelas", acerto=memo in self._janelas)
+        if memo not in self._janelas:
+            df = self._frames[tabela]
+            matriz = analitico.matriz_mensal(df, chave, FONTES[tabela])
+            if tabela == "obras":
+                matriz = analitico.reconciliar(matriz, fatores_por_mes(self.totais_por_mes()))
+            jan = analitico.janelas(matriz, chave)
+            if tabela == "obras" and chave == "Código ECAD" and not df.empty:
+                nomes = nome_mais_recente(df[["Código ECAD", "Nome Obra", "Data"]]).set_index("Código ECAD")
+                jan.insert(2, "Nome Obra", jan["Código ECAD"].map(nomes["Nome Obra"]))
+            self._janelas[memo] = jan
+        return self._janelas[memo]
+
+    # ------------------------------------------------------------------
+    def _ler(self, conn, tabela, pares) -> pd.DataFrame:
+        titulares = sorted({tit for tit, _ in pares})
+        arquivos = sorted({arq for _, arq in pares})
+        df = historico.carregar(conn, tabela, titulares, arquivos=arquivos)
+        if df.empty:
+            return df
+        # o mesmo hash pode existir para outro titular que não mudou
+        chave = pd.MultiIndex.from_frame(df[["titular", "arquivo"]])
+        df = df[chave.isin(list(pares))]
+        return self._preparar(df, DATA_COL[tabela])
+
+    def _somar(self, tabela, df):
+        if df is None or df.empty:
+            return
+        self._contabilizar(tabela, df, +1)
+        atual = self._frames[tabela]
+        self._frames[tabela] = df if atual.empty else pd.concat([atual, df], ignore_index=True)
+
+    def _subtrair(self, tabela, pares):
+        atual = self._frames[tabela]
+        if atual.empty:
+            return
+        chave = pd.MultiIndex.from_frame(atual[["titular", "arquivo"]])
+        sai = chave.isin(list(pares))
+        self._contabilizar(tabela, atual[sai], -1)
+        self._frames[tabela] = atual[~sai].reset_index(drop=True)
+
+    def _contabilizar(self, tabela, df, sinal: int):
+        for coluna in PERIODOS:
+            if coluna in df.columns:
+                contagem = df[coluna].value_counts()
+                self._contagens[coluna].update({k: sinal * int(n) for k, n in contagem.items()})
+        valor = FONTES[tabela]
+        if valor in df.columns and "PERIODO_MES" in df.columns:
+            delta = pd.to_numeric(df[valor], errors="coerce").fillna(0).astype("int64").groupby(df["PERIODO_MES"]).sum()
+            self._totais[tabela] = self._totais[tabela].add(sinal * delta, fill_value=0).astype("int64")
@@ -0,0 +1,96 @@
+import os
+import re
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Gravado pelo split ao lado dos PDFs mensais
+INDICE_ARQUIVO = "indice.json"
+
+# Cabeçalho de valores que os parsers de categorias/rubricas esperam
+COLUNAS_V1 = [
+    "DISTRIBUIÇÃO", "LIBERAÇÃO CRÉD. RETIDO", "LIBERAÇÃO DE PENDENTE",
+    "LIBERAÇÃO DE PARÂMETRO", "AJUSTES", "TOTAL GERAL",
+]
+
+_LINHA_OBRA = re.compile(r"^\s*\d{2,}\s.*\d,\d{2}", re.MULTILINE)
+
+
+def _compacto(texto: str) -> str:
+    # pypdf e pdfplumber não separam as palavras igual: compara sem espaços
+    return re.sub(r"\s+", "", texto or "")
+
+
+def _tem_trecho(paginas, inicio: str, fim: str) -> bool:
+    """Mesmo critério dos parsers: página com `inicio` e, dela em diante, uma com `fim`."""
+    inicio, fim = _compacto(inicio), _compacto(fim)
+    achou_inicio = False
+    for texto in paginas:
+        texto = _compacto(texto)
+        achou_inicio = achou_inicio or inicio in texto
+        if achou_inicio and fim in texto:
+            return True
+    return False
+
+
+def _tem_obras(paginas) -> bool:
+    """Alguma linha "código nome ... valor" depois da primeira menção a OBRA."""
+    texto = "\n".join(p or "" for p in paginas)
+    idx = texto.find("OBRA")
+    return idx != -1 and _LINHA_OBRA.search(texto, idx) is not None
+
+
+def sondar(paginas) -> dict:
+    """
+    Sonda rápida do texto (já extraído no split) das páginas de um mês.
+    Retorna {"secoes": [...], "layout": "v1" | "desconhecido"}.
+    """
+    secoes = []
+    if _tem_trecho(paginas, "POR CATEGORIA", "POR RUBRICA"):
+        secoes.append("categorias")
+    if _tem_trecho(paginas, "POR RUBRICA", "TOTAL DO TITULAR"):
+        secoes.append("rubricas")
+    if _tem_obras(paginas):
+        secoes.append("obras")
+
+    completo = _compacto("\n".join(p or "" for p in paginas))
+    layout = "v1" if all(_compacto(c) in completo for c in COLUNAS_V1) else "desconhecido"
+    return {"secoes": secoes, "layout": layout}
+
+
+def salvar_indice(pasta_pdfs: str, indice: dict):
+    caminho = os.path.join(pasta_pdfs, INDICE_ARQUIVO)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def carregar_indice(pasta_pdfs: str) -> dict:
+    """Índice {arquivo.pdf: {...}} do split; vazio se não existir (ex.: pasta montada à mão)."""
+    caminho = os.path.join(pasta_pdfs, INDICE_ARQUIVO)
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Índice de layout ilegível ({e}); processando todos os PDFs.")
+        return {}
+
+
+def aplica(indice: dict, arquivo: str, secao: str) -> bool:
+    """O parser da seção deve rodar neste PDF? Sem informação no índice, sim."""
+    info = indice.get(arquivo)
+    return info is None or secao in info.get("secoes", [])
+
+
+def meses_em_ordem(arquivos) -> list:
+    """PDFs mensais do split em ordem cronológica (os sem data de referência primeiro)."""
+    # nomes do split: "AAAA_MM.pdf" ou "sem_data_<página>.pdf"
+    return sorted(arquivos, key=lambda arquivo: (arquivo[:4].isdigit(), arquivo))
+
+
+def alguma(indice: dict, secao: str) -> bool:
+    """Algum mês tem a seção? (índice vazio = não sabemos, então sim)"""
+    return not indice or any(secao in info.get("secoes", []) for info in indice.values())
@@ -0,0 +1,119 @@
+import os
+import time
+import signal
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+
+class Limites(NamedTuple):
+    """Limites de um job de extração (None = sem limite)."""
+    timeout_s: Optional[float] = None
+    max_paginas: Optional[int] = None
+    max_memoria_mb: Optional[int] = None
+    # arquivo cuja existência pede o cancelamento do job (checado entre páginas)
+    arquivo_cancelamento: Optional[str] = None
+
+
+class LimiteExcedido(Exception):
+    """
+    Job interrompido. motivo: "tempo" | "paginas" | "memoria" | "cancelado".
+    Os args são só strings: a exceção volta intacta dos workers do pool.
+    """
+
+    def __init__(self, motivo: str, detalhe: str = ""):
+        super().__init__(motivo, detalhe)
+        self.motivo = motivo
+        self.detalhe = detalhe
+
+    def __str__(self):
+        return f"{self.motivo}: {self.detalhe}" if self.detalhe else self.motivo
+
+    def como_dict(self) -> dict:
+        return {"erro": "limite_excedido", "motivo": self.motivo, "detalhe": self.detalhe}
+
+
+class _Controle:
+    def __init__(self, limites: Limites):
+        self.limites = limites
+        self.prazo = time.monotonic() + limites.timeout_s if limites.timeout_s else None
+        self.paginas = 0
+
+
+_ATUAL = contextvars.ContextVar("limites_extracao", default=None)
+
+
+def rss_mb() -> float:
+    """RSS atual (Linux); fora dele, o pico do processo (0 se indisponível)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+def verificar(paginas: int = 0):
+    """
+    Ponto de cancelamento cooperativo, chamado entre páginas pelos parsers.
+    paginas: páginas do documento lidas desde a última chamada (conta no limite).
+    Sem limites ativos não faz nada.
+    """
+    controle = _ATUAL.get()
+    if controle is None:
+        return
+    lim = controle.limites
+
+    if lim.arquivo_cancelamento and os.path.exists(lim.arquivo_cancelamento):
+        raise LimiteExcedido("cancelado", "job cancelado")
+    if controle.prazo is not None and time.monotonic() > controle.prazo:
+        raise LimiteExcedido("tempo", f"mais de {lim.timeout_s:g} s")
+    if paginas:
+        controle.paginas += paginas
+        if lim.max_paginas and controle.paginas > lim.max_paginas:
+            raise LimiteExcedido("paginas", f"mais de {lim.max_paginas} páginas")
+    if lim.max_memoria_mb and rss_mb() > lim.max_memoria_mb:
+        raise LimiteExcedido("memoria", f"mais de {lim.max_memoria_mb} MB")
+
+
+def _estourou(signum, frame):
+    controle = _ATUAL.get()
+    segundos = controle.limites.timeout_s if controle else 0
+    raise LimiteExcedido("tempo", f"mais de {segundos:g} s (interrompido)")
+
+
+@contextmanager
+def aplicar(limites: Optional[Limites]):
+    """
+    Ativa limites para o bloco (contextvars: vale só para este job/thread).
+    Na thread principal (ex.: workers do pool) o prazo também é garantido por
+    SIGALRM, que interrompe mesmo uma página que não termina; nas demais
+    threads vale só a checagem cooperativa de verificar().
+    """
+    if limites is None:
+        yield
+        return
+
+    token = _ATUAL.set(_Controle(limites))
+    alarme = (
+        limites.timeout_s is not None
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if alarme:
+        anterior = signal.signal(signal.SIGALRM, _estourou)
+        signal.setitimer(signal.ITIMER_REAL, limites.timeout_s)
+    try:
+        yield
+    except MemoryError:
+        raise LimiteExcedido("memoria", "MemoryError durante a extração")
+    finally:
+        if alarme:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, anterior)
+        _ATUAL.reset(token)
@@ -0,0 +1,24 @@
+import logging
+import warnings
+
+_configurado = False
+
+
+def configurar_logging(level=logging.INFO):
+    """
+    Configura logging e filtros de warnings uma única vez por processo.
+    Deve ser chamada só nos pontos de entrada (app, CLIs), não nos módulos.
+    """
+    global _configurado
+    if _configurado:
+        return
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    # pdfminer (usado pelo pdfplumber) e pypdf são muito verbosos com PDFs do ECAD
+    warnings.filterwarnings("ignore", category=UserWarning, module="pdfminer")
+    warnings.filterwarnings("ignore", category=UserWarning, module="pypdf")
+    logging.getLogger("pdfminer").setLevel(logging.ERROR)
+    _configurado = True
@@ -0,0 +1,266 @@
+"""
+Registro de métricas em memória, exposto no formato texto do Prometheus.
+
+Contadores, medidores e histogramas são identificados por nome + rótulos.
+Nos workers do pool cada job começa com o registro zerado e devolve um
+instantaneo(), que o processo do app soma com mesclar(): o app enxerga as
+páginas e latências de todos os processos.
+
+Exposição: texto() (string), servir(porta) (HTTP /metrics) ou
+gravar_periodicamente(caminho) (arquivo para o textfile collector).
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# nome -> (tipo, descrição); nomes fora daqui saem como "untyped"
+METRICAS = {
+    "melodia_paginas_total": ("counter", "Páginas extraídas por backend e estágio."),
+    "melodia_backend_segundos_total": ("counter", "Tempo gasto nos estágios de cada backend de PDF."),
+    "melodia_paginas_por_segundo": ("gauge", "Páginas por segundo por backend (acumulado do processo)."),
+    "melodia_estagio_segundos": ("histogram", "Latência dos estágios do pipeline."),
+    "melodia_job_segundos": ("histogram", "Tempo de um job do pool, da fila ao resultado."),
+    "melodia_jobs_total": ("counter", "Jobs de extração concluídos por resultado."),
+    "melodia_cache_total": ("counter", "Consultas a caches por resultado (acerto/falta)."),
+    "melodia_fila_jobs": ("gauge", "Jobs no pool de extração por estado."),
+    "melodia_workspace_bytes": ("gauge", "Espaço em disco usado pelo workspace."),
+    "melodia_http_requisicoes_total": ("counter", "Requisições ao serviço de extração por rota e status."),
+    "melodia_http_em_andamento": ("gauge", "Extrações em andamento no serviço HTTP."),
+}
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+_contadores = {}   # (nome, rotulos) -> valor
+_medidores = {}    # (nome, rotulos) -> valor
+_histogramas = {}  # (nome, rotulos) -> [contagens por bucket (+Inf no fim), soma]
+_coletores = []    # funções chamadas antes de cada exposição (ex.: profundidade da fila)
+
+
+def _chave(nome: str, rotulos: dict):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+
+# ----------------------------------------------------------------------
+# Registro
+# ----------------------------------------------------------------------
+def contar(nome: str, valor: float = 1, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def definir(nome: str, valor: float, **rotulos):
+    with _lock:
+        _medidores[_chave(nome, rotulos)] = valor
+
+
+def observar(nome: str, valor: float, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _lock:
+        hist = _histogramas.get(chave)
+        if hist is None:
+            hist = _histogramas[chave] = [[0] * (len(BUCKETS) + 1), 0.0]
+        # contagens não cumulativas aqui; texto() acumula
+        i = next((i for i, limite in enumerate(BUCKETS) if valor <= limite), len(BUCKETS))
+        hist[0][i] += 1
+        hist[1] += valor
+
+
+def cache(nome: str, acerto: bool):
+    contar("melodia_cache_total", cache=nome, resultado="acerto" if acerto else "falta")
+
+
+def pagina(backend: str, estagio: str, n: int = 1):
+    contar("melodia_paginas_total", n, backend=backend, estagio=estagio)
+
+
+@contextmanager
+def cronometro(estagio: str, backend: str = None):
+    """Observa a duração do bloco em melodia_estagio_segundos (e no tempo do backend)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        observar("melodia_estagio_segundos", duracao, estagio=estagio)
+        if backend:
+            contar("melodia_backend_segundos_total", duracao, backend=backend)
+
+
+def coletor(funcao):
+    """Registra funcao(), chamada antes de cada exposição para atualizar medidores."""
+    with _lock:
+        _coletores.append(funcao)
+    return funcao
+
+
+def remover_coletor(funcao):
+    with _lock:
+        if funcao in _coletores:
+            _coletores.remove(funcao)
+
+
+# ----------------------------------------------------------------------
+# Entre processos
+# ----------------------------------------------------------------------
+def zerar():
+    with _lock:
+        _contadores.clear()
+        _medidores.clear()
+        _histogramas.clear()
+
+
+def instantaneo() -> dict:
+    """Cópia serializável (pickle) do registro."""
+    with _lock:
+        return {
+            "contadores": dict(_contadores),
+            "medidores": dict(_medidores),
+            "histogramas": {k: [list(c), s] for k, (c, s) in _histogramas.items()},
+        }
+
+
+def mesclar(dados: dict):
+    """Soma contadores e histogramas de outro processo; medidores são sobrescritos."""
+    if not dados:
+        return
+    with _lock:
+        for chave, valor in dados.get("contadores", {}).items():
+            _contadores[chave] = _contadores.get(chave, 0) + valor
+        _medidores.update(dados.get("medidores", {}))
+        for chave, (contagens, soma) in dados.get("histogramas", {}).items():
+            hist = _histogramas.get(chave)
+            if hist is None:
+                _histogramas[chave] = [list(contagens), soma]
+            else:
+                hist[0] = [a + b for a, b in zip(hist[0], contagens)]
+                hist[1] += soma
+
+
+# ----------------------------------------------------------------------
+# Exposição
+# ----------------------------------------------------------------------
+def _formatar_rotulos(rotulos, extra=()) -> str:
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    escapar = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _paginas_por_segundo():
+    paginas, segundos = {}, {}
+    for (nome, rotulos), valor in _contadores.items():
+        backend = dict(rotulos).get("backend")
+        if nome == "melodia_paginas_total":
+            paginas[backend] = paginas.get(backend, 0) + valor
+        elif nome == "melodia_backend_segundos_total":
+            segundos[backend] = segundos.get(backend, 0) + valor
+    for backend, n in paginas.items():
+        if segundos.get(backend):
+            _medidores[_chave("melodia_paginas_por_segundo", {"backend": backend})] = n / segundos[backend]
+
+
+def texto() -> str:
+    """Registro no formato de exposição texto do Prometheus (0.0.4)."""
+    with _lock:
+        coletores = list(_coletores)
+    for funcao in coletores:
+        try:
+            funcao()
+        except Exception as e:
+            logger.warning(f"⚠️ Coletor de métricas falhou: {e}")
+
+    with _lock:
+        _paginas_por_segundo()
+        series = {}
+        for (nome, rotulos), valor in sorted({**_contadores, **_medidores}.items()):
+            series.setdefault(nome, []).append(f"{nome}{_formatar_rotulos(rotulos)} {_numero(valor)}")
+        for (nome, rotulos), (contagens, soma) in sorted(_histogramas.items()):
+            linhas = series.setdefault(nome, [])
+            acumulado = 0
+            for limite, n in zip(list(BUCKETS) + ["+Inf"], contagens):
+                acumulado += n
+                le = limite if limite == "+Inf" else _numero(float(limite))
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', le)])} {acumulado}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_numero(float(soma))}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {acumulado}")
+
+    saida = []
+    for nome in sorted(series):
+        tipo, descricao = METRICAS.get(nome, ("untyped", ""))
+        if descricao:
+            saida.append(f"# HELP {nome} {descricao}")
+        saida.append(f"# TYPE {nome} {tipo}")
+        saida.extend(series[nome])
+    return "\n".join(saida) + "\n"
+
+
+def uso_disco(pasta: str) -> int:
+    """Bytes ocupados pelos arquivos de pasta (0 se não existir)."""
+    total = 0
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nome))
+            except OSError:
+                pass  # apagado durante a varredura
+    return total
+
+
+def salvar(caminho: str) -> str:
+    """Grava texto() de forma atômica (quem lê nunca vê o arquivo pela metade)."""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(texto())
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def gravar_periodicamente(caminho: str, intervalo_s: float = 15.0) -> threading.Thread:
+    def _laco():
+        while True:
+            try:
+                salvar(caminho)
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível gravar métricas em {caminho}: {e}")
+            time.sleep(intervalo_s)
+
+    thread = threading.Thread(target=_laco, name="metricas-arquivo", daemon=True)
+    thread.start()
+    return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = texto().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # um acesso por scrape poluiria o log
+
+
+def servir(porta: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sobe GET /metrics numa thread daemon; levanta OSError se a porta estiver ocupada."""
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    logger.info(f"📈 Métricas em http://{host}:{servidor.server_address[1]}/metrics")
+    return servidor
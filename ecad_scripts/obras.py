@@ -1,21 +1,25 @@
 import os
+import sys
 import re
 import time
 import logging
-import warnings
 
 import pandas as pd
-from pypdf import PdfReader
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s"
-)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts.export import exportar_tabela
+from ecad_scripts.layout import carregar_indice, aplica
+from ecad_scripts.limites import verificar
+from ecad_scripts.cache_paginas import extrair
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.tokenizador import linhas_obras
+from ecad_scripts.valores import br_para_centavos
+
 logger = logging.getLogger(__name__)
-warnings.filterwarnings("ignore", category=UserWarning)
 
-# Aceita SOMENTE dinheiro BR: 1.234,56  ou 12,34  ou 123,45
-MONEY_BR = re.compile(r"^\d{1,3}(?:\.\d{3})*,\d{2}$")
 DATE_REF = re.compile(r"\b[A-ZÇ]{3,9}/\d{4}\b")
 
 MESES = {
@@ -24,11 +28,6 @@ MESES = {
     "SETEMBRO": "09", "OUTUBRO": "10", "NOVEMBRO": "11", "DEZEMBRO": "12"
 }
 
-def _br_money_to_float(s: str) -> float:
-    s = str(s).strip()
-    s = s.replace(".", "").replace(",", ".")
-    return float(s)
-
 def _extract_data_referente(text: str):
     m = DATE_REF.search(text or "")
     return m.group(0) if m else None
@@ -44,89 +43,171 @@ def _data_referente_to_dt(dr: str):
                 return pd.to_datetime(f"01/{num_mes}/{ano.group(0)}", dayfirst=True, errors="coerce")
     return pd.NaT
 
-def parse_obras_from_pdf_path(pdf_path: str):
-    reader = PdfReader(pdf_path)
+def parse_obras_from_pdf_path(pdf_path: str, cache=None):
     full_text = ""
-    for p in reader.pages:
-        full_text += (p.extract_text() or "") + "\n"
+    for texto in extrair(pdf_path, "pypdf-texto", "obras", cache):
+        verificar()
+        full_text += texto + "\n"
 
     data_referente = _extract_data_referente(full_text)
-    lines = full_text.splitlines()
 
-    rows = []
-    collecting = False
+    # código / nome (até o primeiro valor BR) / rateio (último valor BR), linha a linha em lote
+    tokens = linhas_obras(full_text.splitlines())
+    df = pd.DataFrame({
+        "Nome Arquivo": os.path.basename(pdf_path),
+        "Código ECAD": tokens["codigo"],
+        "Nome Obra": tokens["nome"],
+        "Rateio": tokens["rateio"],
+        "Data": data_referente,
+    })
+    if df.empty:
+        return df
 
-    for line in lines:
-        if not line:
-            continue
+    df["Código ECAD"] = pd.to_numeric(df["Código ECAD"], errors="coerce")
+    df["Rateio"] = br_para_centavos(df["Rateio"])  # centavos (int64)
+    # a data de referência é uma só por PDF: converte uma vez, não linha a linha
+    df["Data"] = _data_referente_to_dt(data_referente)
 
-        if "OBRA" in line:
-            collecting = True
+    # cinto de segurança: evita valores absurdos por falha de parsing (R$ 1 milhão)
+    df = df[df["Rateio"].between(0, 100_000_000)]
 
-        if not collecting:
-            continue
+    return df
 
-        if not re.match(r"^\d{2,}\s", line.strip()):
-            continue
+def agregar_obras(df: pd.DataFrame):
+    """
+    Reduz as linhas de obras a:
+      - fatos: um total por (Data, Código ECAD) -> Rateio (centavos) e Linhas
+      - dimensao: Código ECAD -> Nome Obra (o nome mais recente) e Data desse nome
+    Retorna (fatos, dimensao).
+    """
+    if df is None or df.empty:
+        return (pd.DataFrame(columns=["Data", "Código ECAD", "Rateio", "Linhas"]),
+                pd.DataFrame(columns=["Código ECAD", "Nome Obra", "Data"]))
 
-        parts = line.split()
-        codigo = parts[0]
+    df = df.dropna(subset=["Código ECAD"])
+    df = df.assign(**{"Código ECAD": df["Código ECAD"].astype("int64")})
 
-        money_tokens = [p for p in parts if MONEY_BR.match(p)]
-        if not money_tokens:
-            continue
+    fatos = (
+        df.groupby(["Data", "Código ECAD"], as_index=False, dropna=False)
+          .agg(Rateio=("Rateio", "sum"), Linhas=("Rateio", "size"))
+    )
+    dimensao = nome_mais_recente(df[["Código ECAD", "Nome Obra", "Data"]])
+    return fatos, dimensao
 
-        rateio_raw = money_tokens[-1]
-        try:
-            rateio = _br_money_to_float(rateio_raw)
-        except Exception:
-            continue
 
-        first_money_idx = next(i for i, p in enumerate(parts) if MONEY_BR.match(p))
-        nome = " ".join(parts[1:first_money_idx]).strip()
-        if not nome:
-            continue
+def nome_mais_recente(dim: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por Código ECAD com o Nome Obra da Data mais recente (a dimensão de obras)."""
+    return (
+        dim.sort_values("Data", kind="stable", na_position="first")
+           .drop_duplicates("Código ECAD", keep="last")
+           .sort_values("Código ECAD", ignore_index=True)
+    )
 
-        rows.append([os.path.basename(pdf_path), codigo, nome, rateio, data_referente])
 
-    df = pd.DataFrame(rows, columns=["Nome Arquivo", "Código ECAD", "Nome Obra", "Rateio", "Data"])
-    if df.empty:
-        return df
+def juntar_obras(fatos: pd.DataFrame, dimensao: pd.DataFrame) -> pd.DataFrame:
+    """Fatos mensais + nome da obra: mesmas colunas que o dashboard usa das linhas brutas."""
+    nomes = dimensao[["Código ECAD", "Nome Obra"]]
+    out = fatos.merge(nomes, on="Código ECAD", how="left")
+    return out[["Código ECAD", "Nome Obra", "Rateio", "Linhas", "Data"]]
 
-    df["Código ECAD"] = pd.to_numeric(df["Código ECAD"], errors="coerce")
-    df["Rateio"] = pd.to_numeric(df["Rateio"], errors="coerce").fillna(0.0)
-    df["Data"] = df["Data"].apply(_data_referente_to_dt)
 
-    # cinto de segurança: evita valores absurdos por falha de parsing
-    df = df[df["Rateio"].between(0, 1_000_000)]
+def _ler_pdfs(pdf_dir: str, cache=None, arquivos=None):
+    """Gera o DataFrame de obras de cada PDF mensal que tem a listagem (só `arquivos`, se dado)."""
+    indice = carregar_indice(pdf_dir)
+    for fname in sorted(os.listdir(pdf_dir)):
+        if fname.lower().endswith(".pdf"):
+            if arquivos is not None and fname not in arquivos:
+                continue
+            if not aplica(indice, fname, "obras"):
+                logger.info("⏭️ %s sem listagem de obras; pulando.", fname)
+                continue
+            df = parse_obras_from_pdf_path(os.path.join(pdf_dir, fname), cache)
+            if df is not None and not df.empty:
+                yield df
 
-    return df
 
-def run(base_dir: str):
+def run(base_dir: str, formatos=(), escritor=None, cache=None, arquivos=None):
     """
     Lê PDFs já separados em:
       {base_dir}/s_pdf_organizados
-    Retorna (df, caminho_compilado)
+    formatos: formatos de exportação do compilado; vazio = não grava nada.
+    escritor: EscritorAssincrono opcional; os arquivos só estão no disco após escritor.flush().
+    cache: CachePaginas opcional; páginas já extraídas não passam pelo pypdf.
+    arquivos: nomes dos PDFs mensais a ler; None = todos.
+    Retorna (df, gerados)
     """
     start = time.time()
 
     pdf_dir = os.path.join(base_dir, "s_pdf_organizados")
     comp_dir = os.path.join(base_dir, "s_tabelas", "compiladas")
-    os.makedirs(comp_dir, exist_ok=True)
-
-    dfs = []
-    for fname in os.listdir(pdf_dir):
-        if fname.lower().endswith(".pdf"):
-            path = os.path.join(pdf_dir, fname)
-            dfs.append(parse_obras_from_pdf_path(path))
 
+    dfs = list(_ler_pdfs(pdf_dir, cache, arquivos))
     if not dfs:
-        logger.warning("Nenhum PDF encontrado em s_pdf_organizados para obras.")
-        return pd.DataFrame(), os.path.join(comp_dir, "tabela_compilada_Obras.xlsx")
+        logger.warning("Nenhuma obra extraída dos PDFs em s_pdf_organizados.")
+        return pd.DataFrame(), []
+
+    df = pd.concat(dfs, ignore_index=True)
 
-    df = pd.concat([d for d in dfs if d is not None and not d.empty], ignore_index=True)
-    out_path = os.path.join(comp_dir, "tabela_compilada_Obras.xlsx")
-    df.to_excel(out_path, index=False)
+    gerados = []
+    if formatos:
+        os.makedirs(comp_dir, exist_ok=True)
+        exportar = escritor.exportar if escritor else exportar_tabela
+        gerados = exportar(df, os.path.join(comp_dir, "tabela_compilada_Obras"), formatos)
 
     logger.info("Obras finalizado em %.2f s", time.time() - start)
-    return df, out_path
+    return df, gerados
+
+
+def run_agregado(base_dir: str, formatos=(), escritor=None, manter_linhas: bool = False, cache=None,
+                 arquivos=None):
+    """
+    Como run(), mas agrega cada PDF mensal assim que ele é lido: a memória
+    cresce com o catálogo (obras x meses), não com o número de linhas.
+    As linhas brutas só são guardadas com manter_linhas=True.
+    cache, arquivos: como em run().
+    Exporta (se formatos) tabela_obras_mensal, tabela_obras_dimensao e,
+    com manter_linhas, tabela_compilada_Obras.
+    Retorna (fatos, dimensao, linhas, gerados); linhas vazio sem manter_linhas.
+    """
+    start = time.time()
+
+    pdf_dir = os.path.join(base_dir, "s_pdf_organizados")
+    comp_dir = os.path.join(base_dir, "s_tabelas", "compiladas")
+
+    fatos, dims, linhas = [], [], []
+    for df in _ler_pdfs(pdf_dir, cache, arquivos):
+        f, d = agregar_obras(df)
+        fatos.append(f)
+        dims.append(d)
+        if manter_linhas:
+            linhas.append(df)
+
+    if not fatos:
+        logger.warning("Nenhuma obra extraída dos PDFs em s_pdf_organizados.")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), []
+
+    # um mesmo mês pode vir de mais de um PDF: reagrega
+    df_fatos = (
+        pd.concat(fatos, ignore_index=True)
+          .groupby(["Data", "Código ECAD"], as_index=False, dropna=False)[["Rateio", "Linhas"]].sum()
+    )
+    df_dim = nome_mais_recente(pd.concat(dims, ignore_index=True))
+    df_linhas = pd.concat(linhas, ignore_index=True) if linhas else pd.DataFrame()
+
+    gerados = []
+    if formatos:
+        os.makedirs(comp_dir, exist_ok=True)
+        exportar = escritor.exportar if escritor else exportar_tabela
+        gerados += exportar(df_fatos, os.path.join(comp_dir, "tabela_obras_mensal"), formatos)
+        gerados += exportar(df_dim, os.path.join(comp_dir, "tabela_obras_dimensao"), formatos)
+        if manter_linhas:
+            gerados += exportar(df_linhas, os.path.join(comp_dir, "tabela_compilada_Obras"), formatos)
+
+    logger.info("Obras (agregado: %d linhas -> %d fatos) finalizado em %.2f s",
+                int(df_fatos["Linhas"].sum()), len(df_fatos), time.time() - start)
+    return df_fatos, df_dim, df_linhas, gerados
+
+
+if __name__ == "__main__":
+    configurar_logging()
+    run(os.getcwd(), formatos=("xlsx",))
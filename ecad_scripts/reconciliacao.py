@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# Diferença relativa (|1 - fator|) acima da qual o mês é ajustado
+TOLERANCIA_PADRAO = 0.01
+
+# fonte -> coluna de valor
+FONTES = {
+    "categorias": "TOTAL GERAL",
+    "rubricas": "TOTAL GERAL",
+    "obras": "Rateio",
+}
+
+
+def totais_por_mes(df_cat: pd.DataFrame, df_rub: pd.DataFrame, df_obr: pd.DataFrame,
+                   mes_col: str = "PERIODO_MES") -> pd.DataFrame:
+    """
+    Soma categorias, rubricas e obras por mês de referência num único groupby.
+    Retorna colunas: mes_col, total_cat, total_rub, total_obr (centavos, int64).
+    """
+    partes = []
+    for fonte, df in (("categorias", df_cat), ("rubricas", df_rub), ("obras", df_obr)):
+        col = FONTES[fonte]
+        if df is None or df.empty or col not in df.columns or mes_col not in df.columns:
+            continue
+        partes.append(pd.DataFrame({
+            mes_col: df[mes_col].to_numpy(),
+            "fonte": fonte,
+            "valor": pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64").to_numpy(),
+        }))
+
+    colunas = {"categorias": "total_cat", "rubricas": "total_rub", "obras": "total_obr"}
+    if not partes:
+        return pd.DataFrame(columns=[mes_col, *colunas.values()])
+
+    longo = pd.concat(partes, ignore_index=True)
+    totais = (
+        longo.groupby([mes_col, "fonte"])["valor"].sum()
+             .unstack("fonte", fill_value=0)
+             .reindex(columns=list(colunas), fill_value=0)
+             .rename(columns=colunas)
+             .reset_index()
+    )
+    totais.columns.name = None
+    return totais.sort_values(mes_col, ignore_index=True)
+
+
+def fatores_por_mes(totais: pd.DataFrame, tolerancia: float = TOLERANCIA_PADRAO) -> pd.DataFrame:
+    """
+    Acrescenta a totais (saída de totais_por_mes):
+      - fator: total_rub / total_obr (NaN quando um dos dois é zero)
+      - divergente: |1 - fator| > tolerancia
+      - fator_aplicado: fator nos meses divergentes, 1.0 nos demais
+    """
+    out = totais.copy()
+    validos = (out["total_rub"] > 0) & (out["total_obr"] > 0)
+    out["fator"] = (out["total_rub"] / out["total_obr"]).where(validos)
+    out["divergente"] = (1 - out["fator"]).abs() > tolerancia
+    out["fator_aplicado"] = out["fator"].where(out["divergente"], 1.0)
+    return out
+
+
+def aplicar_fatores(df_obr: pd.DataFrame, fatores: pd.DataFrame, valor_col: str = "Rateio",
+                    mes_col: str = "PERIODO_MES") -> pd.DataFrame:
+    """
+    Reescala valor_col (centavos) de cada obra pelo fator_aplicado do seu mês
+    (um merge). O arredondamento para centavos inteiros distribui as sobras
+    pelos maiores restos, então cada mês ajustado soma exatamente o total
+    reescalado (sem deriva de arredondamento nos KPIs).
+    """
+    if df_obr is None or df_obr.empty or mes_col not in df_obr.columns or fatores.empty:
+        return df_obr
+    df = df_obr.merge(fatores[[mes_col, "fator_aplicado"]], on=mes_col, how="left")
+    valores = pd.to_numeric(df[valor_col], errors="coerce").fillna(0).to_numpy(dtype="float64")
+    escalado = valores * df["fator_aplicado"].fillna(1.0).to_numpy()
+
+    base = np.floor(escalado)
+    resto = pd.Series(escalado - base, index=df.index)
+    meses = df[mes_col]
+    alvo = pd.Series(escalado, index=df.index).groupby(meses).transform("sum").round()
+    faltam = alvo - pd.Series(base, index=df.index).groupby(meses).transform("sum")
+    ordem = resto.groupby(meses).rank(method="first", ascending=False)
+
+    df[valor_col] = (base + (ordem <= faltam).to_numpy()).astype("int64")
+    return df.drop(columns="fator_aplicado")
@@ -0,0 +1,139 @@
+"""
+Extração das tabelas POR CATEGORIA / POR RUBRICA pelas caixas das palavras
+(pdfplumber extract_words), em vez do texto corrido da página.
+
+Só as linhas entre a âncora de início e a de fim da seção são analisadas, e
+cada valor vai para a coluna em que está posicionado: as colunas são as
+bordas direitas dos valores (alinhados à direita no demonstrativo), então um
+valor faltante fica "---" na própria coluna, sem completar pela esquerda.
+"""
+import re
+from typing import NamedTuple
+
+import pandas as pd
+
+from ecad_scripts.tokenizador import N_VALORES, INICIO_EXCLUSAO, FIM_EXCLUSAO, MONEY
+
+MODOS = ("texto", "regiao")
+
+# palavras com topo a menos disso (pt) estão na mesma linha
+TOLERANCIA_LINHA = 3
+# bordas direitas a menos disso (pt) são a mesma coluna
+TOLERANCIA_COLUNA = 4
+
+_VALOR = re.compile(rf"^(?:{MONEY}|---)$")
+
+
+class Linha(NamedTuple):
+    texto: str
+    palavras: list
+
+
+def palavras_da_pagina(page) -> list:
+    """Palavras de uma página pdfplumber, só com texto e caixa (serializável, vai para o cache)."""
+    return [
+        {"text": w["text"], "x0": w["x0"], "x1": w["x1"], "top": w["top"], "bottom": w["bottom"]}
+        for w in page.extract_words()
+    ]
+
+
+def agrupar_linhas(palavras) -> list:
+    """Palavras (palavras_da_pagina) agrupadas em linhas, de cima para baixo e da esquerda para a direita."""
+    palavras = sorted(palavras, key=lambda w: (w["top"], w["x0"]))
+    linhas, atual, topo = [], [], None
+    for palavra in palavras:
+        if topo is not None and palavra["top"] - topo > TOLERANCIA_LINHA:
+            linhas.append(atual)
+            atual = []
+        if not atual:
+            topo = palavra["top"]
+        atual.append(palavra)
+    if atual:
+        linhas.append(atual)
+
+    resultado = []
+    for palavras_linha in linhas:
+        palavras_linha.sort(key=lambda w: w["x0"])
+        resultado.append(Linha(" ".join(w["text"] for w in palavras_linha), palavras_linha))
+    return resultado
+
+
+def texto_da_pagina(linhas) -> str:
+    return "\n".join(linha.texto for linha in linhas)
+
+
+def _recortar(paginas, inicio: str, fim: str):
+    """Linhas depois da que contém `inicio` e antes da que contém `fim` (atravessa páginas)."""
+    dentro = False
+    for linhas in paginas:
+        for linha in linhas:
+            if not dentro:
+                dentro = inicio in linha.texto
+                continue
+            if fim in linha.texto:
+                return
+            yield linha
+
+
+def _eh_valor(palavra) -> bool:
+    return _VALOR.match(palavra["text"]) is not None
+
+
+def faixas_de_colunas(linhas):
+    """
+    Borda direita de cada coluna de valor, agrupando as bordas dos valores.
+    None se não der exatamente N_VALORES colunas (layout inesperado).
+    """
+    bordas = sorted(w["x1"] for linha in linhas for w in linha.palavras if _eh_valor(w))
+    if not bordas:
+        return None
+    grupos = [[bordas[0]]]
+    for borda in bordas[1:]:
+        if borda - grupos[-1][-1] > TOLERANCIA_COLUNA:
+            grupos.append([])
+        grupos[-1].append(borda)
+    if len(grupos) != N_VALORES:
+        return None
+    return [sorted(g)[len(g) // 2] for g in grupos]
+
+
+def _coluna(palavra, faixas):
+    distancias = [abs(palavra["x1"] - faixa) for faixa in faixas]
+    melhor = min(range(len(faixas)), key=distancias.__getitem__)
+    return melhor if distancias[melhor] <= TOLERANCIA_COLUNA else None
+
+
+def tabela(paginas, inicio: str, fim: str, prefixos_ignorados) -> pd.DataFrame:
+    """
+    Tabela entre as âncoras `inicio` e `fim` a partir das linhas de cada página
+    (agrupar_linhas). Mesmas regras de linhas_tabela: ignora linhas vazias,
+    as que começam com prefixos_ignorados e o bloco de execuções.
+    Retorna DataFrame com "nome" e v0..v5, ou None se as colunas não forem
+    reconhecidas (quem chama volta para o modo texto).
+    """
+    linhas, excluindo = [], False
+    for linha in _recortar(paginas, inicio, fim):
+        if linha.texto.startswith(INICIO_EXCLUSAO):
+            excluindo = True
+        if linha.texto.startswith(FIM_EXCLUSAO):
+            excluindo = False
+            continue
+        if excluindo or not linha.texto.strip() or linha.texto.startswith(tuple(prefixos_ignorados)):
+            continue
+        linhas.append(linha)
+
+    faixas = faixas_de_colunas(linhas)
+    if faixas is None:
+        return None
+
+    registros = []
+    for linha in linhas:
+        nome, valores = [], ["---"] * N_VALORES
+        for palavra in linha.palavras:
+            coluna = _coluna(palavra, faixas) if _eh_valor(palavra) else None
+            if coluna is None:
+                nome.append(palavra["text"])
+            else:
+                valores[coluna] = palavra["text"]
+        registros.append([" ".join(nome), *valores])
+    return pd.DataFrame(registros, columns=["nome", *(f"v{i}" for i in range(N_VALORES))]).astype(object)
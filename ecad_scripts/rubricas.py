@@ -1,22 +1,26 @@
 import os
+import sys
 import time
 import re
-import warnings
 import logging
+from contextlib import closing
 
-import pdfplumber
 import pandas as pd
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-warnings.filterwarnings("ignore", category=UserWarning, module='pdfminer')
-logging.getLogger("pdfminer").setLevel(logging.ERROR)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts.export import exportar_tabela
+from ecad_scripts.layout import carregar_indice, aplica
+from ecad_scripts.limites import verificar
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.tokenizador import linhas_tabela
+from ecad_scripts import regioes
+from ecad_scripts.cache_paginas import extrair
+from ecad_scripts.valores import br_para_centavos
 
 date_pattern = re.compile(r'\b[A-ZÇ]{3,9}/\d{4}\b')
-numeric_pattern = re.compile(r'^\d{1,3}(?:\.\d{3})*,\d{2}$')
 
 
 def extract_data_referente(text):
@@ -29,17 +33,33 @@ def extract_period(text):
     return match.group() if match else None
 
 
-def process_pdf(pdf_path: str, pasta_excel: str):
+def process_pdf(pdf_path: str, pasta_excel: str, formatos=(), escritor=None, modo: str = "texto", cache=None):
+    """
+    Extrai a tabela POR RUBRICA de um PDF mensal e retorna o DataFrame bruto.
+    Só grava a tabela em pasta_excel quando formatos for informado
+    (em segundo plano, se houver escritor).
+    modo "regiao": lê as palavras posicionadas entre POR RUBRICA e TOTAL DO TITULAR
+    e atribui cada valor à sua coluna (ver ecad_scripts.regioes); se as
+    colunas não forem reconhecidas, cai no modo "texto".
+    """
     filename = os.path.basename(pdf_path)
     logging.info(f"🔍 Processando rubricas: {filename}")
 
     start_page = end_page = None
     data_referente = None
     page_texts = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
+    page_lines = []
+
+    extrator = "pdfplumber-palavras" if modo == "regiao" else "pdfplumber-texto"
+    with closing(extrair(pdf_path, extrator, "rubricas", cache)) as paginas:
+        for page_number, pagina in enumerate(paginas, start=1):
+            verificar()
+            if modo == "regiao":
+                linhas = regioes.agrupar_linhas(pagina)
+                page_lines.append(linhas)
+                text = regioes.texto_da_pagina(linhas)
+            else:
+                text = pagina
             page_texts.append(text)
 
             if (curr := extract_data_referente(text)):
@@ -53,8 +73,32 @@ def process_pdf(pdf_path: str, pasta_excel: str):
 
     if start_page is None or end_page is None:
         logging.error(f"❌ Tabela POR RUBRICA não encontrada em: {filename}")
-        return
+        return None
+
+    df = None
+    if modo == "regiao":
+        df = regioes.tabela(page_lines[start_page - 1:end_page], "POR RUBRICA", "TOTAL DO TITULAR",
+                            ("POR RUBRICA", "TOTAL"))
+        if df is None:
+            logging.warning(f"⚠️ Colunas de POR RUBRICA não reconhecidas em {filename}; usando o texto.")
 
+    header = [
+        "RUBRICA", "DISTRIBUIÇÃO", "LIBERAÇÃO CRÉD. RETIDO",
+        "LIBERAÇÃO DE PENDENTE", "LIBERAÇÃO DE PARÂMETRO",
+        "AJUSTES", "TOTAL GERAL", "DATA REFERENTE"
+    ]
+    if df is None:
+        df = linhas_tabela(_trecho(page_texts, start_page, end_page), ("POR RUBRICA", "TOTAL"))
+    df.columns = header[:-1]
+    df["DATA REFERENTE"] = data_referente
+    if formatos:
+        caminho_base = os.path.join(pasta_excel, f"tabela_extraida_{os.path.splitext(filename)[0]}")
+        (escritor.exportar if escritor else exportar_tabela)(df, caminho_base, formatos)
+    return df
+
+
+def _trecho(page_texts, start_page: int, end_page: int) -> list:
+    """Linhas de texto de POR RUBRICA até TOTAL DO TITULAR."""
     segments = []
     for page_number in range(start_page, end_page + 1):
         txt = page_texts[page_number - 1]
@@ -65,47 +109,7 @@ def process_pdf(pdf_path: str, pasta_excel: str):
             idx = txt.find("TOTAL DO TITULAR")
             txt = txt[: idx + len("TOTAL DO TITULAR")] if idx != -1 else txt
         segments.append(txt)
-
-    combined = "\n".join(segments).splitlines()
-
-    header = [
-        "RUBRICA", "DISTRIBUIÇÃO", "LIBERAÇÃO CRÉD. RETIDO",
-        "LIBERAÇÃO DE PENDENTE", "LIBERAÇÃO DE PARÂMETRO",
-        "AJUSTES", "TOTAL GERAL", "DATA REFERENTE"
-    ]
-    data = []
-    exclude = False
-
-    for line in combined:
-        if line.startswith("EXEC. - NÚM. DE EXECUÇÕES"):
-            exclude = True
-        if line.startswith("OBRA RUBRICA PERÍODO RENDIMENTO % RATEIO CORREÇÃO EXEC (OC)"):
-            exclude = False
-            continue
-        if exclude or not line.strip() or line.startswith(("POR RUBRICA", "TOTAL")):
-            continue
-
-        parts = line.split()
-        rubrica_parts, valores = [], []
-
-        for part in parts:
-            if numeric_pattern.match(part) or part == "---":
-                valores.append(part)
-            else:
-                rubrica_parts.append(part)
-
-        rubrica_name = " ".join(rubrica_parts)
-
-        while len(valores) < len(header) - 2:
-            valores.insert(0, "---")
-        valores.append(data_referente)
-        data.append([rubrica_name] + valores)
-
-    df = pd.DataFrame(data, columns=header)
-    nome_arquivo = f"tabela_extraida_{os.path.splitext(filename)[0]}.xlsx"
-    caminho_excel = os.path.join(pasta_excel, nome_arquivo)
-    df.to_excel(caminho_excel, index=False)
-    logging.info(f"✅ Exportado para: {caminho_excel}")
+    return "\n".join(segments).splitlines()
 
 
 def formatar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -118,24 +122,10 @@ def formatar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         "TOTAL GERAL"
     ]
 
-    def limpar_valor(val):
-        if pd.isna(val) or str(val).strip() == '---':
-            return 0.0
-        val = str(val).strip()
-        if '.' in val and ',' not in val:
-            try:
-                return float(val)
-            except ValueError:
-                return 0.0
-        val = val.replace('.', '').replace(',', '.')
-        try:
-            return float(val)
-        except ValueError:
-            return 0.0
-
+    # valores em centavos (int64), sem passar por float
     for col in colunas_numericas:
         if col in df.columns:
-            df[col] = df[col].apply(limpar_valor)
+            df[col] = br_para_centavos(df[col])
 
     if "DATA REFERENTE" in df.columns:
         def converter_data(texto):
@@ -162,26 +152,46 @@ def formatar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def run(base_dir: str, base_rubricas_path: str):
+def run(base_dir: str, base_rubricas_path: str, formatos=(), escritor=None, modo: str = "texto", cache=None,
+        arquivos=None):
+    """
+    Extrai rubricas de {base_dir}/s_pdf_organizados e compila em memória.
+    formatos: formatos de exportação (ex.: ("parquet", "csv", "xlsx")); vazio = não grava nada.
+    escritor: EscritorAssincrono opcional; os arquivos só estão no disco após escritor.flush().
+    modo: "texto" (texto corrido da página) ou "regiao" (palavras posicionadas).
+    cache: CachePaginas opcional; páginas já extraídas não passam pelo pdfplumber.
+    arquivos: nomes dos PDFs mensais a ler (ex.: só os meses recentes); None = todos.
+    Retorna (df, gerados)
+    """
+    if modo not in regioes.MODOS:
+        raise ValueError(f"Modo de extração desconhecido: {modo}")
     inicio = time.time()
 
     pasta_pdfs = os.path.join(base_dir, "s_pdf_organizados")
     pasta_excel = os.path.join(base_dir, "s_tabelas", "rubricas")
-    arquivo_compilado = os.path.join(base_dir, "s_tabelas", "compiladas", "tabela_compilada_rubricas.xlsx")
+    base_compilado = os.path.join(base_dir, "s_tabelas", "compiladas", "tabela_compilada_rubricas")
 
-    os.makedirs(pasta_excel, exist_ok=True)
-    os.makedirs(os.path.dirname(arquivo_compilado), exist_ok=True)
+    if formatos:
+        os.makedirs(pasta_excel, exist_ok=True)
+        os.makedirs(os.path.dirname(base_compilado), exist_ok=True)
 
-    for arquivo in os.listdir(pasta_pdfs):
+    indice = carregar_indice(pasta_pdfs)
+    dfs = []
+    for arquivo in sorted(os.listdir(pasta_pdfs)):
         if arquivo.lower().endswith(".pdf"):
-            process_pdf(os.path.join(pasta_pdfs, arquivo), pasta_excel)
-
-    excels = [f for f in os.listdir(pasta_excel) if f.lower().endswith(".xlsx")]
-    if not excels:
-        logging.warning("⚠️ Nenhum excel extraído de rubricas.")
-        return pd.DataFrame(), arquivo_compilado
+            if arquivos is not None and arquivo not in arquivos:
+                continue
+            if not aplica(indice, arquivo, "rubricas"):
+                logging.info(f"⏭️ {arquivo} sem POR RUBRICA; pulando.")
+                continue
+            df = process_pdf(os.path.join(pasta_pdfs, arquivo), pasta_excel, formatos, escritor, modo, cache)
+            if df is not None and not df.empty:
+                dfs.append(df)
+
+    if not dfs:
+        logging.warning("⚠️ Nenhuma tabela extraída de rubricas.")
+        return pd.DataFrame(), []
 
-    dfs = [pd.read_excel(os.path.join(pasta_excel, f)) for f in excels]
     df_compilado = pd.concat(dfs, ignore_index=True)
     df_compilado = df_compilado[df_compilado['TOTAL GERAL'] != '---']
 
@@ -196,14 +206,16 @@ def run(base_dir: str, base_rubricas_path: str):
 
     df_compilado = formatar_dataframe(df_compilado)
 
-    df_compilado.to_excel(arquivo_compilado, index=False)
-    logging.info(f"📁 Compilado rubricas salvo em: {arquivo_compilado}")
+    exportar = escritor.exportar if escritor else exportar_tabela
+    gerados = exportar(df_compilado, base_compilado, formatos) if formatos else []
 
     duracao = time.time() - inicio
     logging.info(f"⏱️ Rubricas finalizado em: {duracao:.2f} s")
-    return df_compilado, arquivo_compilado
+    return df_compilado, gerados
 
 
 if __name__ == "__main__":
+    configurar_logging()
     # Para teste local
-    run(os.getcwd(), base_rubricas_path=os.path.join("bases", "Base_Rubrica_Original.xlsx"))
+    run(os.getcwd(), base_rubricas_path=os.path.join(ROOT_DIR, "bases", "Base_Rubrica_Original.xlsx"),
+        formatos=("xlsx",))
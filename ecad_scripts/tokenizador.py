@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Token de dinheiro BR (1.234,56 / 12,34)
+MONEY = r"\d{1,3}(?:\.\d{3})*,\d{2}"
+
+# Quantidade de colunas de valor das tabelas POR CATEGORIA / POR RUBRICA
+N_VALORES = 6
+
+# As expressões rodam no motor RE2 do pyarrow (sem lookarounds): os limites de
+# token vêm de exigir espaço/início antes de cada valor e espaço/fim depois.
+
+# nome (mais curto possível) + bloco final de até N_VALORES valores (dinheiro ou "---")
+LINHA_TABELA = (
+    rf"^\s*(?P<nome>.*?)(?P<valores>(?:(?:^|\s+)(?:{MONEY}|---)){{0,{N_VALORES}}})\s*$"
+)
+# os N_VALORES últimos tokens; com "--- " * N_VALORES na frente, os faltantes viram "---"
+ULTIMOS_VALORES = r"(?:^|\s)" + r"\s+".join(rf"(?P<v{i}>\S+)" for i in range(N_VALORES)) + r"\s*$"
+
+# código ECAD, nome da obra (até o primeiro valor) e rateio (último valor da linha)
+LINHA_OBRA = (
+    rf"^\s*(?P<codigo>\d{{2,}})\s+(?P<nome>.*?)\s+"
+    rf"(?:{MONEY}\s(?:.*\s)?)?(?P<rateio>{MONEY})(?:\s|$)"
+)
+
+INICIO_EXCLUSAO = "EXEC. - NÚM. DE EXECUÇÕES"
+FIM_EXCLUSAO = "OBRA RUBRICA PERÍODO RENDIMENTO % RATEIO CORREÇÃO EXEC (OC)"
+
+
+def _serie(linhas) -> pd.Series:
+    """Linhas como strings do Arrow: os métodos .str rodam em lote, sem laço Python."""
+    import pyarrow as pa
+
+    return pd.Series(list(linhas), dtype=pd.ArrowDtype(pa.string()))
+
+
+def _mascara(serie_bool: pd.Series) -> np.ndarray:
+    return serie_bool.fillna(False).to_numpy(dtype=bool)
+
+
+def _normalizar_espacos(serie: pd.Series) -> pd.Series:
+    """Mesmo resultado de " ".join(texto.split())."""
+    return serie.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def linhas_tabela(linhas, prefixos_ignorados) -> pd.DataFrame:
+    """
+    Tokeniza de uma vez as linhas de uma seção POR CATEGORIA / POR RUBRICA.
+    Ignora linhas vazias, as que começam com prefixos_ignorados e o bloco entre
+    "EXEC. - NÚM. DE EXECUÇÕES" e o cabeçalho das obras.
+    Retorna DataFrame com "nome" e v0..v5 (valores faltantes = "---").
+    """
+    colunas = ["nome", *(f"v{i}" for i in range(N_VALORES))]
+    serie = _serie(linhas)
+    if serie.empty:
+        return pd.DataFrame(columns=colunas)
+
+    # liga/desliga a exclusão: 1 no início do bloco, 0 no cabeçalho das obras
+    inicio = _mascara(serie.str.startswith(INICIO_EXCLUSAO))
+    fim = _mascara(serie.str.startswith(FIM_EXCLUSAO))
+    marcas = pd.Series(np.where(inicio, 1.0, np.nan))
+    marcas[fim] = 0.0
+    excluida = marcas.ffill().fillna(0).to_numpy(dtype=bool)
+
+    ignorada = np.zeros(len(serie), dtype=bool)
+    for prefixo in prefixos_ignorados:
+        ignorada |= _mascara(serie.str.startswith(prefixo))
+    vazia = _mascara(serie.str.strip() == "")
+
+    linhas_ok = serie[~(excluida | fim | ignorada | vazia)].reset_index(drop=True)
+    if linhas_ok.empty:
+        return pd.DataFrame(columns=colunas)
+
+    tokens = linhas_ok.str.extract(LINHA_TABELA)
+    valores = (("--- " * N_VALORES) + tokens["valores"].str.strip()).str.extract(ULTIMOS_VALORES)
+
+    valores.insert(0, "nome", _normalizar_espacos(tokens["nome"]))
+    return valores.astype(object)
+
+
+def linhas_obras(linhas) -> pd.DataFrame:
+    """
+    Tokeniza de uma vez as linhas de obras (a partir da primeira menção a OBRA).
+    Retorna DataFrame com "codigo", "nome" e "rateio" (token BR do último valor).
+    """
+    colunas = ["codigo", "nome", "rateio"]
+    serie = _serie(linhas)
+    if serie.empty:
+        return pd.DataFrame(columns=colunas)
+
+    coletando = np.maximum.accumulate(_mascara(serie.str.contains("OBRA", regex=False)))
+    serie = serie[coletando].reset_index(drop=True)
+    if serie.empty:
+        return pd.DataFrame(columns=colunas)
+
+    tokens = serie.str.extract(LINHA_OBRA).dropna(subset=["codigo"])
+    tokens["nome"] = _normalizar_espacos(tokens["nome"])
+    # o nome vai até o primeiro valor: se ele já começa com um, a linha não tem nome
+    sem_nome = _mascara(tokens["nome"].str.contains(rf"^{MONEY}(?:\s|$)", regex=True))
+    tokens = tokens[~sem_nome & _mascara(tokens["nome"] != "")]
+    return tokens[colunas].reset_index(drop=True).astype(object)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# Valores monetários circulam como int64 em centavos; reais só na exibição.
+COLUNAS_VALOR = [
+    "DISTRIBUIÇÃO",
+    "LIBERAÇÃO CRÉD. RETIDO",
+    "LIBERAÇÃO DE PENDENTE",
+    "LIBERAÇÃO DE PARÂMETRO",
+    "AJUSTES",
+    "TOTAL GERAL",
+    "Rateio",
+]
+
+# "1.234,56" / "12,34" (com sinal opcional)
+_BR = r"^-?(?:\d{1,3}(?:\.\d{3})+|\d+),\d{2}$"
+# "1234.56" / "1234" (valor já numérico, ex.: lido de planilha)
+_PONTO = r"^-?\d+(?:\.\d+)?$"
+
+
+def br_para_centavos(valores) -> pd.Series:
+    """
+    Converte uma série de tokens BRL em int64 de centavos, sem passar por float:
+      "1.234,56" -> 123456, "---"/vazio/inválido -> 0.
+    Números (ou strings com ponto decimal, ex. "1234.56") são arredondados para centavos.
+    """
+    serie = pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.Series(np.rint(serie.fillna(0).to_numpy(dtype="float64") * 100).astype("int64"), index=serie.index)
+
+    texto = serie.astype("string").str.strip()
+    resultado = pd.Series(0, index=serie.index, dtype="int64")
+
+    br = texto.str.match(_BR).fillna(False).to_numpy(dtype=bool)
+    if br.any():
+        digitos = texto[br].str.replace(".", "", regex=False).str.replace(",", "", regex=False)
+        resultado[br] = digitos.astype("int64").to_numpy()
+
+    ponto = ~br & texto.str.match(_PONTO).fillna(False).to_numpy(dtype=bool)
+    if ponto.any():
+        resultado[ponto] = np.rint(texto[ponto].astype("float64").to_numpy() * 100).astype("int64")
+
+    return resultado
+
+
+def centavos_para_reais(valores):
+    """Só para exibição: int64 centavos -> float reais."""
+    return valores / 100
+
+
+def para_reais(df: pd.DataFrame, colunas=None) -> pd.DataFrame:
+    """Cópia de df com as colunas monetárias (centavos) convertidas para reais, para exibição."""
+    if df is None or df.empty:
+        return df
+    colunas = [c for c in (colunas or COLUNAS_VALOR) if c in df.columns]
+    if not colunas:
+        return df
+    out = df.copy()
+    for c in colunas:
+        out[c] = centavos_para_reais(pd.to_numeric(out[c], errors="coerce"))
+    return out
@@ -1,8 +1,11 @@
 import os
 import sys
 import shutil
+from contextlib import nullcontext
 from pathlib import Path
 
+import pandas as pd
+
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
@@ -10,41 +13,109 @@ if ROOT_DIR not in sys.path:
 from ecad_scripts.A_process_PDF import run as run_split
 from ecad_scripts.categorias import run as run_categorias
 from ecad_scripts.rubricas import run as run_rubricas
-from ecad_scripts.obras import run as run_obras
+from ecad_scripts.obras import run as run_obras, run_agregado as run_obras_agregado, juntar_obras
+from ecad_scripts.layout import carregar_indice, alguma, meses_em_ordem
+from ecad_scripts.escritor import EscritorAssincrono
+from ecad_scripts.cache_paginas import CachePaginas
+from ecad_scripts.limites import aplicar as aplicar_limites, verificar
+from ecad_scripts.metricas import cronometro
+
+
+def _contar_paginas(pasta: str, arquivos) -> int:
+    from pypdf import PdfReader
 
+    return sum(len(PdfReader(os.path.join(pasta, a)).pages) for a in arquivos)
 
-def process_uploaded_pdf(pdf_path: str, base_dir: str, base_rubricas_path: str):
+
+def process_uploaded_pdf(pdf_path: str, base_dir: str, base_rubricas_path: str, formatos=(),
+                         obras_agregadas: bool = False, limites=None, modo_tabelas: str = "texto",
+                         cache_paginas: str = None, meses: slice = None):
     """
     Recebe um PDF (caminho) e um base_dir isolado (workspace por upload).
     Gera:
       - PDFs separados por mês em s_pdf_organizados
-      - Excels compilados em s_tabelas/compiladas
+      - Tabelas compiladas em s_tabelas/compiladas, só nos formatos pedidos
+        (ex.: ("parquet", "csv", "xlsx")); por padrão nada é gravado.
+    As gravações rodam num EscritorAssincrono, em paralelo com a extração;
+    falhas de gravação levantam ErroEscrita.
+    Com obras_agregadas, obras vem com uma linha por (mês, Código ECAD) em vez
+    de uma por linha do demonstrativo (coluna extra "Linhas").
+    limites (ecad_scripts.limites.Limites): tempo, páginas, memória e
+    cancelamento do documento; estourar levanta LimiteExcedido.
+    modo_tabelas: "texto" ou "regiao" (palavras posicionadas por coluna)
+    para as tabelas de categorias e rubricas.
+    cache_paginas: caminho do CachePaginas (SQLite); páginas já extraídas em
+    qualquer PDF anterior não passam de novo pelo pypdf/pdfplumber.
+    meses: fatia dos PDFs mensais em ordem cronológica a extrair, ex.:
+    slice(-6, None) = os 6 meses mais recentes e slice(None, -6) = os demais.
+    Com meses, o split roda só uma vez por base_dir: a chamada seguinte no
+    mesmo base_dir reaproveita os PDFs mensais e o índice (e o limite de
+    páginas passa a contar só os PDFs mensais da fatia).
     Retorna 3 DataFrames (categorias, rubricas, obras).
     """
     base_dir = os.path.abspath(base_dir)
+    pasta_meses = os.path.join(base_dir, "s_pdf_organizados")
+    reaproveitar = meses is not None and bool(carregar_indice(pasta_meses))
 
     en_pdf = Path(base_dir) / "en_PDF"
     i_pdf = Path(base_dir) / "i_pdf"
     en_pdf.mkdir(parents=True, exist_ok=True)
     i_pdf.mkdir(parents=True, exist_ok=True)
 
-    # Coloca o PDF do upload em en_PDF
-    target = en_pdf / Path(pdf_path).name
-    if os.path.abspath(pdf_path) != str(target):
-        shutil.copy2(pdf_path, target)
+    if not reaproveitar:
+        # Coloca o PDF do upload em en_PDF
+        target = en_pdf / Path(pdf_path).name
+        if os.path.abspath(pdf_path) != str(target):
+            shutil.copy2(pdf_path, target)
+
+        # Para o split funcionar, precisa ter um PDF em i_pdf.
+        # Se só tiver um PDF, copiamos para i_pdf/compilado.pdf.
+        compiled = i_pdf / "compilado.pdf"
+        with open(target, "rb") as r, open(compiled, "wb") as w:
+            w.write(r.read())
+
+    cache_ctx = CachePaginas(cache_paginas) if cache_paginas else nullcontext()
+    with aplicar_limites(limites), EscritorAssincrono() as escritor, cache_ctx as cache:
+        # 1) split em meses (+ sonda de seções/layout de cada mês);
+        #    os parsers leem os PDFs mensais do disco: flush antes de seguir
+        if not reaproveitar:
+            with cronometro("split", backend="pypdf"):
+                pasta_meses = run_split(base_dir, escritor=escritor, cache=cache)
+                escritor.flush()
+        indice = carregar_indice(pasta_meses)
 
-    # Para o split funcionar, precisa ter um PDF em i_pdf.
-    # Se só tiver um PDF, copiamos para i_pdf/compilado.pdf.
-    compiled = i_pdf / "compilado.pdf"
-    with open(target, "rb") as r, open(compiled, "wb") as w:
-        w.write(r.read())
+        arquivos = None  # None = todos os meses
+        if meses is not None:
+            arquivos = meses_em_ordem(f for f in os.listdir(pasta_meses) if f.lower().endswith(".pdf"))[meses]
+            indice = {a: info for a, info in indice.items() if a in arquivos}
+            if reaproveitar:
+                # sem o split, o limite de páginas conta os PDFs mensais desta fatia
+                verificar(paginas=_contar_paginas(pasta_meses, arquivos))
 
-    # 1) split em meses
-    run_split(base_dir)
+        # 2) extrair tabelas: só os parsers cujas seções existem em algum mês
+        #    (uma fatia de meses vazia não extrai nada)
+        df_cat = df_rub = df_obr = pd.DataFrame()
+        vazia = arquivos == []
+        if not vazia and alguma(indice, "categorias"):
+            with cronometro("categorias", backend="pdfplumber"):
+                df_cat, _ = run_categorias(base_dir, formatos=formatos, escritor=escritor, modo=modo_tabelas,
+                                           cache=cache, arquivos=arquivos)
+        if not vazia and alguma(indice, "rubricas"):
+            with cronometro("rubricas", backend="pdfplumber"):
+                df_rub, _ = run_rubricas(base_dir, base_rubricas_path=base_rubricas_path, formatos=formatos,
+                                         escritor=escritor, modo=modo_tabelas, cache=cache, arquivos=arquivos)
+        if not vazia and alguma(indice, "obras"):
+            with cronometro("obras", backend="pypdf"):
+                if obras_agregadas:
+                    fatos, dimensao, _, _ = run_obras_agregado(base_dir, formatos=formatos, escritor=escritor,
+                                                              cache=cache, arquivos=arquivos)
+                    df_obr = juntar_obras(fatos, dimensao) if not fatos.empty else fatos
+                else:
+                    df_obr, _ = run_obras(base_dir, formatos=formatos, escritor=escritor, cache=cache,
+                                          arquivos=arquivos)
 
-    # 2) extrair tabelas
-    df_cat, _ = run_categorias(base_dir)
-    df_rub, _ = run_rubricas(base_dir, base_rubricas_path=base_rubricas_path)
-    df_obr, _ = run_obras(base_dir)
+        # 3) exportações pendentes gravadas antes de retornar
+        with cronometro("gravacao"):
+            escritor.flush()
 
     return df_cat, df_rub, df_obr
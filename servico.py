@@ -0,0 +1,420 @@
+"""
+Serviço HTTP local de extração, sem Streamlit: outros sistemas enviam o PDF
+do ECAD e recebem as linhas de categorias, rubricas e obras em NDJSON.
+
+Rotas:
+  POST /extrair   corpo = o PDF (application/pdf). Parâmetros opcionais na
+                  query: nome, modo_tabelas (texto|regiao), agregar=1 (obras
+                  por (mês, Código ECAD)). A resposta é NDJSON em chunked,
+                  um objeto por linha, mês a mês, na ordem em que terminam
+                  (colunas de valor em reais, ex. "TOTAL GERAL":8883.02):
+                    {"tipo":"inicio","id":...,"meses":[...],"unidade":"reais"}
+                    {"tipo":"linha","tabela":"obras","mes":"2023_01","linha":{...}}
+                    {"tipo":"mes","mes":"2023_01","linhas":{"categorias":3,...}}
+                    {"tipo":"erro","mes":"2023_02","erro":...,"detalhe":...}
+                    {"tipo":"fim","meses":12,"erros":1,"segundos":8.4}
+  GET  /saude     status, fila do pool e extrações em andamento
+  GET  /metrics   métricas no formato Prometheus
+
+O PDF é separado por mês na thread da requisição (pypdf, o estágio mais
+barato) e cada mês vira um job no PoolExtracao: os meses de um mesmo PDF
+rodam em paralelo e as requisições dividem os workers em round-robin. Os
+meses entram no pool conforme abrem vagas na fila (--max-fila), então um
+demonstrativo com mais meses que a fila é atendido, só que em ondas.
+Acima de --max-requisicoes extrações simultâneas, ou sem nenhuma vaga na
+fila do pool, a resposta é 503 com Retry-After. Se o cliente desconectar,
+os jobs ainda pendentes ou em execução são cancelados.
+
+Uso:
+  python servico.py --porta 8600 --workers 3 --max-requisicoes 4
+  curl --data-binary @demonstrativo.pdf -H "Content-Type: application/pdf" \
+       "http://127.0.0.1:8600/extrair?nome=demonstrativo.pdf"
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlsplit, parse_qs
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from worker_pool import PoolExtracao, FilaCheia
+from ecad_scripts import metricas, regioes
+from ecad_scripts.A_process_PDF import split_pdf_by_text
+from ecad_scripts.export import iter_ndjson
+from ecad_scripts.limites import Limites, LimiteExcedido, aplicar as aplicar_limites
+from ecad_scripts.logs import configurar_logging
+from ecad_scripts.valores import para_reais
+
+logger = logging.getLogger(__name__)
+
+TABELAS = ("categorias", "rubricas", "obras")
+BLOCO_LEITURA = 1 << 20
+# espera entre tentativas quando a fila do pool está toda com outras requisições
+ESPERA_FILA_S = 0.5
+
+
+class Config(NamedTuple):
+    """Configuração do serviço (limites de concorrência e por documento)."""
+    workspace: str
+    base_rubricas_path: str
+    max_requisicoes: int = 4
+    max_upload_mb: int = 200
+    # modelo dos limites de cada mês (o arquivo de cancelamento é por job)
+    limites: Limites = Limites()
+    # CachePaginas compartilhado pelos workers (None = desligado)
+    cache_paginas: str = None
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, pool: PoolExtracao, config: Config):
+        super().__init__(endereco, _Handler)
+        self.pool = pool
+        self.config = config
+        self.vagas = threading.BoundedSemaphore(config.max_requisicoes)
+        self.em_andamento = 0
+        self._lock = threading.Lock()
+        metricas.coletor(self._coletar_metricas)
+
+    def entrar(self) -> bool:
+        if not self.vagas.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.em_andamento += 1
+        return True
+
+    def sair(self):
+        with self._lock:
+            self.em_andamento -= 1
+        self.vagas.release()
+
+    def saude(self) -> dict:
+        with self._lock:
+            em_andamento = self.em_andamento
+        return {
+            "status": "ok",
+            "extracoes": {"em_andamento": em_andamento, "max": self.config.max_requisicoes},
+            "fila": self.pool.profundidade(),
+        }
+
+    def _coletar_metricas(self):
+        with self._lock:
+            metricas.definir("melodia_http_em_andamento", self.em_andamento)
+
+
+class _Desconectado(Exception):
+    """O cliente fechou a conexão no meio da resposta."""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # necessário para Transfer-Encoding: chunked
+
+    # ------------------------------------------------------------------
+    # Rotas
+    # ------------------------------------------------------------------
+    def do_GET(self):
+        rota = urlsplit(self.path).path
+        if rota == "/saude":
+            self._responder_json(200, self.server.saude())
+        elif rota == "/metrics":
+            self._responder(200, metricas.texto().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._responder_json(404, {"erro": "rota_desconhecida", "detalhe": rota})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/extrair":
+            self.close_connection = True  # o corpo não foi lido
+            self._responder_json(404, {"erro": "rota_desconhecida", "detalhe": url.path})
+            return
+
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        modo = params.get("modo_tabelas", "texto")
+        if modo not in regioes.MODOS:
+            self.close_connection = True
+            self._responder_json(400, {"erro": "parametro_invalido",
+                                       "detalhe": f"modo_tabelas deve ser um de {', '.join(regioes.MODOS)}"})
+            return
+
+        tamanho = self.headers.get("Content-Length")
+        if tamanho is None or not tamanho.isdigit():
+            self.close_connection = True
+            self._responder_json(411, {"erro": "tamanho_ausente", "detalhe": "envie o PDF com Content-Length"})
+            return
+        if int(tamanho) > self.server.config.max_upload_mb * 2**20:
+            self.close_connection = True
+            self._responder_json(413, {"erro": "arquivo_grande",
+                                       "detalhe": f"mais de {self.server.config.max_upload_mb} MB"})
+            return
+
+        if not self.server.entrar():
+            self.close_connection = True
+            self._responder_json(503, {"erro": "ocupado", "detalhe": "extrações simultâneas no limite"},
+                                 {"Retry-After": "5"})
+            return
+        try:
+            self._extrair(int(tamanho), params, modo)
+        finally:
+            self.server.sair()
+
+    # ------------------------------------------------------------------
+    # Extração
+    # ------------------------------------------------------------------
+    def _extrair(self, tamanho: int, params: dict, modo: str):
+        config = self.server.config
+        pool = self.server.pool
+        inicio = time.perf_counter()
+        req_id = uuid.uuid4().hex[:12]
+        pasta = Path(config.workspace) / req_id
+        pasta.mkdir(parents=True, exist_ok=True)
+        nome = os.path.basename(params.get("nome", "")) or "upload.pdf"
+        futuros = {}
+        try:
+            upload = pasta / "upload.pdf"
+            if not self._receber(upload, tamanho):
+                return
+            with open(upload, "rb") as f:
+                if f.read(5) != b"%PDF-":
+                    self._responder_json(415, {"erro": "nao_pdf", "detalhe": f"{nome} não é um PDF"})
+                    return
+
+            # 1) meses (na thread da requisição: limites só cooperativos aqui)
+            lim = config.limites
+            try:
+                with aplicar_limites(Limites(timeout_s=lim.timeout_s, max_paginas=lim.max_paginas)), \
+                        metricas.cronometro("split", backend="pypdf"):
+                    indice = split_pdf_by_text(str(upload), str(pasta / "meses"))
+            except LimiteExcedido as e:
+                self._responder_json(413 if e.motivo == "paginas" else 422, e.como_dict())
+                return
+            if not indice:
+                self._responder_json(422, {"erro": "sem_meses", "detalhe": f"nenhum mês encontrado em {nome}"})
+                return
+
+            # 2) um job por mês, entregues ao pool conforme abrem vagas na fila
+            def job(arquivo):
+                pasta_mes = pasta / Path(arquivo).stem
+                pasta_mes.mkdir(exist_ok=True)
+                return dict(
+                    pdf_path=str(pasta / "meses" / arquivo),
+                    base_dir=str(pasta_mes),
+                    base_rubricas_path=config.base_rubricas_path,
+                    obras_agregadas=params.get("agregar") == "1",
+                    modo_tabelas=modo,
+                    cache_paginas=config.cache_paginas,
+                    limites=lim._replace(arquivo_cancelamento=str(pasta_mes / "CANCELAR")),
+                )
+
+            fila = deque((Path(arquivo).stem, job(arquivo)) for arquivo in sorted(indice))
+            meses = [mes for mes, _ in fila]
+            ativos = set()
+
+            def alimentar():
+                """Submete os meses restantes até a fila do pool encher."""
+                while fila:
+                    mes, kwargs = fila[0]
+                    try:
+                        futuro = pool.submit(req_id, **kwargs)
+                    except FilaCheia:
+                        return
+                    fila.popleft()
+                    futuros[futuro] = mes
+                    ativos.add(futuro)
+
+            alimentar()
+            if not futuros:
+                # nenhuma vaga agora (a fila é das outras requisições): vale tentar de novo
+                self._responder_json(503, {"erro": "fila_cheia", "detalhe": "fila de extração cheia"},
+                                     {"Retry-After": "10"})
+                return
+
+            logger.info(f"🌐 {req_id}: {nome} com {len(meses)} mês(es), {len(futuros)} na fila")
+            try:
+                self._transmitir(req_id, meses, futuros, ativos, alimentar, inicio)
+            except _Desconectado:
+                logger.warning(f"⚠️ {req_id}: cliente desconectou; cancelando {nome}")
+                fila.clear()
+                for futuro in ativos:
+                    pool.cancelar(futuro)
+        finally:
+            # os jobs cancelados param na próxima página; só então apaga a pasta
+            wait(futuros)
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    def _receber(self, destino: Path, tamanho: int) -> bool:
+        restante = tamanho
+        with open(destino, "wb") as f:
+            while restante:
+                bloco = self.rfile.read(min(BLOCO_LEITURA, restante))
+                if not bloco:
+                    self.close_connection = True
+                    logger.warning("⚠️ Upload interrompido pelo cliente.")
+                    return False
+                f.write(bloco)
+                restante -= len(bloco)
+        return True
+
+    def _transmitir(self, req_id: str, meses: list, futuros: dict, ativos: set, alimentar, inicio: float):
+        """Devolve cada mês quando termina; a cada job concluído, alimentar() submete os próximos."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._registrar(200)
+
+        self._enviar([_json(tipo="inicio", id=req_id, meses=meses, unidade="reais")])
+        erros = 0
+        while ativos or len(futuros) < len(meses):
+            if not ativos:
+                # todos os nossos já terminaram e a fila segue cheia de outras requisições
+                time.sleep(ESPERA_FILA_S)
+                alimentar()
+                continue
+            feitos, _ = wait(ativos, return_when=FIRST_COMPLETED)
+            ativos -= feitos
+            alimentar()
+            for futuro in feitos:
+                if not self._enviar_mes(futuros[futuro], futuro):
+                    erros += 1
+
+        self._enviar([_json(tipo="fim", meses=len(meses), erros=erros,
+                            segundos=round(time.perf_counter() - inicio, 3))])
+        self._escrever(b"0\r\n\r\n")
+
+    def _enviar_mes(self, mes: str, futuro) -> bool:
+        try:
+            dfs = futuro.result()
+        except LimiteExcedido as e:
+            self._enviar([_json(tipo="erro", mes=mes, **e.como_dict())])
+            return False
+        except Exception as e:
+            self._enviar([_json(tipo="erro", mes=mes, erro=type(e).__name__, detalhe=str(e))])
+            return False
+
+        contagem = {}
+        for tabela, df in zip(TABELAS, dfs):
+            prefixo = f'{{"tipo":"linha","tabela":"{tabela}","mes":{json.dumps(mes)},"linha":'
+            self._enviar(f"{prefixo}{linha}}}" for linha in iter_ndjson(para_reais(df)))
+            contagem[tabela] = len(df)
+        self._enviar([_json(tipo="mes", mes=mes, linhas=contagem)])
+        return True
+
+    # ------------------------------------------------------------------
+    # Saída
+    # ------------------------------------------------------------------
+    def _enviar(self, linhas, por_chunk: int = 500):
+        """Linhas NDJSON agrupadas em chunks (menos escritas no socket)."""
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= por_chunk:
+                self._chunk(bloco)
+                bloco = []
+        if bloco:
+            self._chunk(bloco)
+
+    def _chunk(self, linhas):
+        dados = ("\n".join(linhas) + "\n").encode("utf-8")
+        self._escrever(b"%x\r\n" % len(dados) + dados + b"\r\n")
+
+    def _escrever(self, dados: bytes):
+        try:
+            self.wfile.write(dados)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            self.close_connection = True
+            raise _Desconectado() from e
+
+    def _responder(self, status: int, corpo: bytes, tipo: str, cabecalhos=None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for chave, valor in (cabecalhos or {}).items():
+            self.send_header(chave, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+        self._registrar(status)
+
+    def _responder_json(self, status: int, dados: dict, cabecalhos=None):
+        self._responder(status, (_json(**dados) + "\n").encode("utf-8"), "application/json; charset=utf-8",
+                        cabecalhos)
+
+    def _registrar(self, status: int):
+        metricas.contar("melodia_http_requisicoes_total", rota=urlsplit(self.path).path, status=status)
+
+    def log_message(self, formato, *args):
+        logger.debug(f"{self.address_string()} {formato % args}")
+
+
+def _json(**campos) -> str:
+    return json.dumps(campos, ensure_ascii=False, separators=(",", ":"))
+
+
+def criar_servidor(pool: PoolExtracao, config: Config, porta: int = 8600, host: str = "127.0.0.1") -> _Servidor:
+    """Servidor pronto para serve_forever(); porta 0 = porta livre qualquer."""
+    os.makedirs(config.workspace, exist_ok=True)
+    return _Servidor((host, porta), pool, config)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=int(os.environ.get("MELODIA_SERVICO_PORTA", "8600")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("MELODIA_WORKERS", "0")),
+                        help="processos de extração (0 = nº de CPUs - 1)")
+    parser.add_argument("--max-fila", type=int, default=64, help="meses pendentes no pool, somando as requisições")
+    parser.add_argument("--max-requisicoes", type=int, default=4, help="extrações simultâneas (acima disso, 503)")
+    parser.add_argument("--max-upload-mb", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=float(os.environ.get("MELODIA_TIMEOUT_S", "300")),
+                        help="segundos por mês (0 = sem limite)")
+    parser.add_argument("--max-paginas", type=int, default=int(os.environ.get("MELODIA_MAX_PAGINAS", "2000")),
+                        help="páginas por PDF (0 = sem limite)")
+    parser.add_argument("--max-memoria-mb", type=int, default=int(os.environ.get("MELODIA_MAX_MEMORIA_MB", "2048")),
+                        help="RSS por worker (0 = sem limite)")
+    parser.add_argument("--workspace", default=os.path.abspath(os.path.join("workspace", "servico")))
+    parser.add_argument("--cache-paginas", default=os.environ.get(
+        "MELODIA_CACHE_PAGINAS", os.path.abspath(os.path.join("workspace", "cache_paginas.sqlite"))),
+        help="SQLite com o texto já extraído de cada página (vazio = desligado)")
+    args = parser.parse_args(argv)
+
+    configurar_logging()
+    config = Config(
+        workspace=args.workspace,
+        base_rubricas_path=os.path.join(ROOT_DIR, "bases", "Base_Rubrica_Original.xlsx"),
+        max_requisicoes=args.max_requisicoes,
+        max_upload_mb=args.max_upload_mb,
+        limites=Limites(timeout_s=args.timeout or None, max_paginas=args.max_paginas or None,
+                        max_memoria_mb=args.max_memoria_mb or None),
+        cache_paginas=args.cache_paginas or None,
+    )
+    # cota por requisição = fila inteira: os meses além dela esperam vaga na própria requisição
+    pool = PoolExtracao(max_workers=args.workers or None, max_fila=args.max_fila, max_por_sessao=args.max_fila)
+    servidor = criar_servidor(pool, config, args.porta, args.host)
+    logger.info(f"🌐 Serviço de extração em http://{args.host}:{servidor.server_address[1]} "
+                f"({pool.max_workers} worker(s), até {args.max_requisicoes} extrações simultâneas)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        pool.fechar(esperar=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
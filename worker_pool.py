@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import types
+import atexit
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ecad_scripts import metricas
+
+logger = logging.getLogger(__name__)
+
+
+# pools ainda abertos neste processo (fechar_todos, no atexit)
+_ABERTOS = set()
+
+
+class FilaCheia(Exception):
+    """A fila global ou a cota da sessão está cheia (backpressure)."""
+
+
+def _aquecer():
+    """Initializer dos workers: paga o custo de import uma vez por processo."""
+    from ecad_scripts.logs import configurar_logging
+    configurar_logging()
+
+    import pandas  # noqa: F401
+    import pdfplumber  # noqa: F401
+    import pypdf  # noqa: F401
+    import pipeline  # noqa: F401
+
+
+@contextmanager
+def _sem_main_do_app():
+    """
+    O Streamlit registra o script do app como __main__; com "spawn" cada
+    worker reexecutaria o app inteiro ao iniciar. Enquanto os processos são
+    criados, expõe um __main__ vazio.
+    """
+    main = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _executar(pdf_path, base_dir, base_rubricas_path, kwargs):
+    """Roda no worker; devolve (resultado, métricas do job) para o processo do app somar."""
+    from pipeline import process_uploaded_pdf
+    metricas.zerar()
+    resultado = process_uploaded_pdf(pdf_path, base_dir, base_rubricas_path, **kwargs)
+    return resultado, metricas.instantaneo()
+
+
+class PoolExtracao:
+    """
+    Pool de processos pré-aquecidos compartilhado por todas as sessões do app.
+
+    - fila limitada (max_fila jobs pendentes no total) e cota por sessão
+      (max_por_sessao); acima disso submit() levanta FilaCheia;
+    - justiça entre sessões: o despachante pega um job de cada sessão por vez
+      (round-robin) e só entrega ao executor quando há worker livre, então uma
+      sessão com muitos PDFs não passa na frente das outras;
+    - cancelar() tira o job da fila ou, se já está num worker, cria o arquivo
+      de cancelamento dos seus limites (kwarg limites=Limites(...)), que o
+      parser checa entre páginas.
+    """
+
+    def __init__(self, max_workers: int = None, max_fila: int = 32, max_por_sessao: int = 8):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_fila = max_fila
+        self.max_por_sessao = max_por_sessao
+
+        self._executor = self._novo_executor()
+        self._filas = OrderedDict()  # sessao -> deque[(args, Future)]
+        self._pendentes = 0
+        self._em_execucao = 0
+        self._cancelamento = {}  # Future -> arquivo de cancelamento do job
+        self._fechado = False
+        self._cond = threading.Condition()
+
+        self._despachante = threading.Thread(target=self._despachar, name="pool-extracao", daemon=True)
+        self._despachante.start()
+        metricas.coletor(self._coletar_metricas)
+        _ABERTOS.add(self)
+
+    # ------------------------------------------------------------------
+    def submit(self, sessao: str, pdf_path: str, base_dir: str, base_rubricas_path: str, **kwargs) -> Future:
+        """Enfileira process_uploaded_pdf para a sessão; retorna um Future."""
+        futuro = Future()
+        with self._cond:
+            if self._fechado:
+                raise RuntimeError("Pool de extração encerrado.")
+            if self._pendentes >= self.max_fila:
+                raise FilaCheia(f"Fila de extração cheia ({self.max_fila} jobs).")
+            fila = self._filas.setdefault(sessao, deque())
+            if len(fila) >= self.max_por_sessao:
+                raise FilaCheia(f"Limite de {self.max_por_sessao} PDFs na fila por sessão.")
+            fila.append(((pdf_path, base_dir, base_rubricas_path, kwargs), futuro))
+            self._pendentes += 1
+            limites = kwargs.get("limites")
+            if limites is not None and limites.arquivo_cancelamento:
+                self._cancelamento[futuro] = limites.arquivo_cancelamento
+            self._cond.notify_all()
+        inicio = time.perf_counter()
+        futuro.add_done_callback(self._esquecer)
+        futuro.add_done_callback(lambda f: self._medir_job(f, inicio))
+        return futuro
+
+    def cancelar(self, futuro: Future) -> bool:
+        """
+        Cancela um job. Pendente: sai da fila na hora. Em execução: pede parada
+        cooperativa e o Future termina com LimiteExcedido("cancelado").
+        Retorna False se o job já terminou ou não tem arquivo de cancelamento.
+        """
+        if futuro.cancel():
+            return True
+        with self._cond:
+            arquivo = self._cancelamento.get(futuro)
+        if arquivo is None or futuro.done():
+            return False
+        with open(arquivo, "w"):
+            pass
+        logger.info(f"🛑 Cancelamento pedido: {arquivo}")
+        return True
+
+    def profundidade(self) -> dict:
+        with self._cond:
+            return {
+                "pendentes": self._pendentes,
+                "em_execucao": self._em_execucao,
+                "sessoes": len(self._filas),
+                "workers": self.max_workers,
+            }
+
+    def fechar(self, esperar: bool = False):
+        with self._cond:
+            if self._fechado:
+                return
+            self._fechado = True
+            _ABERTOS.discard(self)
+            metricas.remover_coletor(self._coletar_metricas)
+            for fila in self._filas.values():
+                for _, futuro in fila:
+                    futuro.cancel()
+            self._filas.clear()
+            self._pendentes = 0
+            self._cond.notify_all()
+        self._executor.shutdown(wait=esperar, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    def _novo_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_aquecer,
+        )
+        # com "spawn" os processos nascem sob demanda a cada submit sem worker
+        # ocioso: submeter max_workers tarefas vazias já cria e aquece todos
+        with _sem_main_do_app():
+            for _ in range(self.max_workers):
+                executor.submit(int, 0)
+        return executor
+
+    def _proximo(self):
+        """Próximo job em round-robin entre sessões (chamar com o lock)."""
+        while self._filas:
+            sessao, fila = next(iter(self._filas.items()))
+            args, futuro = fila.popleft()
+            if fila:
+                self._filas.move_to_end(sessao)
+            else:
+                del self._filas[sessao]
+            self._pendentes -= 1
+            if futuro.set_running_or_notify_cancel():
+                return args, futuro
+        return None
+
+    def _despachar(self):
+        while True:
+            with self._cond:
+                while not self._fechado and (self._pendentes == 0 or self._em_execucao >= self.max_workers):
+                    self._cond.wait()
+                if self._fechado:
+                    return
+                job = self._proximo()
+                if job is None:
+                    continue
+                self._em_execucao += 1
+
+            args, futuro = job
+            try:
+                interno = self._submeter(args)
+            except Exception as e:
+                self._concluir(futuro, erro=e)
+                continue
+            interno.add_done_callback(lambda f, futuro=futuro: self._repassar(f, futuro))
+
+    def _submeter(self, args) -> Future:
+        try:
+            return self._executor.submit(_executar, *args)
+        except BrokenProcessPool:
+            # um worker morreu (ex.: falta de memória): recria o pool e tenta de novo
+            logger.warning("⚠️ Pool de extração quebrado; recriando workers.")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._novo_executor()
+            return self._executor.submit(_executar, *args)
+
+    def _coletar_metricas(self):
+        prof = self.profundidade()
+        metricas.definir("melodia_fila_jobs", prof["pendentes"], estado="pendente")
+        metricas.definir("melodia_fila_jobs", prof["em_execucao"], estado="em_execucao")
+
+    @staticmethod
+    def _medir_job(futuro: Future, inicio: float):
+        if futuro.cancelled():
+            resultado = "cancelado"
+        elif futuro.exception() is None:
+            resultado = "ok"
+        else:
+            resultado = getattr(futuro.exception(), "motivo", None) or "erro"
+        metricas.contar("melodia_jobs_total", resultado=resultado)
+        metricas.observar("melodia_job_segundos", time.perf_counter() - inicio)
+
+    def _esquecer(self, futuro: Future):
+        with self._cond:
+            self._cancelamento.pop(futuro, None)
+
+    def _repassar(self, interno: Future, futuro: Future):
+        if interno.cancelled():
+            self._concluir(futuro, erro=RuntimeError("Job cancelado."))
+        elif interno.exception() is not None:
+            self._concluir(futuro, erro=interno.exception())
+        else:
+            resultado, dados = interno.result()
+            metricas.mesclar(dados)
+            self._concluir(futuro, resultado=resultado)
+
+    def _concluir(self, futuro: Future, resultado=None, erro=None):
+        with self._cond:
+            self._em_execucao -= 1
+            self._cond.notify_all()
+        if erro is not None:
+            futuro.set_exception(erro)
+        else:
+            futuro.set_result(resultado)
+
+
+def fechar_todos(esperar: bool = True):
+    """
+    Fecha os pools abertos do processo. Registrada no atexit: na saída
+    espera os workers, porque num processo filho do multiprocessing a
+    finalização fecha as filas do executor antes das sentinelas chegarem aos
+    workers, e o join dos filhos ficaria preso. Onde o atexit não roda (ex.:
+    o alvo de um multiprocessing.Process), chame direto.
+    """
+    for pool in list(_ABERTOS):
+        pool.fechar(esperar=esperar)
+
+
+atexit.register(fechar_todos)